@@ -0,0 +1,232 @@
+# coding:utf-8
+"""
+客户端 trader 操作耗时测试
+使用 winsim 模拟的同花顺客户端，统计不同券商配置下 buy, position, cancel_entrust 等操作的耗时
+
+    PYTHONPATH=core python benchmarks/client_bench.py --broker ths ht universal --rounds 20
+
+保存结果后可以用 --baseline 对比，p99 耗时超出容忍范围时返回非 0 状态码
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+import winsim
+from follower_bench import percentile
+
+# 需要在导入客户端模块之前替换 pywinauto
+winsim.install()
+
+# pylint: disable=wrong-import-position
+import easytrader  # noqa: E402
+from easytrader import grid_strategies  # noqa: E402
+from easytrader.config import client  # noqa: E402
+from easytrader.log import logger  # noqa: E402
+
+# {券商配置名: easytrader.use 的参数}
+BROKERS = {
+    "ths": "ths",
+    "universal": "universal_client",
+    "ht": "ht_client",
+    "htzq": "htzq_client",
+    "gj": "gj_client",
+    "gf": "gf_client",
+    "wk": "wk_client",
+    "yh": "yh_client",
+}
+
+GRID_STRATEGIES = {
+    "default": None,
+    "copy": grid_strategies.Copy,
+    "wmcopy": grid_strategies.WMCopy,
+    "xls": grid_strategies.Xls,
+}
+
+OPERATIONS = ("buy", "position", "cancel_entrust", "sell", "balance")
+
+
+def run_broker(broker, args):
+    """
+    :return: {操作名: [每次耗时(毫秒)]}
+    """
+    delays = winsim.Delays(
+        message=args.message_delay,
+        action=args.action_delay,
+        page_switch=args.page_delay,
+        refresh=args.refresh_delay,
+        quote_load=args.quote_delay,
+        dialog=args.dialog_delay,
+        close=args.close_delay,
+        copy=args.copy_delay,
+        save=args.save_delay,
+        load_start=args.load_start_delay,
+    )
+    codes = ["{:06d}".format(600000 + i) for i in range(args.rounds)]
+    sim = winsim.SimClient(
+        client.create(broker), delays=delays, positions={c: 1000 for c in codes}
+    )
+    winsim.install(sim)
+
+    user = easytrader.use(BROKERS[broker])
+    if GRID_STRATEGIES[args.grid_strategy] is not None:
+        user.grid_strategy = GRID_STRATEGIES[args.grid_strategy]
+    # 模拟客户端不弹出验证码
+    grid_strategies.Copy._need_captcha_reg = False
+    user.connect(sim.exe_path)
+
+    timings = {op: [] for op in args.ops}
+
+    def measure(op, func, *func_args):
+        start = time.perf_counter()
+        result = func(*func_args)
+        timings[op].append((time.perf_counter() - start) * 1000)
+        return result
+
+    for code in codes:
+        entrust_no = None
+        if "buy" in timings:
+            result = measure("buy", user.buy, "sh" + code, 10, 100)
+            entrust_no = result.get("entrust_no")
+        if "position" in timings:
+            measure("position", lambda: user.position)
+        if "balance" in timings:
+            measure("balance", lambda: user.balance)
+        if "cancel_entrust" in timings and entrust_no is not None:
+            measure("cancel_entrust", user.cancel_entrust, entrust_no)
+        if "sell" in timings:
+            measure("sell", user.sell, "sh" + code, 10, 100)
+    if args.phases:
+        print_phases(broker, user.latency.summary())
+    return timings
+
+
+def print_phases(broker, summary):
+    """输出交易各阶段耗时"""
+    for op, phases in summary.items():
+        print("{} {}".format(broker, op), file=sys.stderr)
+        for name, stat in phases.items():
+            print(
+                "    {:<20} p50 {:8.1f}ms  p99 {:8.1f}ms".format(
+                    name, stat["p50"] * 1000, stat["p99"] * 1000
+                ),
+                file=sys.stderr,
+            )
+
+
+def summarize(broker, args, timings):
+    results = []
+    for op, values in timings.items():
+        results.append(
+            {
+                "broker": broker,
+                "grid_strategy": args.grid_strategy,
+                "op": op,
+                "count": len(values),
+                "mean_ms": sum(values) / len(values) if values else float("nan"),
+                "p50_ms": percentile(values, 50),
+                "p99_ms": percentile(values, 99),
+                "max_ms": max(values) if values else float("nan"),
+            }
+        )
+    return results
+
+
+def result_key(result):
+    return "{broker}-{grid_strategy}-{op}".format(**result)
+
+
+def print_results(results):
+    header = ("broker", "grid", "op", "count", "mean_ms", "p50_ms", "p99_ms", "max_ms")
+    print("".join("{:>15}".format(h) for h in header))
+    for r in results:
+        row = (
+            r["broker"],
+            r["grid_strategy"],
+            r["op"],
+            r["count"],
+            "{:.1f}".format(r["mean_ms"]),
+            "{:.1f}".format(r["p50_ms"]),
+            "{:.1f}".format(r["p99_ms"]),
+            "{:.1f}".format(r["max_ms"]),
+        )
+        print("".join("{:>15}".format(str(v)) for v in row))
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """
+    对比基准结果
+    :return: 出现性能回退的结果列表
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {result_key(r): r for r in json.load(f)}
+    regressions = []
+    for result in results:
+        base = baseline.get(result_key(result))
+        if base is not None and result["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append((result, base))
+    return regressions
+
+
+def parse_args(argv=None):
+    defaults = winsim.Delays()
+    parser = argparse.ArgumentParser(description="客户端 trader 操作耗时测试")
+    parser.add_argument("--broker", nargs="+", default=["ths"], choices=BROKERS)
+    parser.add_argument(
+        "--grid-strategy",
+        default="copy",
+        choices=GRID_STRATEGIES,
+        help="获取表格数据的策略, default 为券商 trader 自身的默认策略",
+    )
+    parser.add_argument(
+        "--ops", nargs="+", default=["buy", "position", "cancel_entrust"], choices=OPERATIONS
+    )
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--message-delay", type=float, default=defaults.message)
+    parser.add_argument("--action-delay", type=float, default=defaults.action)
+    parser.add_argument("--page-delay", type=float, default=defaults.page_switch)
+    parser.add_argument("--refresh-delay", type=float, default=defaults.refresh)
+    parser.add_argument("--quote-delay", type=float, default=defaults.quote_load)
+    parser.add_argument("--dialog-delay", type=float, default=defaults.dialog)
+    parser.add_argument("--close-delay", type=float, default=defaults.close)
+    parser.add_argument("--copy-delay", type=float, default=defaults.copy)
+    parser.add_argument("--save-delay", type=float, default=defaults.save)
+    parser.add_argument("--load-start-delay", type=float, default=defaults.load_start)
+    parser.add_argument("--phases", action="store_true", help="输出交易各阶段的耗时")
+    parser.add_argument("--verbose", action="store_true", help="输出 easytrader 的 INFO 日志")
+    parser.add_argument("--output", help="保存结果的 json 文件")
+    parser.add_argument("--baseline", help="用于对比的基准结果 json 文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="p99 耗时允许超出基准的比例")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+    results = []
+    for broker in args.broker:
+        print("running", broker, file=sys.stderr)
+        results.extend(summarize(broker, args, run_broker(broker, args)))
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        for result, base in regressions:
+            print(
+                "性能回退: {} p99 {:.1f}ms -> {:.1f}ms".format(
+                    result_key(result), base["p99_ms"], result["p99_ms"]
+                )
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
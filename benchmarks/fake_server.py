@@ -0,0 +1,169 @@
+# coding:utf-8
+"""
+本地模拟的雪球/聚宽调仓接口，返回按录制数据生成的调仓记录，用于在没有真实账户时测试 follower 的延迟
+"""
+import copy
+import datetime
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+XQ_HISTORY_PATH = "/cubes/rebalancing/history.json"
+JQ_TRANSACTION_PATH = "/algorithm/live/transactionDetail"
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeFollowServer:
+    """
+    模拟的调仓接口服务
+    调用 publish 为策略产生一笔新的调仓，每笔调仓使用不同的证券代码，
+    发布时间记录在 published 中，供统计从调仓产生到下单的延迟
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._xq_template = load_fixture("xq_rebalancing.json")
+        self._jq_template = load_fixture("jq_transaction.json")
+        # {策略 id: [调仓, ...]}, 雪球按时间由新到旧排列, 聚宽按时间由旧到新排列
+        self._xq_rebalancings = {}
+        self._jq_transactions = {}
+        # {证券代码(不含市场前缀): 发布时间}
+        self.published = {}
+        self.requests = 0
+        self.not_modified = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+
+        self._server = _ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def xq_api(self):
+        return self.base_url + XQ_HISTORY_PATH
+
+    @property
+    def jq_api(self):
+        return self.base_url + JQ_TRANSACTION_PATH
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def publish(self, strategy):
+        """
+        为策略产生一笔买入调仓
+        :return: 调仓对应的 6 位证券代码
+        """
+        with self._lock:
+            self._seq += 1
+            code = "{:06d}".format(self._seq)
+            now = time.time()
+            created_at = int(now * 1000)
+
+            rebalancing = copy.deepcopy(self._xq_template)
+            rebalancing["id"] = self._seq
+            rebalancing["created_at"] = rebalancing["updated_at"] = created_at
+            for history in rebalancing["rebalancing_histories"]:
+                history["rebalancing_id"] = self._seq
+                history["stock_symbol"] = "SZ" + code
+                history["created_at"] = history["updated_at"] = created_at
+                history["prev_weight"] = 0.0
+            self._xq_rebalancings.setdefault(strategy, []).insert(0, rebalancing)
+
+            transaction = copy.deepcopy(self._jq_template)
+            dt = datetime.datetime.fromtimestamp(now)
+            transaction["date"] = dt.strftime("%Y-%m-%d")
+            transaction["time"] = dt.strftime("%H:%M:%S")
+            transaction["stock"] = "模拟股票({}.XSHE)".format(code)
+            self._jq_transactions.setdefault(strategy, []).append(transaction)
+
+            self.published[code] = now
+            return code
+
+    def xq_history(self, params, if_none_match=None):
+        """
+        :return: (状态码, 响应头, 响应内容)
+        """
+        strategy = params.get("cube_symbol", [""])[0]
+        page = int(params.get("page", ["1"])[0])
+        count = int(params.get("count", ["1"])[0])
+        with self._lock:
+            rebalancings = self._xq_rebalancings.get(strategy, [])
+            etag = '"{}-{}"'.format(
+                strategy, rebalancings[0]["id"] if rebalancings else 0
+            )
+            if page == 1 and count == 1 and if_none_match == etag:
+                self.not_modified += 1
+                return 304, {"ETag": etag}, None
+            items = rebalancings[(page - 1) * count : page * count]
+            body = {
+                "count": len(items),
+                "page": page,
+                "totalCount": len(rebalancings),
+                "list": items,
+                "maxPage": max(1, -(-len(rebalancings) // count)),
+            }
+            return 200, {"ETag": etag}, body
+
+    def jq_transactions(self, params):
+        strategy = params.get("backtestId", [""])[0]
+        with self._lock:
+            transactions = list(self._jq_transactions.get(strategy, []))
+        return 200, {}, {"data": {"transaction": transactions}}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                with server._lock:
+                    server.requests += 1
+                if url.path == XQ_HISTORY_PATH:
+                    status, headers, body = server.xq_history(
+                        params, self.headers.get("If-None-Match")
+                    )
+                elif url.path == JQ_TRANSACTION_PATH:
+                    status, headers, body = server.jq_transactions(params)
+                else:
+                    status, headers, body = 404, {}, {"error": "not found"}
+
+                data = b"" if body is None else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
@@ -0,0 +1,291 @@
+# coding:utf-8
+"""
+follower 端到端延迟测试
+在本地启动模拟的雪球/聚宽调仓接口，使用模拟的 user 接收下单，
+统计从调仓产生到 user 收到下单的延迟 p50/p99 以及吞吐量。
+
+    PYTHONPATH=core python benchmarks/follower_bench.py --follower xq jq --strategies 1 10 50 --users 1 2
+
+每个场景在独立的进程中运行，保存结果后可以用 --baseline 对比，p99 延迟超出容忍范围时返回非 0 状态码
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from fake_server import FakeFollowServer
+
+from easytrader.joinquant_follower import JoinQuantFollower
+from easytrader.log import logger
+from easytrader.utils.cmd_journal import CmdJournal
+from easytrader.xq_follower import XueQiuFollower
+
+FOLLOWERS = {"xq": XueQiuFollower, "jq": JoinQuantFollower}
+
+TRADE_CMD_EXPIRE_SECONDS = 120
+
+
+class MockTrader:
+    """记录下单时间的模拟 user"""
+
+    def __init__(self, name, orders, order_delay=0.0):
+        """
+        :param name: user 名字
+        :param orders: 共享的下单记录列表 [(user 名字, 6 位证券代码, 下单时间)]
+        :param order_delay: 模拟每次下单的耗时，单位为秒
+        """
+        self.name = name
+        self.orders = orders
+        self.order_delay = order_delay
+        self._lock = threading.Lock()
+
+    def _order(self, security):
+        if self.order_delay:
+            time.sleep(self.order_delay)
+        with self._lock:
+            self.orders.append((self.name, security[-6:], time.time()))
+        return {"entrust_no": len(self.orders)}
+
+    def buy(self, security, price, amount, **kwargs):
+        return self._order(security)
+
+    def sell(self, security, price, amount, **kwargs):
+        return self._order(security)
+
+
+def percentile(values, percent):
+    """最近秩法计算百分位数"""
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    rank = max(1, int(math.ceil(percent / 100 * len(values))))
+    return values[rank - 1]
+
+
+def run_scenario(scenario):
+    """
+    运行单个场景
+    :param scenario: 场景参数字典
+    :return: 统计结果字典
+    """
+    if not scenario["verbose"]:
+        logger.setLevel(logging.WARNING)
+    server = FakeFollowServer().start()
+    tmp_dir = tempfile.mkdtemp()
+    follower = FOLLOWERS[scenario["follower"]]()
+    follower.cmd_journal = CmdJournal(os.path.join(tmp_dir, "cmd_cache.journal"))
+    if scenario["follower"] == "xq":
+        follower.TRANSACTION_API = server.xq_api
+        kwargs = {"assets": 100000}
+    else:
+        follower.TRANSACTION_API = server.jq_api
+        kwargs = {}
+
+    orders = []
+    users = [
+        MockTrader("user{}".format(i), orders, scenario["order_delay"])
+        for i in range(scenario["users"])
+    ]
+    follower.prepare_cmd_cache(False, TRADE_CMD_EXPIRE_SECONDS)
+    follower.start_trader_thread(
+        users, TRADE_CMD_EXPIRE_SECONDS, parallel_users=scenario["parallel_users"]
+    )
+    strategies = [
+        ("ZH{:06d}".format(i), "bench{}".format(i), kwargs)
+        for i in range(scenario["strategies"])
+    ]
+    follower.start_strategy_trackers(
+        strategies, scenario["interval"], async_tracking=scenario["async_tracking"]
+    )
+
+    # 等待所有策略完成首次查询
+    time.sleep(scenario["interval"] * 2)
+    started = time.time()
+    for _ in range(scenario["rounds"]):
+        for strategy, _, _ in strategies:
+            server.publish(strategy)
+        time.sleep(scenario["publish_interval"])
+
+    expected = len(server.published) * len(users)
+    deadline = time.time() + scenario["interval"] * 3 + scenario["drain_timeout"]
+    while len(orders) < expected and time.time() < deadline:
+        time.sleep(0.05)
+
+    received = list(orders)
+    latencies = [
+        (ordered_at - server.published[code]) * 1000
+        for _, code, ordered_at in received
+        if code in server.published
+    ]
+    elapsed = (max(t for _, _, t in received) - started) if received else float("nan")
+    result = dict(
+        scenario,
+        orders=len(received),
+        missing=expected - len(received),
+        p50_ms=percentile(latencies, 50),
+        p99_ms=percentile(latencies, 99),
+        max_ms=max(latencies) if latencies else float("nan"),
+        throughput=len(received) / elapsed if received else 0.0,
+        requests=server.requests,
+        not_modified=server.not_modified,
+    )
+    server.stop()
+    return result
+
+
+def _scenario_worker(scenario, results):
+    results.put(run_scenario(scenario))
+
+
+def run_isolated(scenario):
+    """在独立进程中运行场景，场景结束后跟踪线程随进程退出"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_scenario_worker, args=[scenario, results]
+    )
+    process.start()
+    timeout = (
+        scenario["interval"] * 5
+        + scenario["rounds"] * scenario["publish_interval"]
+        + scenario["drain_timeout"]
+        + 30
+    )
+    try:
+        result = results.get(timeout=timeout)
+    finally:
+        process.terminate()
+        process.join()
+    return result
+
+
+def scenario_key(result):
+    return "{follower}-s{strategies}-i{interval}-u{users}-a{async_tracking}-p{parallel_users}".format(
+        **result
+    )
+
+
+def print_results(results):
+    header = (
+        "follower",
+        "strategies",
+        "interval",
+        "users",
+        "orders",
+        "missing",
+        "p50_ms",
+        "p99_ms",
+        "max_ms",
+        "orders/s",
+        "requests",
+        "304",
+    )
+    print("".join("{:>11}".format(h) for h in header))
+    for r in results:
+        row = (
+            r["follower"],
+            r["strategies"],
+            r["interval"],
+            r["users"],
+            r["orders"],
+            r["missing"],
+            "{:.1f}".format(r["p50_ms"]),
+            "{:.1f}".format(r["p99_ms"]),
+            "{:.1f}".format(r["max_ms"]),
+            "{:.1f}".format(r["throughput"]),
+            r["requests"],
+            r["not_modified"],
+        )
+        print("".join("{:>11}".format(str(v)) for v in row))
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """
+    对比基准结果
+    :return: 出现性能回退的场景列表
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {scenario_key(r): r for r in json.load(f)}
+    regressions = []
+    for result in results:
+        base = baseline.get(scenario_key(result))
+        if base is None:
+            continue
+        if result["missing"] > base["missing"] or result["p99_ms"] > base[
+            "p99_ms"
+        ] * (1 + tolerance):
+            regressions.append((result, base))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="follower 端到端延迟测试")
+    parser.add_argument("--follower", nargs="+", default=["xq"], choices=FOLLOWERS)
+    parser.add_argument("--strategies", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--interval", nargs="+", type=float, default=[0.5])
+    parser.add_argument("--users", nargs="+", type=int, default=[1])
+    parser.add_argument("--rounds", type=int, default=3, help="每个策略产生的调仓次数")
+    parser.add_argument("--publish-interval", type=float, default=2.0, help="两轮调仓之间的间隔秒数")
+    parser.add_argument("--order-delay", type=float, default=0.0, help="模拟每次下单的耗时秒数")
+    parser.add_argument("--drain-timeout", type=float, default=5.0)
+    parser.add_argument("--async-tracking", action="store_true")
+    parser.add_argument("--parallel-users", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="输出 follower 的 INFO 日志")
+    parser.add_argument("--output", help="保存结果的 json 文件")
+    parser.add_argument("--baseline", help="用于对比的基准结果 json 文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="p99 延迟允许超出基准的比例")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for follower, strategies, interval, users in itertools.product(
+        args.follower, args.strategies, args.interval, args.users
+    ):
+        scenario = {
+            "follower": follower,
+            "strategies": strategies,
+            "interval": interval,
+            "users": users,
+            "rounds": args.rounds,
+            "publish_interval": args.publish_interval,
+            "order_delay": args.order_delay,
+            "drain_timeout": args.drain_timeout,
+            "async_tracking": args.async_tracking,
+            "parallel_users": args.parallel_users,
+            "verbose": args.verbose,
+        }
+        print("running", scenario_key(scenario), file=sys.stderr)
+        results.append(run_isolated(scenario))
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        for result, base in regressions:
+            print(
+                "性能回退: {} p99 {:.1f}ms -> {:.1f}ms, 未下单 {} -> {}".format(
+                    scenario_key(result),
+                    base["p99_ms"],
+                    result["p99_ms"],
+                    base["missing"],
+                    result["missing"],
+                )
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# coding:utf-8
+"""
+表格数据解析耗时测试，对比 pandas.read_csv 和 GridParser
+
+    PYTHONPATH=core python benchmarks/grid_parse_bench.py --rows 30 300 3000
+"""
+import argparse
+import io
+import sys
+import timeit
+
+import pandas as pd
+
+from easytrader.config import client
+from easytrader.utils.grid_parser import GridParser
+
+COLUMNS = (
+    "委托时间",
+    "证券代码",
+    "证券名称",
+    "操作",
+    "备注",
+    "委托数量",
+    "成交数量",
+    "委托价格",
+    "成交均价",
+    "合同编号",
+    "交易市场",
+    "股东帐户",
+)
+
+
+def make_grid(rows):
+    """生成当日委托表格的复制内容"""
+    lines = ["\t".join(COLUMNS)]
+    for i in range(rows):
+        lines.append(
+            "\t".join(
+                (
+                    "09:{:02d}:{:02d}".format(i // 60 % 60, i % 60),
+                    "{:06d}".format(600000 + i),
+                    "证券{}".format(i),
+                    "买入" if i % 2 else "卖出",
+                    "已成",
+                    str(100 * (i % 10 + 1)),
+                    str(100 * (i % 10 + 1)),
+                    "{:.2f}".format(10 + i % 100 / 100),
+                    "{:.3f}".format(10 + i % 100 / 100),
+                    "{:07d}".format(i),
+                    "上海Ａ股",
+                    "A123456789",
+                )
+            )
+        )
+    return "\r\n".join(lines) + "\r\n"
+
+
+def pandas_parse(text, dtype):
+    return pd.read_csv(
+        io.StringIO(text), delimiter="\t", dtype=dtype, na_filter=False
+    ).to_dict("records")
+
+
+def run(rows, number, dtype):
+    text = make_grid(rows)
+    parser = GridParser(dtype)
+    if parser.parse(text) != pandas_parse(text, dtype):
+        raise AssertionError("GridParser 与 pandas 的解析结果不一致")
+
+    results = {}
+    for name, func in (
+        ("pandas", lambda: pandas_parse(text, dtype)),
+        ("GridParser.parse", lambda: parser.parse(text)),
+        ("GridParser.parse_columns", lambda: parser.parse_columns(text)),
+    ):
+        results[name] = min(timeit.repeat(func, number=number, repeat=5)) / number
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="表格数据解析耗时测试")
+    parser.add_argument("--rows", type=int, nargs="+", default=[30, 300, 3000])
+    parser.add_argument("--number", type=int, default=20, help="每轮解析次数")
+    parser.add_argument("--broker", default="ths")
+    args = parser.parse_args(argv)
+
+    dtype = client.create(args.broker).GRID_DTYPE
+    print("{:>8}{:>28}{:>12}{:>10}".format("rows", "parser", "ms", "speedup"))
+    for rows in args.rows:
+        results = run(rows, args.number, dtype)
+        base = results["pandas"]
+        for name, seconds in results.items():
+            print(
+                "{:>8}{:>28}{:>12.3f}{:>9.1f}x".format(
+                    rows, name, seconds * 1000, base / seconds
+                )
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1219 @@
+# coding:utf-8
+"""
+离线模拟的同花顺下单客户端
+实现 clienttrader, grid_strategies, pop_dialog_handler, refresh_strategies 用到的 pywinauto 接口，
+调用 install 后以模拟的 pywinauto 模块替换 sys.modules 中的 pywinauto，用于在没有 Windows 客户端时测试下单和查询的耗时
+
+    import winsim
+    sim = winsim.SimClient(client.create("ths"), delays=winsim.Delays(page_switch=0.05))
+    winsim.install(sim)
+    user = easytrader.use("ths")
+    user.connect(sim.exe_path)
+
+模拟的客户端行为:
+* 左侧菜单切换后经过 page_switch 秒显示对应页面，期间主窗口不可用
+* 输入证券代码后经过 quote_load 秒自动填入当前价格并选择交易所，此前价格输入框保留上一笔委托的价格
+* 点击下单按钮后经过 dialog 秒弹出委托确认框，确认后弹出委托结果提示框
+* 表格 Ctrl+A Ctrl+C 后经过 copy 秒写入剪贴板，Ctrl+S 弹出另存为对话框，保存后写入 gbk 编码的制表符分隔文件
+* 不模拟验证码
+"""
+import itertools
+import re
+import sys
+import threading
+import time
+import types
+
+WS_MINIMIZE = 0x20000000
+WM_COMMAND = 0x111
+# 表格右键菜单中 "复制" 对应的命令 id
+GRID_COPY_COMMAND = 0xE122
+SAVE_DIALOG_EDIT_CONTROL_ID = 0x47C
+
+# 各表格的表头
+POSITION_COLUMNS = ("证券代码", "证券名称", "股票余额", "可用余额", "参考成本价", "市价", "市值")
+ENTRUST_COLUMNS = (
+    "委托时间",
+    "证券代码",
+    "证券名称",
+    "操作",
+    "备注",
+    "委托数量",
+    "成交数量",
+    "委托价格",
+    "合同编号",
+    "交易市场",
+)
+TRADE_COLUMNS = ("成交时间", "证券代码", "证券名称", "操作", "成交数量", "成交均价", "成交编号")
+
+_handles = itertools.count(0x10000)
+# {句柄: 窗口}, 供 handleprops 查询
+_windows = {}
+_current = {"client": None}
+
+
+class ElementNotFoundError(Exception):
+    pass
+
+
+class ElementAmbiguousError(Exception):
+    pass
+
+
+class WindowNotFoundError(Exception):
+    pass
+
+
+class SimTimeoutError(RuntimeError):
+    pass
+
+
+class Delays:
+    """模拟客户端的响应耗时，单位为秒"""
+
+    def __init__(
+        self,
+        message=0.0005,
+        action=0.005,
+        page_switch=0.05,
+        refresh=0.02,
+        quote_load=0.05,
+        dialog=0.03,
+        close=0.01,
+        copy=0.02,
+        save=0.05,
+        load_start=0.0,
+    ):
+        """
+        :param message: 查询控件状态、读取文本等一次窗口消息的耗时
+        :param action: 点击、输入等一次键盘鼠标操作的耗时
+        :param page_switch: 切换左侧菜单后加载页面的耗时
+        :param refresh: F5 刷新的耗时
+        :param quote_load: 输入证券代码后加载行情的耗时
+        :param dialog: 提交后弹出对话框的耗时
+        :param close: 关闭对话框的耗时
+        :param copy: 复制表格到剪贴板的耗时
+        :param save: 保存表格文件的耗时
+        :param load_start: 选择菜单或按下 F5 后，客户端开始加载、主窗口变为不可用之前的耗时
+        """
+        self.message = message
+        self.action = action
+        self.page_switch = page_switch
+        self.refresh = refresh
+        self.quote_load = quote_load
+        self.dialog = dialog
+        self.close = close
+        self.copy = copy
+        self.save = save
+        self.load_start = load_start
+
+    @classmethod
+    def zero(cls):
+        return cls(0, 0, 0, 0, 0, 0, 0, 0, 0)
+
+
+def _strip_keys(keys):
+    """去掉 pywinauto 按键序列中的功能键和修饰键，得到输入的文本"""
+    return re.sub(r"[\^%+~]", "", re.sub(r"\{[^}]*\}", "", keys))
+
+
+class SimWindow:
+    """模拟的窗口，同时充当 pywinauto 的 wrapper"""
+
+    def __init__(self, sim, class_name, title="", control_id=0, parent=None):
+        self.sim = sim
+        self.handle = next(_handles)
+        self.cls = class_name
+        self.title = title
+        self.ctrl_id = control_id
+        self.parent = parent
+        self._children = []
+        self.visible = True
+        self.enabled = True
+        self.destroyed = False
+        self.styles = 0
+        if parent is not None:
+            parent._children.append(self)
+        _windows[self.handle] = self
+
+    def __repr__(self):
+        return "<{} {!r} id={} {!r}>".format(
+            type(self).__name__, self.cls, self.ctrl_id, self.title
+        )
+
+    # 窗口状态
+    def window_text(self):
+        self.sim.message()
+        return self.title
+
+    def class_name(self):
+        return self.cls
+
+    def control_id(self):
+        return self.ctrl_id
+
+    def texts(self):
+        self.sim.message()
+        return [self.title]
+
+    def is_visible(self):
+        self.sim.message()
+        return self.showing()
+
+    def showing(self):
+        window = self
+        while window is not None:
+            if window.destroyed or not window.visible:
+                return False
+            window = window.parent
+        return True
+
+    def is_enabled(self):
+        self.sim.message()
+        return self.enabled and not self.destroyed
+
+    def has_style(self, style):
+        return bool(self.styles & style)
+
+    def has_focus(self):
+        self.sim.message()
+        return self.sim.focus is self
+
+    def wrapper_object(self):
+        return self
+
+    def children(self, **criteria):
+        return list(self._children)
+
+    def descendants(self):
+        for child in self._children:
+            yield child
+            yield from child.descendants()
+
+    # 操作
+    def set_focus(self):
+        self.sim.action()
+        self.sim.focus = self
+        return self
+
+    def click(self, coords=None, **kwargs):
+        self.sim.action()
+        self.sim.focus = self
+        with self.sim.lock:
+            self.on_click(coords)
+        return self
+
+    def click_input(self, coords=None, **kwargs):
+        return self.click(coords)
+
+    def double_click(self, coords=None, **kwargs):
+        self.sim.action()
+        with self.sim.lock:
+            self.on_double_click(coords)
+        return self
+
+    def type_keys(self, keys, **kwargs):
+        self.sim.action()
+        with self.sim.lock:
+            self.on_keys(keys)
+        return self
+
+    def post_message(self, message, wparam=0, lparam=0):
+        self.sim.message()
+        with self.sim.lock:
+            self.on_message(message, wparam, lparam)
+        return True
+
+    def close(self):
+        self.sim.action()
+        self.sim.close_window(self)
+
+    def capture_as_image(self, rect=None):
+        from PIL import Image
+
+        return Image.new("RGB", (60, 20), "white")
+
+    # 查找子窗口
+    def child_window(self, **criteria):
+        return WindowSpecification(self.sim, self, criteria)
+
+    window = child_window
+
+    def child_windows(self, **criteria):
+        return self.sim.find_all(self, criteria)
+
+    # 事件，由子类实现
+    def on_click(self, coords):
+        pass
+
+    def on_double_click(self, coords):
+        pass
+
+    def on_keys(self, keys):
+        pass
+
+    def on_message(self, message, wparam, lparam):
+        pass
+
+
+class SimMainWindow(SimWindow):
+    def on_keys(self, keys):
+        if "{F5}" in keys.upper():
+            self.sim.refresh()
+
+
+class SimStatic(SimWindow):
+    """内容由 text 函数动态生成的 Static"""
+
+    def __init__(self, sim, control_id, parent, text):
+        super().__init__(sim, "Static", "", control_id, parent)
+        self._text = text
+
+    def window_text(self):
+        self.sim.message()
+        return self._text()
+
+
+class SimEdit(SimWindow):
+    def __init__(self, sim, control_id, parent, on_change=None):
+        super().__init__(sim, "Edit", "", control_id, parent)
+        self._selected = False
+        self._on_change = on_change
+
+    def set_edit_text(self, text, pos_start=None, pos_end=None):
+        self.sim.action()
+        with self.sim.lock:
+            self.set_text(str(text))
+        return self
+
+    def select(self, start=0, end=None):
+        self.sim.message()
+        self._selected = True
+        return self
+
+    def on_keys(self, keys):
+        text = _strip_keys(keys)
+        self.set_text(text if self._selected else self.title + text)
+        self._selected = False
+
+    def set_text(self, text):
+        changed = text != self.title
+        self.title = text
+        if changed and self._on_change is not None:
+            self._on_change(text)
+
+
+class SimComboBox(SimWindow):
+    def __init__(self, sim, control_id, parent, items):
+        super().__init__(sim, "ComboBox", "", control_id, parent)
+        self.items = list(items)
+
+    def texts(self):
+        """与 pywinauto 一致，第 0 项为当前选中的内容"""
+        self.sim.message()
+        return [self.title] + self.items
+
+    def select(self, item):
+        self.sim.action()
+        with self.sim.lock:
+            self.title = self.items[item] if isinstance(item, int) else item
+        return self
+
+
+class SimButton(SimWindow):
+    def __init__(self, sim, title, control_id, parent, on_click=None):
+        super().__init__(sim, "Button", title, control_id, parent)
+        self._on_click = on_click
+
+    def on_click(self, coords):
+        if self._on_click is not None and self.enabled:
+            self._on_click()
+
+
+class SimToolbar(SimWindow):
+    def __init__(self, sim, parent, buttons):
+        super().__init__(sim, "ToolbarWindow32", "", 0, parent)
+        self._buttons = [
+            SimButton(sim, title, 0, self, on_click) for title, on_click in buttons
+        ]
+
+    def button(self, index):
+        return self._buttons[index]
+
+
+class SimTreeItem:
+    def __init__(self, tree, path):
+        self.tree = tree
+        self.path = list(path)
+
+    def select(self):
+        self.tree.sim.action()
+        with self.tree.sim.lock:
+            self.tree.sim.switch_page(self.path)
+        return self
+
+    def is_selected(self):
+        self.tree.sim.message()
+        return self.tree.sim.selected_path == self.path
+
+    def collapse(self):
+        self.tree.sim.action()
+        return self
+
+    def expand(self):
+        self.tree.sim.action()
+        return self
+
+    def text(self):
+        return self.path[-1]
+
+
+class SimTree(SimWindow):
+    def __init__(self, sim, parent, paths):
+        super().__init__(sim, "SysTreeView32", "", 129, parent)
+        self.paths = [list(path) for path in paths]
+
+    def get_item(self, path, exact=False):
+        self.sim.message()
+        path = list(path)
+        if path not in self.paths:
+            raise IndexError("菜单 {} 不存在".format(path))
+        return SimTreeItem(self, path)
+
+    def roots(self):
+        roots = []
+        for path in self.paths:
+            if [path[0]] not in [r.path for r in roots]:
+                roots.append(SimTreeItem(self, [path[0]]))
+        return roots
+
+
+class SimGrid(SimWindow):
+    """模拟的 CVirtualGridCtrl，rows 为返回表格数据的函数"""
+
+    def __init__(
+        self, sim, control_id, parent, rows, row_metrics, on_row_double_click=None, columns=None
+    ):
+        super().__init__(sim, "CVirtualGridCtrl", "", control_id, parent)
+        self._rows = rows
+        # 表头，没有数据时也会复制出表头；为 None 时使用第一行数据的列
+        self._columns = columns
+        # (第一行的纵坐标, 行高)
+        self._row_metrics = row_metrics
+        self._on_row_double_click = on_row_double_click
+
+    def to_tsv(self):
+        rows = self._rows()
+        if self._columns is not None:
+            columns = list(self._columns)
+        elif rows:
+            columns = list(rows[0])
+        else:
+            return ""
+        lines = ["\t".join(columns)]
+        lines += ["\t".join(str(row.get(c, "")) for c in columns) for row in rows]
+        return "\r\n".join(lines) + "\r\n"
+
+    def on_keys(self, keys):
+        keys = keys.upper()
+        if "^C" in keys:
+            self.sim.copy_to_clipboard(self)
+        elif "^S" in keys:
+            self.sim.show_save_dialog(self)
+
+    def on_message(self, message, wparam, lparam):
+        if message == WM_COMMAND and wparam == GRID_COPY_COMMAND:
+            self.sim.copy_to_clipboard(self)
+
+    def on_double_click(self, coords):
+        if self._on_row_double_click is None or coords is None:
+            return
+        first_row_y, row_height = self._row_metrics
+        row = (coords[1] - first_row_y) // row_height
+        if 0 <= row < len(self._rows()):
+            self._on_row_double_click(row)
+
+
+class SimDialog(SimWindow):
+    """
+    模拟的弹窗
+    title 为 POP_DIALOD_TITLE_CONTROL_ID 控件中的标题，content 为第一个 Static 中的内容
+    """
+
+    def __init__(self, sim, title, content, buttons, title_control_id, on_keys=None):
+        super().__init__(sim, "#32770", "", 0, None)
+        SimWindow(sim, "Static", content, 0, self)
+        SimWindow(sim, "Static", title, title_control_id, self)
+        for text, on_click in buttons:
+            SimButton(sim, text, 0, self, on_click)
+        self._on_keys = on_keys
+
+    def on_keys(self, keys):
+        if self._on_keys is not None:
+            self._on_keys(self, keys)
+
+
+class SimSaveDialog(SimWindow):
+    def __init__(self, sim, grid):
+        super().__init__(sim, "#32770", "另存为", 0, None)
+        self.grid = grid
+        self.edit = SimEdit(sim, SAVE_DIALOG_EDIT_CONTROL_ID, self)
+        SimButton(sim, "保存(&S)", 1, self, self.save)
+        SimButton(sim, "取消", 2, self, lambda: sim.close_window(self))
+
+    def on_keys(self, keys):
+        if keys.lower() in ("%{s}", "%s", "{enter}"):
+            self.save()
+        elif keys.startswith("{") or keys.startswith("%"):
+            return
+        else:
+            self.edit.on_keys(keys)
+
+    def save(self):
+        path = self.edit.title
+        content = self.grid.to_tsv()
+        self.sim.close_window(self)
+
+        data = content.encode("gbk")
+        half = len(data) // 2
+
+        def write(chunk, mode):
+            with open(path, mode) as f:
+                f.write(chunk)
+
+        # 与真实客户端一样分多次写入文件
+        self.sim.later(self.sim.delays.save / 2, write, data[:half], "wb")
+        self.sim.later(self.sim.delays.save, write, data[half:], "ab")
+
+
+class WindowSpecification:
+    """模拟 pywinauto 的 WindowSpecification，使用时才查找窗口"""
+
+    def __init__(self, sim, parent, criteria):
+        self._sim = sim
+        # parent 为 None 时在顶层窗口中查找
+        self._parent = parent
+        self._criteria = criteria
+
+    def __repr__(self):
+        return "<WindowSpecification {}>".format(self._criteria)
+
+    # 与 pywinauto 的 Timings 默认值一致
+    find_timeout = 5.0
+    find_retry = 0.09
+    exists_timeout = 0.5
+    exists_retry = 0.3
+
+    def wrapper_object(self):
+        """查找窗口，找不到时在 find_timeout 秒内重试"""
+        deadline = time.monotonic() + self.find_timeout
+        while True:
+            try:
+                return self._find()
+            except ElementNotFoundError:
+                if time.monotonic() >= deadline:
+                    raise
+            time.sleep(self.find_retry)
+
+    def _find(self):
+        self._sim.message()
+        parent = self._parent
+        if isinstance(parent, WindowSpecification):
+            parent = parent._find()
+        with self._sim.lock:
+            found = self._sim.find_all(parent, self._criteria)
+        if not found:
+            raise ElementNotFoundError(self._criteria)
+        index = self._criteria.get("found_index")
+        if index is not None:
+            if index >= len(found):
+                raise ElementNotFoundError(self._criteria)
+            return found[index]
+        if len(found) > 1 and "best_match" not in self._criteria:
+            raise ElementAmbiguousError(
+                "There are {} elements that match the criteria {}".format(
+                    len(found), self._criteria
+                )
+            )
+        return found[0]
+
+    def exists(self, timeout=None, retry_interval=None):
+        timeout = self.exists_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self._find()
+                return True
+            except (ElementNotFoundError, ElementAmbiguousError):
+                pass
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.exists_retry if retry_interval is None else retry_interval)
+
+    def wait(self, wait_for, timeout=None, retry_interval=None):
+        deadline = time.monotonic() + (self.find_timeout if timeout is None else timeout)
+        while True:
+            try:
+                window = self._find()
+                if window.showing() and window.enabled:
+                    return window
+            except (ElementNotFoundError, ElementAmbiguousError):
+                pass
+            if time.monotonic() >= deadline:
+                raise SimTimeoutError("timed out waiting for {}".format(self))
+            time.sleep(self.find_retry if retry_interval is None else retry_interval)
+
+    def child_window(self, **criteria):
+        return WindowSpecification(self._sim, self, criteria)
+
+    window = child_window
+
+    def __getitem__(self, key):
+        return WindowSpecification(self._sim, self, {"best_match": key})
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name[0].isupper():
+            return self[name]
+        return getattr(self.wrapper_object(), name)
+
+
+class SimClient:
+    """
+    模拟的同花顺下单客户端
+    """
+
+    def __init__(
+        self,
+        config,
+        delays=None,
+        balance=None,
+        positions=None,
+        price=10.0,
+        startup_prompts=0,
+        exe_path=r"C:\sim\xiadan.exe",
+    ):
+        """
+        :param config: 券商配置, easytrader.config.client.create 的返回值
+        :param delays: 响应耗时 Delays
+        :param balance: 资金，默认 100 万
+        :param positions: 持仓 {证券代码: 数量}
+        :param price: 输入证券代码后自动填入的价格
+        :param startup_prompts: 连接时弹出的提示窗口数
+        :param exe_path: 客户端路径
+        """
+        self.config = config
+        self.delays = delays or Delays()
+        self.price = price
+        self.exe_path = exe_path
+        self.lock = threading.RLock()
+        self.focus = None
+        self.clipboard = ""
+        self.dialogs = []
+        self.killed = False
+        self.selected_path = None
+        self.cash = 1000000.0 if balance is None else balance
+        self.positions = dict(positions or {})
+        # 各证券的当前价格 {证券代码: 价格}, 未指定的证券使用 price
+        self.quotes = {}
+        self.entrusts = []
+        self._entrust_no = itertools.count(100001)
+        # 每类操作的次数
+        self.counters = {"message": 0, "action": 0, "price_overwritten": 0}
+        # 正在加载的页面和刷新的数量
+        self._busy = 0
+        # 已经触发、尚未完成的加载数量，包括还没有开始的加载
+        self._loads = 0
+
+        self.main = SimMainWindow(self, "Afx:400000:b:10003:6:0", config.TITLE)
+        self.toolbar = SimToolbar(
+            self, self.main, [(t, None) for t in ("买入", "卖出", "撤单")]
+            + [("刷新", self.refresh)]
+        )
+        self.pages = {}
+        self._build_pages()
+        self.tree = SimTree(self, self.main, [list(path) for path in self.pages])
+        for _ in range(startup_prompts):
+            self.show_dialog("提示", "欢迎使用", [("确定", None)], title_text="提示")
+
+    # 耗时
+    def message(self):
+        self.counters["message"] += 1
+        if self.delays.message:
+            time.sleep(self.delays.message)
+
+    def action(self):
+        self.counters["action"] += 1
+        if self.delays.action:
+            time.sleep(self.delays.action)
+
+    def later(self, delay, func, *args):
+        """经过 delay 秒后在客户端的锁内执行 func"""
+
+        def run():
+            with self.lock:
+                func(*args)
+
+        if delay <= 0:
+            run()
+            return
+        timer = threading.Timer(delay, run)
+        timer.daemon = True
+        timer.start()
+
+    # 窗口
+    def top_levels(self):
+        return [self.main] + [d for d in self.dialogs if not d.destroyed]
+
+    def top_window(self):
+        with self.lock:
+            for dialog in reversed(self.dialogs):
+                if dialog.showing():
+                    return dialog
+            return self.main
+
+    def find_all(self, parent, criteria):
+        criteria = dict(criteria)
+        visible_only = criteria.pop("visible_only", True)
+        criteria.pop("top_level_only", None)
+        criteria.pop("found_index", None)
+        criteria.pop("backend", None)
+        best_match = criteria.pop("best_match", None)
+        if parent is None:
+            candidates = self.top_levels()
+        else:
+            candidates = list(parent.descendants())
+        result = []
+        for window in candidates:
+            if window.destroyed or (visible_only and not window.showing()):
+                continue
+            if self._match(window, criteria):
+                result.append(window)
+        if best_match is not None:
+            result = self._best_match(result, best_match)
+        return result
+
+    @staticmethod
+    def _match(window, criteria):
+        for key, value in criteria.items():
+            if key == "class_name" and window.cls != value:
+                return False
+            if key == "control_id" and window.ctrl_id != value:
+                return False
+            if key == "title" and window.title != value:
+                return False
+            if key == "title_re" and not re.match(value, window.title):
+                return False
+            if key == "handle" and window.handle != value:
+                return False
+            if key == "enabled_only" and value and not window.enabled:
+                return False
+        return True
+
+    @staticmethod
+    def _best_match(windows, name):
+        exact = [w for w in windows if w.title == name]
+        if exact:
+            return exact
+        match = re.match(r"^([A-Za-z#]+?)(\d*)$", name)
+        if match:
+            class_name, index = match.group(1), int(match.group(2) or 1)
+            same_class = [w for w in windows if w.cls == class_name]
+            # pywinauto 中 Button 与 Button1 都表示第一个, Button2 表示第二个
+            index = max(index, 1)
+            if len(same_class) >= index:
+                return [same_class[index - 1]]
+        return []
+
+    def close_window(self, window):
+        def destroy():
+            window.visible = False
+            window.destroyed = True
+            if window in self.dialogs:
+                self.dialogs.remove(window)
+
+        self.later(self.delays.close, destroy)
+
+    def show_dialog(self, title, content, buttons, on_keys=None, title_text=""):
+        dialog = SimDialog(
+            self,
+            title,
+            content,
+            buttons,
+            self.config.POP_DIALOD_TITLE_CONTROL_ID,
+            on_keys,
+        )
+        dialog.title = title_text
+        self.dialogs.append(dialog)
+        return dialog
+
+    def show_dialog_later(self, title, content, buttons, on_keys=None):
+        dialog = []
+
+        def show():
+            dialog.append(self.show_dialog(title, content, buttons, on_keys))
+
+        self.later(self.delays.dialog, show)
+
+    # 页面
+    def _page(self, path):
+        page = SimWindow(self, "#32770", "", 0xE901, self.main)
+        page.visible = False
+        self.pages[tuple(path)] = page
+        return page
+
+    def _build_pages(self):
+        config = self.config
+        grid_metrics = (config.COMMON_GRID_FIRST_ROW_HEIGHT, config.COMMON_GRID_ROW_HEIGHT)
+        cancel_metrics = (
+            config.CANCEL_ENTRUST_GRID_FIRST_ROW_HEIGHT,
+            config.CANCEL_ENTRUST_GRID_ROW_HEIGHT,
+        )
+        for path, action in (
+            (["买入[F1]"], "buy"),
+            (["卖出[F2]"], "sell"),
+            (["债券回购", "融资回购（正回购）"], "sell"),
+            (["债券回购", "融劵回购（逆回购）"], "sell"),
+        ):
+            self._build_trade_page(self._page(path), action, market=False)
+        for path, action in ((["市价委托", "买入"], "buy"), (["市价委托", "卖出"], "sell")):
+            self._build_trade_page(self._page(path), action, market=True)
+
+        balance_page = self._page(config.BALANCE_MENU_PATH)
+        for name, control_id in config.BALANCE_CONTROL_ID_GROUP.items():
+            SimStatic(
+                self,
+                control_id,
+                balance_page,
+                lambda name=name: "{:.2f}".format(self.balance_row()[name]),
+            )
+        if getattr(config, "BALANCE_GRID_CONTROL_ID", None):
+            SimGrid(
+                self,
+                config.BALANCE_GRID_CONTROL_ID,
+                balance_page,
+                lambda: [self.balance_row()],
+                grid_metrics,
+            )
+        position_page = self.pages.get(tuple(config.POSITION_MENU_PATH)) or self._page(
+            config.POSITION_MENU_PATH
+        )
+        SimGrid(
+            self,
+            config.COMMON_GRID_CONTROL_ID,
+            position_page,
+            self.position_rows,
+            grid_metrics,
+            columns=POSITION_COLUMNS,
+        )
+        SimGrid(
+            self,
+            config.COMMON_GRID_CONTROL_ID,
+            self._page(config.TODAY_ENTRUSTS_MENU_PATH),
+            self.entrust_rows,
+            grid_metrics,
+            columns=ENTRUST_COLUMNS,
+        )
+        SimGrid(
+            self,
+            config.COMMON_GRID_CONTROL_ID,
+            self._page(config.TODAY_TRADES_MENU_PATH),
+            self.trade_rows,
+            grid_metrics,
+            columns=TRADE_COLUMNS,
+        )
+        cancel_page = self._page(["撤单[F3]"])
+        SimGrid(
+            self,
+            config.COMMON_GRID_CONTROL_ID,
+            cancel_page,
+            self.cancelable_rows,
+            cancel_metrics,
+            self.confirm_cancel,
+            columns=ENTRUST_COLUMNS,
+        )
+        SimButton(
+            self,
+            "全撤(Z /)",
+            config.TRADE_CANCEL_ALL_ENTRUST_CONTROL_ID,
+            cancel_page,
+            self.confirm_cancel_all,
+        )
+        ipo_page = self._page(config.AUTO_IPO_MENU_PATH)
+        SimGrid(self, config.COMMON_GRID_CONTROL_ID, ipo_page, lambda: [], grid_metrics)
+
+    def _build_trade_page(self, page, action, market):
+        config = self.config
+        page.action = action
+        exchange = SimComboBox(
+            self, config.TRADE_STOCK_EXCHANGE_CONTROL_ID, page, ["深圳Ａ股", "上海Ａ股"]
+        )
+        # 记录输入证券代码之后是否手动输入过价格
+        typed = {"price": False}
+        price = SimEdit(
+            self,
+            config.TRADE_PRICE_CONTROL_ID,
+            page,
+            lambda text: typed.update(price=True),
+        )
+        amount = SimEdit(self, config.TRADE_AMOUNT_CONTROL_ID, page)
+
+        exchanges = list(exchange.items)
+
+        def on_security_change(code):
+            # 加载完新证券的行情之前，价格输入框仍然保留上一笔委托的价格
+            typed["price"] = False
+            amount.title = ""
+            # 加载完证券信息前交易所选项为空
+            exchange.items = []
+            exchange.title = ""
+            if len(code) != 6:
+                return
+
+            def load_quote():
+                if security.title != code:
+                    return
+                if typed["price"]:
+                    # 行情加载完成前输入的价格被自动填入的价格覆盖
+                    self.counters["price_overwritten"] += 1
+                exchange.items = list(exchanges)
+                exchange.title = "上海Ａ股" if code.startswith(("5", "6", "9")) else "深圳Ａ股"
+                price.title = "{:.2f}".format(self.quotes.get(code, self.price))
+
+            self.later(self.delays.quote_load, load_quote)
+
+        security = SimEdit(self, config.TRADE_SECURITY_CONTROL_ID, page, on_security_change)
+        if market:
+            SimComboBox(
+                self,
+                config.TRADE_MARKET_TYPE_CONTROL_ID,
+                page,
+                ["对手方最优价格", "本方最优价格", "即时成交剩余撤销", "最优五档即时成交剩余撤销", "全额成交或撤销"],
+            )
+        SimButton(
+            self,
+            "买入[B]" if action == "buy" else "卖出[S]",
+            config.TRADE_SUBMIT_CONTROL_ID,
+            page,
+            lambda: self.confirm_order(page.action, security, price, amount, exchange),
+        )
+
+    def switch_page(self, path):
+        self.selected_path = list(path)
+
+        def show():
+            for page_path, page in self.pages.items():
+                page.visible = list(page_path) == self.selected_path
+
+        self.busy(self.delays.page_switch, show)
+
+    def refresh(self):
+        self.busy(self.delays.refresh)
+
+    @property
+    def loading(self):
+        """是否有页面切换或刷新尚未完成"""
+        return self._loads > 0
+
+    def busy(self, delay, done=None):
+        """
+        经过 load_start 秒后开始加载，加载期间主窗口不可用，多个加载重叠时全部完成后才恢复
+        """
+        with self.lock:
+            self._loads += 1
+
+        def start():
+            with self.lock:
+                self._busy += 1
+                self.main.enabled = False
+            self.later(delay, finish)
+
+        def finish():
+            if done is not None:
+                done()
+            with self.lock:
+                self._busy -= 1
+                self._loads -= 1
+                if self._busy == 0:
+                    self.main.enabled = True
+
+        self.later(self.delays.load_start, start)
+
+    # 表格数据
+    def balance_row(self):
+        market_value = sum(amount * self.price for amount in self.positions.values())
+        return {
+            "资金余额": self.cash,
+            "冻结资金": 0.0,
+            "可用金额": self.cash,
+            "可取金额": self.cash,
+            "股票市值": market_value,
+            "总资产": self.cash + market_value,
+        }
+
+    def position_rows(self):
+        return [
+            {
+                "证券代码": code,
+                "证券名称": "模拟{}".format(code),
+                "股票余额": amount,
+                "可用余额": amount,
+                "参考成本价": self.price,
+                "市价": self.price,
+                "市值": amount * self.price,
+            }
+            for code, amount in self.positions.items()
+        ]
+
+    def entrust_rows(self):
+        return [dict(entrust) for entrust in self.entrusts]
+
+    def trade_rows(self):
+        return []
+
+    def cancelable_rows(self):
+        return [e for e in self.entrusts if e["备注"] == "已报"]
+
+    # 剪贴板和文件
+    def copy_to_clipboard(self, grid):
+        content = grid.to_tsv()
+
+        def write():
+            self.clipboard = content
+
+        self.later(self.delays.copy, write)
+
+    def show_save_dialog(self, grid):
+        def show():
+            self.dialogs.append(SimSaveDialog(self, grid))
+
+        self.later(self.delays.dialog, show)
+
+    # 下单和撤单
+    def confirm_order(self, action, security, price, amount, exchange):
+        code, price_text, amount_text = security.title, price.title, amount.title
+        content = "{}\n证券代码: {}\n委托价格: {}\n委托数量: {}".format(
+            action, code, price_text, amount_text
+        )
+
+        def on_keys(dialog, keys):
+            if keys.upper() in ("%Y", "{ENTER}"):
+                self.close_window(dialog)
+                self.place_order(action, code, price_text, amount_text, exchange.title)
+            elif keys.upper() in ("%N", "{ESC}"):
+                self.close_window(dialog)
+
+        self.show_dialog_later("委托确认", content, [("是(Y)", None), ("否(N)", None)], on_keys)
+
+    def place_order(self, action, code, price_text, amount_text, exchange):
+        try:
+            amount = int(amount_text)
+            price = float(price_text)
+        except ValueError:
+            amount = 0
+            price = 0.0
+        if len(code) != 6 or amount <= 0 or amount % 100 != 0:
+            self.show_result_dialog("委托数量必须是 100 的整数倍")
+            return
+        if action == "sell" and self.positions.get(code, 0) < amount:
+            self.show_result_dialog("可用股份不足")
+            return
+        if action == "buy" and self.cash < price * amount:
+            self.show_result_dialog("可用资金不足")
+            return
+
+        entrust_no = str(next(self._entrust_no))
+        self.entrusts.append(
+            {
+                "委托时间": time.strftime("%H:%M:%S"),
+                "证券代码": code,
+                "证券名称": "模拟{}".format(code),
+                "操作": "买入" if action == "buy" else "卖出",
+                "备注": "已报",
+                "委托数量": amount,
+                "成交数量": 0,
+                "委托价格": price,
+                "合同编号": entrust_no,
+                "交易市场": exchange,
+            }
+        )
+        self.show_result_dialog("您的委托已成功提交，合同编号：{}。".format(entrust_no))
+
+    def show_result_dialog(self, content):
+        def close():
+            self.close_window(self.top_window())
+
+        self.show_dialog_later("提示", content, [("确定", close)])
+
+    def confirm_cancel(self, row):
+        entrust = self.cancelable_rows()[row]
+
+        def on_keys(dialog, keys):
+            if keys.upper() in ("%Y", "{ENTER}"):
+                self.close_window(dialog)
+                entrust["备注"] = "已撤"
+                self.show_result_dialog("您的撤单委托已成功提交")
+
+        self.show_dialog_later(
+            "撤单确认",
+            "撤销合同编号 {} 的委托".format(entrust["合同编号"]),
+            [("是(Y)", None), ("否(N)", None)],
+            on_keys,
+        )
+
+    def confirm_cancel_all(self):
+        def on_yes():
+            self.close_window(self.top_window())
+            for entrust in self.cancelable_rows():
+                entrust["备注"] = "已撤"
+
+        self.show_dialog_later("提示", "是否撤销全部委托", [("是(Y)", on_yes), ("否(N)", None)])
+
+
+class Application:
+    def __init__(self, backend="win32"):
+        self.backend = backend
+        self._sim = None
+
+    def connect(self, **kwargs):
+        sim = _current["client"]
+        if sim is None or sim.killed:
+            raise ElementNotFoundError("模拟客户端未启动")
+        self._sim = sim
+        return self
+
+    def start(self, cmd_line, **kwargs):
+        return self.connect()
+
+    def top_window(self):
+        window = self._sim.top_window()
+        return WindowSpecification(self._sim, None, {"handle": window.handle})
+
+    def window(self, **criteria):
+        return WindowSpecification(self._sim, None, criteria)
+
+    def windows(self, **criteria):
+        with self._sim.lock:
+            return self._sim.find_all(None, criteria)
+
+    def kill(self):
+        self._sim.killed = True
+
+
+def _clipboard_get_data(format_id=None):
+    sim = _current["client"]
+    sim.message()
+    return sim.clipboard
+
+
+def _clipboard_empty():
+    sim = _current["client"]
+    sim.message()
+    sim.clipboard = ""
+
+
+def _send_keys(keys, *args, **kwargs):
+    sim = _current["client"]
+    sim.top_window().type_keys(keys)
+
+
+def _window_by_handle(handle):
+    window = _windows.get(handle)
+    if window is None:
+        raise ElementNotFoundError(handle)
+    return window
+
+
+def _iswindow(handle):
+    window = _windows.get(handle)
+    return window is not None and not window.destroyed
+
+
+def _isvisible(handle):
+    return _iswindow(handle) and _windows[handle].showing()
+
+
+def _find_window(**criteria):
+    found = _current["client"].find_all(None, criteria)
+    index = criteria.get("found_index", 0)
+    if len(found) <= index:
+        raise ElementNotFoundError(criteria)
+    return found[index].handle
+
+
+def _set_foreground_window(window):
+    _current["client"].action()
+    return True
+
+
+def _show_window(window, cmd):
+    _current["client"].action()
+    return True
+
+
+def _build_modules():
+    pywinauto = types.ModuleType("pywinauto")
+    pywinauto.__path__ = []
+    pywinauto.Application = Application
+    pywinauto.WindowSpecification = WindowSpecification
+
+    findwindows = types.ModuleType("pywinauto.findwindows")
+    findwindows.ElementNotFoundError = ElementNotFoundError
+    findwindows.ElementAmbiguousError = ElementAmbiguousError
+    findwindows.WindowNotFoundError = WindowNotFoundError
+    findwindows.find_window = _find_window
+
+    timings = types.ModuleType("pywinauto.timings")
+    timings.TimeoutError = SimTimeoutError
+
+    handleprops = types.ModuleType("pywinauto.handleprops")
+    handleprops.iswindow = _iswindow
+    handleprops.isvisible = _isvisible
+    handleprops.controlid = lambda handle: _window_by_handle(handle).ctrl_id
+    handleprops.classname = lambda handle: _window_by_handle(handle).cls
+    handleprops.text = lambda handle: _window_by_handle(handle).title
+
+    clipboard = types.ModuleType("pywinauto.clipboard")
+    clipboard.GetData = _clipboard_get_data
+    clipboard.EmptyClipboard = _clipboard_empty
+
+    keyboard = types.ModuleType("pywinauto.keyboard")
+    keyboard.SendKeys = _send_keys
+    keyboard.send_keys = _send_keys
+
+    win32defines = types.ModuleType("pywinauto.win32defines")
+    win32defines.WS_MINIMIZE = WS_MINIMIZE
+    win32defines.WM_COMMAND = WM_COMMAND
+
+    win32functions = types.ModuleType("pywinauto.win32functions")
+    win32functions.SetForegroundWindow = _set_foreground_window
+    win32functions.ShowWindow = _show_window
+
+    modules = {
+        "findwindows": findwindows,
+        "timings": timings,
+        "handleprops": handleprops,
+        "clipboard": clipboard,
+        "keyboard": keyboard,
+        "win32defines": win32defines,
+        "win32functions": win32functions,
+    }
+    for name, module in modules.items():
+        setattr(pywinauto, name, module)
+    modules = {"pywinauto." + name: module for name, module in modules.items()}
+    modules["pywinauto"] = pywinauto
+    return modules
+
+
+def install(sim=None):
+    """
+    以模拟的 pywinauto 替换 sys.modules 中的 pywinauto，需要在导入 easytrader 的客户端模块之前调用
+    :param sim: 之后 Application().connect 连接的模拟客户端，可以多次调用 install 切换
+    """
+    if not getattr(sys.modules.get("pywinauto"), "__winsim__", False):
+        modules = _build_modules()
+        modules["pywinauto"].__winsim__ = True
+        sys.modules.update(modules)
+    _current["client"] = sim
+    return sim
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from easytrader.log import logger
+from easytrader.utils.scheduler import PollScheduler
+
+if TYPE_CHECKING:
+    # pylint: disable=unused-import
+    from easytrader.follower import BaseFollower
+
+
+class AsyncStrategyTracker:
+    """
+    在单个 asyncio 事件循环中轮询 follower 的全部策略。
+    所有策略共用一个 aiohttp 连接池，并通过信号量限制同时进行的请求数，
+    查询到的调仓记录与线程跟踪方式一样通过 follower.dispatch_transactions 发送到交易队列。
+    """
+
+    # 查询失败后等待多少秒再重试
+    ERROR_RETRY_SECONDS = 3
+
+    def __init__(
+        self,
+        follower: "BaseFollower",
+        max_concurrency=20,
+        scheduler: Optional[PollScheduler] = None,
+    ):
+        """
+        :param follower: 使用该 tracker 的 follower
+        :param max_concurrency: 同时进行的最大请求数
+        :param scheduler: 按交易时段调整轮询间隔的调度器，为 None 时使用固定的轮询间隔
+        """
+        self._follower = follower
+        self.max_concurrency = max_concurrency
+        self.scheduler = scheduler
+        self._loop = None
+        self._stopped = False
+
+    def start(self, strategies, interval) -> threading.Thread:
+        """
+        在新线程中运行事件循环
+        :param strategies: [(策略id, 策略名字, 传给 query_strategy_transaction 的参数字典)]
+        :param interval: 轮询策略的时间间隔，单位为秒
+        :return: 运行事件循环的线程
+        """
+        worker = threading.Thread(target=self.run, args=[strategies, interval])
+        worker.start()
+        return worker
+
+    def run(self, strategies, interval):
+        """在当前线程运行事件循环，直到调用 stop"""
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._track_all(strategies, interval))
+        finally:
+            self._loop.close()
+
+    def stop(self):
+        self._stopped = True
+
+    def _create_session(self):
+        try:
+            import aiohttp
+        except ImportError:
+            logger.error("使用 asyncio 跟踪策略需要安装 aiohttp, 请执行 pip install easytrader[async] 安装")
+            raise
+
+        headers = {
+            key: value
+            for key, value in self._follower.s.headers.items()
+            if key.lower() != "accept-encoding"
+        }
+        cookies = {cookie.name: cookie.value for cookie in self._follower.s.cookies}
+        connector = aiohttp.TCPConnector(
+            ssl=None if self._follower.s.verify else False,
+            limit=self.max_concurrency,
+        )
+        return aiohttp.ClientSession(
+            headers=headers, cookies=cookies, connector=connector
+        )
+
+    async def _track_all(self, strategies, interval):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._create_session() as session:
+            tasks = []
+            for i, (strategy, name, kwargs) in enumerate(strategies):
+                # 错开各策略的首次轮询时间，避免请求集中在同一时刻
+                delay = interval * i / len(strategies)
+                tasks.append(
+                    self._track(
+                        session, semaphore, strategy, name, interval, delay, kwargs
+                    )
+                )
+                logger.info("开始跟踪策略: %s", name)
+            await asyncio.gather(*tasks)
+
+    async def _track(
+        self, session, semaphore, strategy, name, interval, delay, kwargs
+    ):
+        await asyncio.sleep(delay)
+        loop = asyncio.get_event_loop()
+        errors = 0
+        while not self._stopped:
+            started = loop.time()
+            try:
+                async with semaphore:
+                    transactions = await self._follower.async_query_strategy_transaction(
+                        session, strategy, **kwargs
+                    )
+            # pylint: disable=broad-except
+            except Exception as e:
+                logger.exception("无法获取策略 %s 调仓信息, 错误: %s, 跳过此次调仓查询", name, e)
+                errors += 1
+                await asyncio.sleep(
+                    self.scheduler.error_delay(errors)
+                    if self.scheduler
+                    else self.ERROR_RETRY_SECONDS
+                )
+                continue
+            errors = 0
+            self._follower.dispatch_transactions(strategy, name, transactions)
+            delay = self.scheduler.next_delay() if self.scheduler else interval
+            await asyncio.sleep(max(0.0, delay - (loop.time() - started)))
@@ -1,25 +1,37 @@
 # -*- coding: utf-8 -*-
 import abc
+import copy
+import datetime
 import functools
 import logging
 import os
 import re
 import sys
+import threading
 import time
 from typing import Type, Union
 
 import hashlib, binascii
 
 import easyutils
-from pywinauto import findwindows, timings
-
-from easytrader import grid_strategies, pop_dialog_handler, refresh_strategies
+from pywinauto import findwindows, handleprops, timings
+
+from easytrader import (
+    exceptions,
+    grid_strategies,
+    pop_dialog_handler,
+    refresh_strategies,
+)
 from easytrader.config import client
 from easytrader.grid_strategies import IGridStrategy
 from easytrader.log import logger
 from easytrader.refresh_strategies import IRefreshStrategy
+from easytrader.utils.control_registry import ControlRegistry
+from easytrader.utils.grid_diff import GridChanges, GridDiffer
 from easytrader.utils.misc import file2dict
-from easytrader.utils.perf import perf_clock
+from easytrader.utils.perf import LatencyRecorder, perf_clock, trace_latency
+from easytrader.utils.state_cache import StateCache
+from easytrader.utils.wait import wait_until, wait_window_closed
 
 if not sys.platform.startswith("darwin"):
     import pywinauto
@@ -49,22 +61,75 @@ class IClientTrader(abc.ABC):
         """Wait for operation return"""
         pass
 
+    def wait_until(self, condition, timeout: float):
+        """
+        轮询 condition 直到返回真值或超时
+        :return: condition 最后一次的返回值
+        """
+        return wait_until(condition, timeout)
+
+    def get_control(self, control_id: int, class_name: str):
+        """
+        获取主窗口中指定 id 和类名的控件
+        """
+        return self.main.child_window(control_id=control_id, class_name=class_name)
+
     @abc.abstractmethod
     def refresh(self):
         """Refresh data"""
         pass
 
     @abc.abstractmethod
-    def is_exist_pop_dialog(self):
+    def is_exist_pop_dialog(self, timeout=None):
+        """
+        等待弹窗出现
+        :param timeout: 最长等待时间，单位为秒
+        """
         pass
 
 
+def invalidate_state_cache(f):
+    """
+    交易会改变持仓、资金和委托，交易期间独占客户端界面，交易结束后作废账户状态缓存
+    需要放在 trace_latency 外层，记录的交易耗时不包含等待其他线程界面操作的时间
+    """
+
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        with self._gui_lock:
+            try:
+                return f(self, *args, **kwargs)
+            finally:
+                self._trade_generation += 1
+                if self._state_cache is not None:
+                    self._state_cache.invalidate()
+
+    return wrapper
+
+
 class ClientTrader(IClientTrader):
     _editor_need_type_keys = False
     # The strategy to use for getting grid data
     grid_strategy: Union[IGridStrategy, Type[IGridStrategy]] = grid_strategies.Copy
     _grid_strategy_instance: IGridStrategy = None
     refresh_strategy: IRefreshStrategy = refresh_strategies.Switch()
+    # 等待弹窗出现的最长时间，单位为秒
+    pop_dialog_timeout = 0.5
+    # 等待输入框内容生效的最长时间，单位为秒
+    edit_commit_timeout = 0.2
+    # 等待输入证券代码后自动填入价格的最长时间，单位为秒
+    quote_load_timeout = 1.0
+    # 价格输入框的内容保持不变超过该秒数时，视为自动填入的价格与原来相同
+    quote_settle_time = 0.2
+    # 开启账户状态缓存时各字段默认的缓存有效秒数
+    DEFAULT_STATE_CACHE_TTLS = {
+        "balance": 1.0,
+        "position": 1.0,
+        "today_entrusts": 1.0,
+        "today_trades": 1.0,
+        "cancel_entrusts": 0.5,
+    }
+    _state_cache: StateCache = None
 
     def enable_type_keys_for_editor(self):
         """
@@ -72,6 +137,57 @@ class ClientTrader(IClientTrader):
         """
         self._editor_need_type_keys = True
 
+    def enable_state_cache(self, ttls=None, stale_ttl=0.0):
+        """
+        开启账户状态缓存，缓存有效期内读取 balance, position, today_entrusts, today_trades, cancel_entrusts
+        不再操作客户端界面，下单、撤单、申购新股后缓存自动作废
+        :param ttls: {字段: 缓存有效秒数}, 未指定的字段使用 DEFAULT_STATE_CACHE_TTLS
+        :param stale_ttl: 缓存过期后仍可返回旧值并在后台刷新的秒数，默认为 0 即过期后同步读取
+        """
+        self._state_cache = StateCache(
+            dict(self.DEFAULT_STATE_CACHE_TTLS, **(ttls or {})),
+            stale_ttl,
+            refresh_executor=self._gui_executor,
+        )
+
+    def disable_state_cache(self):
+        self._state_cache = None
+
+    def set_gui_executor(self, executor):
+        """
+        指定执行界面操作的执行器，账户状态缓存的后台刷新也提交给该执行器，与下单等操作依次执行
+        :param executor: GuiExecutor, 为 None 时后台刷新在单独的线程中执行
+        """
+        self._gui_executor = executor
+        if self._state_cache is not None:
+            self._state_cache.refresh_executor = executor
+
+    def _read_state(self, field, loader, strict=False):
+        """
+        读取账户状态，开启缓存时优先使用缓存，读取表格失败的结果不写入缓存
+        :param field: 字段名
+        :param loader: 从客户端读取字段的函数
+        :param strict: 读取表格失败时抛出 exceptions.GridReadError, 否则与表格策略一样返回空列表
+        """
+
+        def load():
+            with self._gui_lock:
+                strategy = self.grid_strategy_instance
+                strategy.last_read_failed = False
+                value = loader()
+                if getattr(strategy, "last_read_failed", False):
+                    raise exceptions.GridReadError("读取 {} 表格失败".format(field))
+                return value
+
+        try:
+            if self._state_cache is None:
+                return load()
+            return self._state_cache.get(field, load)
+        except exceptions.GridReadError:
+            if strict:
+                raise
+            return []
+
     @property
     def grid_strategy_instance(self):
         if self._grid_strategy_instance is None:
@@ -88,6 +204,20 @@ class ClientTrader(IClientTrader):
         self._app = None
         self._main = None
         self._toolbar = None
+        self._controls = ControlRegistry(self._resolve_control, self._is_control_valid)
+        # 当前显示的左侧菜单 (菜单路径, 菜单项)
+        self._current_menu = None
+        # 客户端界面同一时间只能执行一个操作，后台刷新缓存和交易通过该锁互斥
+        self._gui_lock = threading.RLock()
+        # 执行界面操作的 GuiExecutor, 由 ThreadSafeTrader 设置
+        self._gui_executor = None
+        # 交易次数，用于判断账户状态是否可能发生了变化
+        self._trade_generation = 0
+        # 上次快照各页面的数据 {菜单路径: (交易次数, 读取时间, {字段: 数据})}
+        self._snapshot_panels = {}
+        # 最近交易各阶段的耗时
+        self.latency = LatencyRecorder()
+        self._grid_differ = GridDiffer()
 
     @property
     def app(self):
@@ -124,57 +254,224 @@ class ClientTrader(IClientTrader):
 
     @property
     def balance(self):
+        return self._read_state("balance", self._get_balance)
+
+    def _get_balance(self):
         self._switch_left_menus(["查询[F4]", "资金股票"])
 
         return self._get_balance_from_statics()
 
     def _init_toolbar(self):
         self._toolbar = self._main.child_window(class_name="ToolbarWindow32")
+        # 重新连接或登陆后主窗口已经变化，之前缓存的控件和菜单状态全部作废
+        self._controls.invalidate()
+        self._current_menu = None
+
+    def get_control(self, control_id, class_name):
+        """
+        获取主窗口中的控件，控件在首次使用时查找并缓存，句柄失效后才重新查找
+        :param control_id: 控件 id
+        :param class_name: 控件类名
+        """
+        return self._controls.get(control_id, class_name)
+
+    def _resolve_control(self, control_id, class_name):
+        return self._main.child_window(
+            control_id=control_id, class_name=class_name
+        ).wrapper_object()
+
+    @staticmethod
+    def _is_control_valid(control, control_id):
+        """
+        买入、卖出等页面的控件 id 相同，切换页面后原来的控件被隐藏，此时需要重新查找
+        """
+        handle = control.handle
+        return (
+            handleprops.iswindow(handle)
+            and handleprops.isvisible(handle)
+            and handleprops.controlid(handle) == control_id
+        )
 
     def _get_balance_from_statics(self):
         result = {}
         for key, control_id in self._config.BALANCE_CONTROL_ID_GROUP.items():
             result[key] = float(
-                self._main.child_window(
-                    control_id=control_id, class_name="Static"
-                ).window_text()
+                self.get_control(control_id, "Static").window_text()
             )
         return result
 
     @property
     def position(self):
+        return self._read_state("position", self._get_position)
+
+    def _get_position(self):
         self._switch_left_menus(["查询[F4]", "资金股票"])
 
         return self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
 
     @property
     def today_entrusts(self):
+        return self._read_state("today_entrusts", self._get_today_entrusts)
+
+    def _get_today_entrusts(self):
         self._switch_left_menus(["查询[F4]", "当日委托"])
 
         return self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
 
     @property
     def today_trades(self):
+        return self._read_state("today_trades", self._get_today_trades)
+
+    def _get_today_trades(self):
         self._switch_left_menus(["查询[F4]", "当日成交"])
 
         return self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
 
+    def today_entrusts_changes(self) -> GridChanges:
+        """
+        与上次调用相比当日委托的变化，第一次调用时全部委托视为新增
+        :return: GridChanges(added=新增的委托, changed=[(旧数据, 新数据)] 状态等发生变化的委托, removed=消失的委托)
+        :raises exceptions.GridReadError: 读取表格失败，此时不更新上次的数据
+        """
+        return self._update_grid_changes(
+            "today_entrusts",
+            self._get_today_entrusts,
+            self._config.TODAY_ENTRUSTS_KEY_FIELDS,
+        )
+
+    def today_trades_changes(self) -> GridChanges:
+        """
+        与上次调用相比当日成交的变化，第一次调用时全部成交视为新增
+        :return: GridChanges(added=新增的成交, changed=[(旧数据, 新数据)], removed=消失的成交)
+        :raises exceptions.GridReadError: 读取表格失败，此时不更新上次的数据
+        """
+        return self._update_grid_changes(
+            "today_trades",
+            self._get_today_trades,
+            self._config.TODAY_TRADES_KEY_FIELDS,
+        )
+
+    def _update_grid_changes(self, name, loader, key_fields):
+        # 读取失败时表格策略返回空列表，不能当作全部记录消失
+        rows = self._read_state(name, loader, strict=True)
+        return self._grid_differ.update(name, rows, key_fields)
+
     @property
     def cancel_entrusts(self):
+        return self._read_state("cancel_entrusts", self._get_cancel_entrusts)
+
+    def _get_cancel_entrusts(self):
         self.refresh()
         self._switch_left_menus(["撤单[F3]"])
 
         return self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
 
     @perf_clock
+    def snapshot(self, reuse_max_age=None):
+        """
+        一次性读取资金、持仓、当日委托和当日成交，同一页面上的数据只切换一次菜单
+        :param reuse_max_age: 设置后，上次快照以来没有交易且读取时间不超过该秒数的页面直接复用上次的数据
+        :return: {'timestamp': 读取完成时间, 'balance': 资金, 'position': 持仓,
+                  'today_entrusts': 当日委托, 'today_trades': 当日成交, 'reused': [复用上次数据的字段]}
+        """
+        readers = self._snapshot_readers()
+        panels = {}
+        for field, (path, _) in readers.items():
+            panels.setdefault(tuple(path), []).append(field)
+
+        result = {}
+        reused = []
+        with self._gui_lock:
+            # 先读取当前显示的页面，少切换一次菜单
+            paths = sorted(panels, key=lambda path: not self._is_current_menu(path))
+            for path in paths:
+                fields = panels[path]
+                previous = self._snapshot_panels.get(path)
+                if (
+                    reuse_max_age is not None
+                    and previous is not None
+                    and previous[0] == self._trade_generation
+                    and time.monotonic() - previous[1] <= reuse_max_age
+                ):
+                    result.update(copy.deepcopy(previous[2]))
+                    reused.extend(fields)
+                    continue
+
+                self._switch_left_menus(list(path))
+                data = {field: readers[field][1]() for field in fields}
+                self._snapshot_panels[path] = (
+                    self._trade_generation,
+                    time.monotonic(),
+                    copy.deepcopy(data),
+                )
+                result.update(data)
+
+        result["timestamp"] = datetime.datetime.now()
+        result["reused"] = reused
+        return result
+
+    def _snapshot_readers(self):
+        """
+        快照各字段所在的菜单和读取方法，读取方法只读取当前页面，不切换菜单
+        :return: {字段: (菜单路径, 读取方法)}
+        """
+        read_grid = functools.partial(
+            self._get_grid_data, self._config.COMMON_GRID_CONTROL_ID
+        )
+        return {
+            "balance": (self._config.BALANCE_MENU_PATH, self._get_balance_from_statics),
+            "position": (self._config.POSITION_MENU_PATH, read_grid),
+            "today_entrusts": (self._config.TODAY_ENTRUSTS_MENU_PATH, read_grid),
+            "today_trades": (self._config.TODAY_TRADES_MENU_PATH, read_grid),
+        }
+
+    @perf_clock
+    @invalidate_state_cache
+    @trace_latency
     def cancel_entrust(self, entrust_no):
-        self.refresh()
-        for i, entrust in enumerate(self.cancel_entrusts):
+        # 撤单需要点击界面上的表格，不能使用缓存
+        with self.latency.phase("read_grid"):
+            entrusts = self._get_cancel_entrusts()
+        for i, entrust in enumerate(entrusts):
             if entrust[self._config.CANCEL_ENTRUST_ENTRUST_FIELD] == entrust_no:
-                self._cancel_entrust_by_double_click(i)
+                with self.latency.phase("double_click"):
+                    self._cancel_entrust_by_double_click(i)
                 return self._handle_pop_dialogs()
         return {"message": "委托单状态错误不能撤单, 该委托单可能已经成交或者已撤"}
 
+    @perf_clock
+    @invalidate_state_cache
+    def cancel_entrusts_bulk(self, entrust_nos):
+        """
+        批量撤单，撤单表格只读取一次
+        :param entrust_nos: 委托单号列表
+        :return: {委托单号: 撤单结果}
+        """
+        rows = {}
+        for i, entrust in enumerate(self._get_cancel_entrusts()):
+            rows[str(entrust[self._config.CANCEL_ENTRUST_ENTRUST_FIELD])] = i
+
+        results = {}
+        # {行号: [委托单号]}, 重复的委托单号只撤一次，否则第二次会撤掉移到该行的其他委托
+        found = {}
+        for entrust_no in dict.fromkeys(entrust_nos):
+            row = rows.get(str(entrust_no))
+            if row is None:
+                results[entrust_no] = {
+                    "message": "委托单状态错误不能撤单, 该委托单可能已经成交或者已撤"
+                }
+            else:
+                found.setdefault(row, []).append(entrust_no)
+
+        # 从下往上撤单，撤单后表格中的行即使被移除也不影响上方委托所在的行
+        for row in sorted(found, reverse=True):
+            self._cancel_entrust_by_double_click(row)
+            result = self._handle_pop_dialogs()
+            for entrust_no in found[row]:
+                results[entrust_no] = result
+        return {entrust_no: results[entrust_no] for entrust_no in entrust_nos}
+
+    @invalidate_state_cache
     def cancel_all_entrusts(self):
         self.refresh()
         self._switch_left_menus(["撤单[F3]"])
@@ -183,7 +480,6 @@ class ClientTrader(IClientTrader):
         self._app.top_window().child_window(
             control_id=self._config.TRADE_CANCEL_ALL_ENTRUST_CONTROL_ID, class_name="Button", title_re="""全撤.*"""
         ).click()
-        self.wait(0.2)
 
         # 等待出现 确认兑换框
         if self.is_exist_pop_dialog():
@@ -192,37 +488,48 @@ class ClientTrader(IClientTrader):
             if w is not None:
                 btn = w["是(Y)"]
                 if btn is not None:
+                    dialog = w.wrapper_object()
                     btn.click()
-                    self.wait(0.2)
+                    wait_window_closed(dialog, self.pop_dialog_timeout)
 
         # 如果出现了确认窗口
         self.close_pop_dialog()
 
     @perf_clock
+    @invalidate_state_cache
+    @trace_latency
     def repo(self, security, price, amount, **kwargs):
         self._switch_left_menus(["债券回购", "融资回购（正回购）"])
 
         return self.trade(security, price, amount)
 
     @perf_clock
+    @invalidate_state_cache
+    @trace_latency
     def reverse_repo(self, security, price, amount, **kwargs):
         self._switch_left_menus(["债券回购", "融劵回购（逆回购）"])
 
         return self.trade(security, price, amount)
 
     @perf_clock
+    @invalidate_state_cache
+    @trace_latency
     def buy(self, security, price, amount, **kwargs):
         self._switch_left_menus(["买入[F1]"])
 
         return self.trade(security, price, amount)
 
     @perf_clock
+    @invalidate_state_cache
+    @trace_latency
     def sell(self, security, price, amount, **kwargs):
         self._switch_left_menus(["卖出[F2]"])
 
         return self.trade(security, price, amount)
 
     @perf_clock
+    @invalidate_state_cache
+    @trace_latency
     def market_buy(self, security, amount, ttype=None, limit_price=None, **kwargs):
         """
         市价买入
@@ -240,6 +547,8 @@ class ClientTrader(IClientTrader):
         return self.market_trade(security, amount, ttype, limit_price=limit_price)
 
     @perf_clock
+    @invalidate_state_cache
+    @trace_latency
     def market_sell(self, security, amount, ttype=None, limit_price=None, **kwargs):
         """
         市价卖出
@@ -255,6 +564,8 @@ class ClientTrader(IClientTrader):
 
         return self.market_trade(security, amount, ttype, limit_price=limit_price)
 
+    @invalidate_state_cache
+    @trace_latency
     def market_trade(self, security, amount, ttype=None, limit_price=None, **kwargs):
         """
         市价交易
@@ -267,18 +578,12 @@ class ClientTrader(IClientTrader):
         :return: {'entrust_no': '委托单号'}
         """
         code = security[-6:]
-        self._type_edit_control_keys(self._config.TRADE_SECURITY_CONTROL_ID, code)
-        if ttype is not None:
-            retry = 0
-            retry_max = 10
-            while retry < retry_max:
-                try:
-                    self._set_market_trade_type(ttype)
-                    break
-                except:
-                    retry += 1
-                    self.wait(0.1)
-        self._set_market_trade_params(security, amount, limit_price=limit_price)
+        with self.latency.phase("set_params"):
+            self._type_edit_control_keys(self._config.TRADE_SECURITY_CONTROL_ID, code)
+            if ttype is not None:
+                # 输入证券代码后需要等待客户端加载出市价委托类型
+                self.wait_until(lambda: self._set_market_trade_type(ttype) or True, 1)
+            self._set_market_trade_params(security, amount, limit_price=limit_price)
         self._submit_trade()
 
         return self._handle_pop_dialogs(
@@ -287,8 +592,8 @@ class ClientTrader(IClientTrader):
 
     def _set_market_trade_type(self, ttype):
         """根据选择的市价交易类型选择对应的下拉选项"""
-        selects = self._main.child_window(
-            control_id=self._config.TRADE_MARKET_TYPE_CONTROL_ID, class_name="ComboBox"
+        selects = self.get_control(
+            self._config.TRADE_MARKET_TYPE_CONTROL_ID, "ComboBox"
         )
         for i, text in enumerate(selects.texts()):
             # skip 0 index, because 0 index is current select index
@@ -304,8 +609,8 @@ class ClientTrader(IClientTrader):
 
     def _set_stock_exchange_type(self, ttype):
         """根据选择的市价交易类型选择对应的下拉选项"""
-        selects = self._main.child_window(
-            control_id=self._config.TRADE_STOCK_EXCHANGE_CONTROL_ID, class_name="ComboBox"
+        selects = self.get_control(
+            self._config.TRADE_STOCK_EXCHANGE_CONTROL_ID, "ComboBox"
         )
 
         for i, text in enumerate(selects.texts()):
@@ -320,6 +625,7 @@ class ClientTrader(IClientTrader):
                 return
         raise TypeError("不支持对应的市场类型: {}".format(ttype))
 
+    @invalidate_state_cache
     def auto_ipo(self):
         self._switch_left_menus(self._config.AUTO_IPO_MENU_PATH)
 
@@ -352,14 +658,21 @@ class ClientTrader(IClientTrader):
             self._config.COMMON_GRID_FIRST_ROW_HEIGHT
             + self._config.COMMON_GRID_ROW_HEIGHT * row
         )
-        self._app.top_window().child_window(
-            control_id=self._config.COMMON_GRID_CONTROL_ID,
-            class_name="CVirtualGridCtrl",
+        self.get_control(
+            self._config.COMMON_GRID_CONTROL_ID, "CVirtualGridCtrl"
         ).click(coords=(x, y))
 
     @perf_clock
-    def is_exist_pop_dialog(self):
-        self.wait(0.5)  # wait dialog display
+    def is_exist_pop_dialog(self, timeout=None):
+        """
+        等待弹窗出现，弹窗出现后立即返回
+        :param timeout: 最长等待时间，单位为秒，默认为 pop_dialog_timeout
+        """
+        if timeout is None:
+            timeout = self.pop_dialog_timeout
+        return bool(self.wait_until(self._has_pop_dialog, timeout))
+
+    def _has_pop_dialog(self):
         try:
             return (
                 self._main.wrapper_object() != self._app.top_window().wrapper_object()
@@ -368,8 +681,8 @@ class ClientTrader(IClientTrader):
             findwindows.ElementNotFoundError,
             timings.TimeoutError,
             RuntimeError,
-        ) as ex:
-            logger.exception("check pop dialog timeout")
+        ):
+            logger.debug("check pop dialog failed", exc_info=True)
             return False
 
     @perf_clock
@@ -378,8 +691,9 @@ class ClientTrader(IClientTrader):
             if self._main.wrapper_object() != self._app.top_window().wrapper_object():
                 w = self._app.top_window()
                 if w is not None:
+                    dialog = w.wrapper_object()
                     w.close()
-                    self.wait(0.2)
+                    wait_window_closed(dialog, 0.2)
         except (
                 findwindows.ElementNotFoundError,
                 timings.TimeoutError,
@@ -396,23 +710,40 @@ class ClientTrader(IClientTrader):
     def exit(self):
         self._app.kill()
 
-    def _close_prompt_windows(self):
-        self.wait(1)
-        for window in self._app.windows(class_name="#32770", visible_only=True):
-            title = window.window_text()
-            if title != self._config.TITLE:
-                logging.info("close window %s" % title)
+    def _get_prompt_windows(self):
+        return [
+            window
+            for window in self._app.windows(class_name="#32770", visible_only=True)
+            if window.window_text() != self._config.TITLE
+        ]
+
+    def _close_prompt_windows(self, timeout=1, max_rounds=5):
+        """
+        关闭登录后弹出的提示窗口
+        :param timeout: 等待提示窗口弹出的最长时间，单位为秒
+        :param max_rounds: 最多关闭几轮陆续弹出的提示窗口
+        """
+        windows = self.wait_until(self._get_prompt_windows, timeout)
+        for _ in range(max_rounds):
+            if not windows:
+                break
+            for window in windows:
+                logging.info("close window %s" % window.window_text())
                 window.close()
-                self.wait(0.2)
-        self.wait(1)
+                wait_window_closed(window, 0.2)
+            # 关闭后可能还会陆续弹出新的提示窗口
+            windows = self.wait_until(self._get_prompt_windows, 0.2)
 
     def close_pormpt_window_no_wait(self):
         for window in self._app.windows(class_name="#32770"):
             if window.window_text() != self._config.TITLE:
                 window.close()
 
+    @invalidate_state_cache
+    @trace_latency
     def trade(self, security, price, amount):
-        self._set_trade_params(security, price, amount)
+        with self.latency.phase("set_params"):
+            self._set_trade_params(security, price, amount)
 
         self._submit_trade()
 
@@ -420,17 +751,75 @@ class ClientTrader(IClientTrader):
             handler_class=pop_dialog_handler.TradePopDialogHandler
         )
 
+    @perf_clock
+    @invalidate_state_cache
+    def batch_trade(self, orders, stop_on_error=False):
+        """
+        批量下单，连续的同方向委托共用已打开的交易页面，交易所与上一笔委托相同时不再重新选择
+        :param orders: 委托列表 [{'action': 'buy' 或 'sell', 'security': 证券代码, 'price': 价格, 'amount': 数量}]
+        :param stop_on_error: 某笔委托失败后是否放弃剩余的委托
+        :return: 与 orders 一一对应的结果列表，成功为 {'entrust_no': '委托单号'}，
+                 失败为 {'error': '失败原因'}，未执行为 None
+        """
+        menus = {"buy": ["买入[F1]"], "sell": ["卖出[F2]"]}
+        results = [None] * len(orders)
+        start = time.monotonic()
+        action = exchange = None
+        for i, order in enumerate(orders):
+            try:
+                if order["action"] not in menus:
+                    raise ValueError("不支持的交易类型: {}".format(order["action"]))
+                if order["action"] != action:
+                    self._switch_left_menus(menus[order["action"]])
+                    action = order["action"]
+                    exchange = None
+
+                security = order["security"]
+                order_exchange = self._get_stock_exchange_type(security)
+                with self.latency.trace(order["action"]):
+                    with self.latency.phase("set_params"):
+                        self._set_trade_params(
+                            security,
+                            order["price"],
+                            order["amount"],
+                            select_exchange=order_exchange != exchange,
+                        )
+                    exchange = order_exchange
+                    self._submit_trade()
+                    results[i] = self._handle_pop_dialogs(
+                        handler_class=pop_dialog_handler.TradePopDialogHandler
+                    )
+            # pylint: disable=broad-except
+            except Exception as ex:
+                logger.exception("批量下单第 %s 笔委托 %s 失败", i + 1, order)
+                results[i] = {"error": str(ex)}
+                # 失败后交易页面的状态未知，下一笔委托重新切换页面
+                action = exchange = None
+                self.close_pop_dialog()
+                if stop_on_error:
+                    break
+
+        elapsed = time.monotonic() - start
+        succeeded = sum(1 for r in results if r is not None and "error" not in r)
+        logger.info(
+            "批量下单 %s 笔, 成功 %s 笔, 耗时 %.2f 秒, %.1f 笔/秒",
+            len(orders),
+            succeeded,
+            elapsed,
+            len(orders) / elapsed if elapsed > 0 else 0.0,
+        )
+        return results
+
     def _click(self, control_id):
-        self._app.top_window().child_window(
-            control_id=control_id, class_name="Button"
-        ).click()
+        self.get_control(control_id, "Button").click()
 
     @perf_clock
     def _submit_trade(self):
-        time.sleep(0.2)
-        self._main.child_window(
-            control_id=self._config.TRADE_SUBMIT_CONTROL_ID, class_name="Button"
-        ).click()
+        with self.latency.phase("submit"):
+            button = self.get_control(self._config.TRADE_SUBMIT_CONTROL_ID, "Button")
+            # 等待客户端校验完委托参数后下单按钮可用
+            self.wait_until(lambda: button.is_enabled(), self.edit_commit_timeout)
+            button.click()
 
     @perf_clock
     def __get_top_window_pop_dialog(self):
@@ -446,40 +835,113 @@ class ClientTrader(IClientTrader):
             .window_text()
         )
 
-    def _set_trade_params(self, security, price, amount):
+    def _set_trade_params(self, security, price, amount, select_exchange=True):
+        """
+        :param select_exchange: 是否选择交易所，批量下单时交易所与上一笔委托相同可以跳过
+        """
         code = security[-6:]
 
-        self._type_edit_control_keys(self._config.TRADE_SECURITY_CONTROL_ID, code)
+        # 价格输入框中可能还是上一笔委托的价格，先清空，新证券的价格与之相同时也能识别出已经填入；
+        # 有的客户端无法清空，记录原来的价格用于判断
+        price_editor = self.get_control(self._config.TRADE_PRICE_CONTROL_ID, "Edit")
+        price_editor.set_edit_text("")
+        previous_price = price_editor.window_text()
 
-        # wait security input finish
-        self.wait(0.1)
+        self._type_edit_control_keys(self._config.TRADE_SECURITY_CONTROL_ID, code)
 
-        # 设置交易所
-        if security.lower().startswith("sz"):
-            self._set_stock_exchange_type("深圳Ａ股")
-        if security.lower().startswith("sh"):
-            self._set_stock_exchange_type("上海Ａ股")
+        # 设置交易所，输入证券代码后客户端加载完证券信息才能选择
+        exchange = self._get_stock_exchange_type(security)
+        if select_exchange and exchange is not None:
+            with self.latency.phase("select_exchange"):
+                self._select_stock_exchange_type(exchange)
 
-        self.wait(0.1)
+        # 客户端加载完证券信息后会自动填入当前价格，等待填入后再输入委托价格，避免被覆盖
+        with self.latency.phase("wait_quote"):
+            self._wait_quote_loaded(price_editor, previous_price)
 
-        self._type_edit_control_keys(
-            self._config.TRADE_PRICE_CONTROL_ID,
-            easyutils.round_price_by_code(price, code),
-        )
+        price = easyutils.round_price_by_code(price, code)
+        self._type_edit_control_keys(self._config.TRADE_PRICE_CONTROL_ID, price)
         self._type_edit_control_keys(
             self._config.TRADE_AMOUNT_CONTROL_ID, str(int(amount))
         )
+        self._check_trade_price(price_editor, price)
+
+    def _check_trade_price(self, price_editor, price):
+        """
+        下单前确认价格输入框中仍是输入的委托价格
+        自动填入的价格晚于输入时会覆盖委托价格，此时重新输入一次，仍然不一致时放弃下单
+        :param price_editor: 价格输入框
+        :param price: 输入的委托价格
+        :raises exceptions.TradeError: 价格输入框的内容与委托价格不一致
+        """
+        text = price_editor.window_text()
+        if self._is_same_price(text, price):
+            return
+        logger.warning("价格输入框的内容 %s 与委托价格 %s 不一致，重新输入", text, price)
+        self.type_edit_control_keys(price_editor, price)
+        text = price_editor.window_text()
+        if not self._is_same_price(text, price):
+            raise exceptions.TradeError(
+                "价格输入框的内容 {} 与委托价格 {} 不一致，放弃下单".format(text, price)
+            )
+
+    @staticmethod
+    def _is_same_price(text, price):
+        try:
+            return float(text) == float(price)
+        except ValueError:
+            return text == str(price)
+
+    def _wait_quote_loaded(self, price_editor, previous_price):
+        """
+        等待客户端自动填入新证券的价格
+        价格变为与输入证券代码前不同的非空值时视为已经填入；
+        没能清空原来的价格时新证券的价格可能与之相同，此时非空的内容保持不变超过
+        quote_settle_time 秒后同样视为已经填入
+        :param price_editor: 价格输入框
+        :param previous_price: 输入证券代码前价格输入框的内容
+        """
+        state = {"text": None, "since": 0.0}
+
+        def loaded():
+            text = price_editor.window_text()
+            if not text:
+                return False
+            if text != previous_price:
+                return True
+            now = time.monotonic()
+            if text != state["text"]:
+                state["text"], state["since"] = text, now
+                return False
+            return now - state["since"] >= self.quote_settle_time
+
+        return self.wait_until(loaded, self.quote_load_timeout)
+
+    @staticmethod
+    def _get_stock_exchange_type(security):
+        """根据证券代码的市场前缀获取交易所选项，没有前缀时返回 None"""
+        if security.lower().startswith("sz"):
+            return "深圳Ａ股"
+        if security.lower().startswith("sh"):
+            return "上海Ａ股"
+        return None
+
+    def _select_stock_exchange_type(self, ttype, timeout=0.5):
+        """等待客户端加载出交易所选项后选择，超时后仍无法选择时抛出 TypeError"""
+        if not self.wait_until(
+            lambda: self._set_stock_exchange_type(ttype) or True, timeout
+        ):
+            self._set_stock_exchange_type(ttype)
 
     def _set_market_trade_params(self, security, amount, limit_price=None):
         self._type_edit_control_keys(
             self._config.TRADE_AMOUNT_CONTROL_ID, str(int(amount))
         )
-        self.wait(0.1)
         price_control = None
         if str(security).startswith("68"):  # 科创板存在限价
             try:
-                price_control = self._main.child_window(
-                    control_id=self._config.TRADE_PRICE_CONTROL_ID, class_name="Edit"
+                price_control = self.get_control(
+                    self._config.TRADE_PRICE_CONTROL_ID, "Edit"
                 )
             except:
                 pass
@@ -490,19 +952,11 @@ class ClientTrader(IClientTrader):
         return self.grid_strategy_instance.get(control_id)
 
     def _type_keys(self, control_id, text):
-        self._main.child_window(control_id=control_id, class_name="Edit").set_edit_text(
-            text
-        )
+        self.get_control(control_id, "Edit").set_edit_text(text)
 
     def _type_edit_control_keys(self, control_id, text):
-        if not self._editor_need_type_keys:
-            self._main.child_window(
-                control_id=control_id, class_name="Edit"
-            ).set_edit_text(text)
-        else:
-            editor = self._main.child_window(control_id=control_id, class_name="Edit")
-            editor.select()
-            editor.type_keys(text)
+        editor = self.get_control(control_id, "Edit")
+        self.type_edit_control_keys(editor, text)
 
     def type_edit_control_keys(self, editor, text):
         if not self._editor_need_type_keys:
@@ -510,18 +964,68 @@ class ClientTrader(IClientTrader):
         else:
             editor.select()
             editor.type_keys(text)
+        # 等待输入框的内容生效
+        self.wait_until(
+            lambda: editor.window_text() == str(text), self.edit_commit_timeout
+        )
 
     def _collapse_left_menus(self):
+        self._current_menu = None
         items = self._get_left_menus_handle().roots()
         for item in items:
             item.collapse()
 
     @perf_clock
     def _switch_left_menus(self, path, sleep=0.2):
+        """
+        切换左侧菜单并刷新
+        :param path: 菜单路径
+        :param sleep: 等待切换完成的最长时间，单位为秒
+        """
+        with self.latency.phase("switch_menu"):
+            self._do_switch_left_menus(path, sleep)
+
+    def _do_switch_left_menus(self, path, sleep):
         self.close_pop_dialog()
-        self._get_left_menus_handle().get_item(path).select()
+        if self._is_current_menu(path):
+            # 已经显示目标页面，不需要重新选择菜单，只刷新数据
+            self._app.top_window().type_keys("{F5}")
+            self._wait_page_loaded(sleep)
+            return
+
+        self._current_menu = None
+        item = self._get_left_menus_handle().get_item(path)
+        item.select()
         self._app.top_window().type_keys('{F5}')
-        self.wait(sleep)
+        self._wait_page_loaded(sleep)
+        self._current_menu = (list(path), item)
+
+    def _wait_page_loaded(self, timeout):
+        """
+        等待切换页面或 F5 刷新完成
+        客户端加载页面和刷新数据期间主窗口不可用，看到主窗口变为不可用后再等待其恢复，
+        避免在表格重绘之前读到上一个页面或刷新前的数据。
+        timeout 秒内没有看到加载开始时视为已经加载完成，等同于原来固定等待 timeout 秒
+        :param timeout: 等待加载开始以及等待加载完成各自的最长时间，单位为秒
+        """
+        if self.wait_until(lambda: not self._main.is_enabled(), timeout):
+            self.wait_until(lambda: self._main.is_enabled(), timeout)
+
+    def _is_current_menu(self, path):
+        """
+        判断目标菜单是否就是当前显示的菜单
+        用户可能在客户端上手动切换过菜单，所以还需要确认记录的菜单项仍处于选中状态
+        """
+        if self._current_menu is None:
+            return False
+        current_path, item = self._current_menu
+        if current_path != list(path):
+            return False
+        try:
+            return item.is_selected()
+        # pylint: disable=broad-except
+        except Exception:
+            return False
 
     def _switch_left_menus_by_shortcut(self, shortcut, sleep=0.5):
         self.close_pop_dialog()
@@ -552,9 +1056,8 @@ class ClientTrader(IClientTrader):
             self._config.CANCEL_ENTRUST_GRID_FIRST_ROW_HEIGHT
             + self._config.CANCEL_ENTRUST_GRID_ROW_HEIGHT * row
         )
-        self._app.top_window().child_window(
-            control_id=self._config.COMMON_GRID_CONTROL_ID,
-            class_name="CVirtualGridCtrl",
+        self.get_control(
+            self._config.COMMON_GRID_CONTROL_ID, "CVirtualGridCtrl"
         ).double_click(coords=(x, y))
 
     def refresh(self):
@@ -565,13 +1068,19 @@ class ClientTrader(IClientTrader):
     def _handle_pop_dialogs(self, handler_class=pop_dialog_handler.PopDialogHandler):
         handler = handler_class(self._app)
 
-        while self.is_exist_pop_dialog():
+        while True:
+            with self.latency.phase("wait_dialog"):
+                exists = self.is_exist_pop_dialog()
+            if not exists:
+                break
             try:
                 title = self._get_pop_dialog_title()
             except pywinauto.findwindows.ElementNotFoundError:
                 return {"message": "success"}
 
-            result = handler.handle(title)
+            # 每个弹窗的处理耗时分别记录
+            with self.latency.phase("dialog:{}".format(title)):
+                result = handler.handle(title)
             if result:
                 return result
         return {"message": "success"}
@@ -70,6 +70,10 @@ class CommonConfig:
         "发生日期": str,
     }
 
+    # 当日委托、当日成交中识别同一行数据的列，用于比较两次查询之间的变化
+    TODAY_ENTRUSTS_KEY_FIELDS = ("合同编号",)
+    TODAY_TRADES_KEY_FIELDS = ("成交编号",)
+
     CANCEL_ENTRUST_ENTRUST_FIELD = "合同编号"
     CANCEL_ENTRUST_GRID_LEFT_MARGIN = 50
     CANCEL_ENTRUST_GRID_FIRST_ROW_HEIGHT = 30
@@ -1,18 +1,34 @@
 # -*- coding: utf-8 -*-
 import abc
+import asyncio
 import datetime
+import functools
 import os
 import pickle
 import queue
 import re
 import threading
 import time
-from typing import List
+from typing import List, NamedTuple, Optional
 
 import requests
 
 from easytrader import exceptions
 from easytrader.log import logger
+from easytrader.utils.cmd_journal import CmdJournal
+from easytrader.utils.cmd_store import ExpiredCmdStore
+from easytrader.utils.scheduler import PollScheduler
+from easytrader.utils.trade_queue import TradeCmdQueue
+
+
+class Transaction(NamedTuple):
+    """修整为统一格式的调仓记录"""
+
+    action: str
+    stock_code: str
+    amount: int
+    price: float
+    datetime: datetime.datetime
 
 
 class BaseFollower(metaclass=abc.ABCMeta):
@@ -23,13 +39,20 @@ class BaseFollower(metaclass=abc.ABCMeta):
     LOGIN_PAGE = ""
     LOGIN_API = ""
     TRANSACTION_API = ""
+    # 旧版本使用的 pickle 指令缓存，仅在加载时迁移到指令日志
     CMD_CACHE_FILE = "cmd_cache.pk"
+    CMD_JOURNAL_FILE = "cmd_cache.journal"
+    # 未指定时，指令缓存的保留时长为指令过期时间的倍数
+    CMD_CACHE_HORIZON_MULTIPLE = 5
+    # 指令日志中失效记录超过该数量且多于有效记录时压缩日志
+    CMD_JOURNAL_COMPACT_THRESHOLD = 1000
     WEB_REFERER = ""
     WEB_ORIGIN = ""
 
     def __init__(self):
         self.trade_queue = queue.Queue()
-        self.expired_cmds = set()
+        self.expired_cmds = ExpiredCmdStore()
+        self.cmd_journal = CmdJournal(self.CMD_JOURNAL_FILE)
 
         self.s = requests.Session()
         self.s.verify = False
@@ -94,6 +117,7 @@ class BaseFollower(metaclass=abc.ABCMeta):
         trade_cmd_expire_seconds=120,
         cmd_cache=True,
         slippage: float = 0.0,
+        cmd_cache_horizon=None,
         **kwargs
     ):
         """跟踪平台对应的模拟交易，支持多用户多策略
@@ -109,6 +133,8 @@ class BaseFollower(metaclass=abc.ABCMeta):
         :param trade_cmd_expire_seconds: 交易指令过期时间, 单位为秒
         :param cmd_cache: 是否读取存储历史执行过的指令，防止重启时重复执行已经交易过的指令
         :param slippage: 滑点，0.0 表示无滑点, 0.05 表示滑点为 5%
+        :param cmd_cache_horizon: 指令缓存的保留时长，单位为秒，默认为 trade_cmd_expire_seconds 的 5 倍，
+            产生时间超出保留时长的指令会被淘汰并视为已过期
         """
         self.slippage = slippage
 
@@ -125,10 +151,65 @@ class BaseFollower(metaclass=abc.ABCMeta):
             return price * (1 - self.slippage)
         return price
 
+    def prepare_cmd_cache(
+        self, cmd_cache, trade_cmd_expire_seconds, cmd_cache_horizon=None
+    ):
+        """
+        设置指令缓存的保留时长，并按需加载历史执行过的指令
+        :param cmd_cache: 是否读取存储历史执行过的指令
+        :param trade_cmd_expire_seconds: 交易指令过期时间, 单位为秒
+        :param cmd_cache_horizon: 指令缓存的保留时长，单位为秒
+        """
+        if cmd_cache_horizon is None:
+            cmd_cache_horizon = (
+                self.CMD_CACHE_HORIZON_MULTIPLE * trade_cmd_expire_seconds
+            )
+        self.expired_cmds.horizon = cmd_cache_horizon
+        if cmd_cache:
+            self.load_expired_cmd_cache()
+
     def load_expired_cmd_cache(self):
+        """回放指令日志，恢复保留时长内执行过的指令"""
+        for record in self.cmd_journal.replay():
+            if "ts" in record:
+                self.expired_cmds.add(record["key"], record["ts"])
+            else:
+                # 旧版本日志记录的是完整的指令 key
+                self._add_legacy_cmd_key(record["key"])
+
         if os.path.exists(self.CMD_CACHE_FILE):
             with open(self.CMD_CACHE_FILE, "rb") as f:
-                self.expired_cmds = pickle.load(f)
+                for key in pickle.load(f):
+                    self._add_legacy_cmd_key(key)
+            self.expired_cmds.evict()
+            self.compact_expired_cmd_cache()
+            os.remove(self.CMD_CACHE_FILE)
+            logger.info("已将指令缓存 %s 迁移到 %s", self.CMD_CACHE_FILE, self.CMD_JOURNAL_FILE)
+            return
+
+        self.expired_cmds.evict()
+        if self.cmd_journal.records > len(self.expired_cmds):
+            self.compact_expired_cmd_cache()
+
+    def _add_legacy_cmd_key(self, key):
+        # 旧版本 key 的最后一段为指令产生时间，无法解析时从当前时间开始计算保留时长
+        try:
+            timestamp = datetime.datetime.strptime(
+                key.rsplit("_", 1)[-1], "%Y-%m-%d %H:%M:%S"
+            ).timestamp()
+        except ValueError:
+            timestamp = time.time()
+        self.expired_cmds.add(self.expired_cmds.digest(key), timestamp)
+
+    def compact_expired_cmd_cache(self):
+        """使用保留时长内的指令重写指令日志，去除已淘汰和重复的记录"""
+        # 在日志锁内读取有效指令，避免丢失交易线程同时追加的记录
+        self.cmd_journal.compact(
+            lambda: [
+                {"key": digest, "ts": timestamp}
+                for digest, timestamp in self.expired_cmds.items()
+            ]
+        )
 
     def start_trader_thread(
         self,
@@ -136,7 +217,16 @@ class BaseFollower(metaclass=abc.ABCMeta):
         trade_cmd_expire_seconds,
         entrust_prop="limit",
         send_interval=0,
+        parallel_users=False,
+        priority_queue=False,
+        net_opposite_cmds=False,
     ):
+        """
+        :param priority_queue: 是否按优先级调度待执行的指令，卖出指令先于其他股票的买入指令，同方向按信号产生时间先后执行
+        :param net_opposite_cmds: 是否抵消同一股票方向相反的待执行指令，开启时同时按优先级调度
+        """
+        if priority_queue or net_opposite_cmds:
+            self.trade_queue = TradeCmdQueue(net_opposite=net_opposite_cmds)
         trader = threading.Thread(
             target=self.trade_worker,
             args=[users],
@@ -144,6 +234,7 @@ class BaseFollower(metaclass=abc.ABCMeta):
                 "expire_seconds": trade_cmd_expire_seconds,
                 "entrust_prop": entrust_prop,
                 "send_interval": send_interval,
+                "parallel_users": parallel_users,
             },
         )
         trader.setDaemon(True)
@@ -172,11 +263,52 @@ class BaseFollower(metaclass=abc.ABCMeta):
         """
         pass
 
-    def track_strategy_worker(self, strategy, name, interval=10, **kwargs):
+    def start_strategy_trackers(
+        self,
+        strategies,
+        interval,
+        async_tracking=False,
+        max_concurrency=20,
+        scheduler: Optional[PollScheduler] = None,
+    ) -> List[threading.Thread]:
+        """启动策略跟踪
+        :param strategies: [(策略id, 策略名字, 传给 query_strategy_transaction 的参数字典)]
+        :param interval: 轮询策略的时间间隔，单位为秒
+        :param async_tracking: 是否在单个 asyncio 事件循环中轮询全部策略，需要安装 aiohttp，
+            为 False 时每个策略使用一个线程
+        :param max_concurrency: 使用 asyncio 轮询时同时进行的最大请求数
+        :param scheduler: 按交易时段调整轮询间隔的调度器，为 None 时使用固定的 interval
+        :return: [] 跟踪线程的列表
+        """
+        if async_tracking:
+            from easytrader.async_tracker import AsyncStrategyTracker
+
+            tracker = AsyncStrategyTracker(
+                self, max_concurrency=max_concurrency, scheduler=scheduler
+            )
+            return [tracker.start(strategies, interval)]
+
+        workers = []
+        for strategy, name, kwargs in strategies:
+            strategy_worker = threading.Thread(
+                target=self.track_strategy_worker,
+                args=[strategy, name],
+                kwargs=dict(kwargs, interval=interval, scheduler=scheduler),
+            )
+            strategy_worker.start()
+            workers.append(strategy_worker)
+            logger.info("开始跟踪策略: %s", name)
+        return workers
+
+    def track_strategy_worker(
+        self, strategy, name, interval=10, scheduler=None, **kwargs
+    ):
         """跟踪下单worker
         :param strategy: 策略id
         :param name: 策略名字
-        :param interval: 轮询策略的时间间隔，单位为秒"""
+        :param interval: 轮询策略的时间间隔，单位为秒
+        :param scheduler: 按交易时段调整轮询间隔的调度器，为 None 时使用固定的 interval"""
+        errors = 0
         while True:
             try:
                 transactions = self.query_strategy_transaction(
@@ -185,38 +317,53 @@ class BaseFollower(metaclass=abc.ABCMeta):
             # pylint: disable=broad-except
             except Exception as e:
                 logger.exception("无法获取策略 %s 调仓信息, 错误: %s, 跳过此次调仓查询", name, e)
-                time.sleep(3)
+                errors += 1
+                time.sleep(scheduler.error_delay(errors) if scheduler else 3)
                 continue
-            for transaction in transactions:
-                trade_cmd = {
-                    "strategy": strategy,
-                    "strategy_name": name,
-                    "action": transaction["action"],
-                    "stock_code": transaction["stock_code"],
-                    "amount": transaction["amount"],
-                    "price": transaction["price"],
-                    "datetime": transaction["datetime"],
-                }
-                if self.is_cmd_expired(trade_cmd):
-                    continue
-                logger.info(
-                    "策略 [%s] 发送指令到交易队列, 股票: %s 动作: %s 数量: %s 价格: %s 信号产生时间: %s",
-                    name,
-                    trade_cmd["stock_code"],
-                    trade_cmd["action"],
-                    trade_cmd["amount"],
-                    trade_cmd["price"],
-                    trade_cmd["datetime"],
-                )
-                self.trade_queue.put(trade_cmd)
-                self.add_cmd_to_expired_cmds(trade_cmd)
+            errors = 0
+            self.dispatch_transactions(strategy, name, transactions)
             try:
-                for _ in range(interval):
-                    time.sleep(1)
+                self._sleep(scheduler.next_delay() if scheduler else interval)
             except KeyboardInterrupt:
                 logger.info("程序退出")
                 break
 
+    @staticmethod
+    def _sleep(seconds):
+        # 按 1 秒分段休眠
+        while seconds > 0:
+            time.sleep(min(seconds, 1))
+            seconds -= 1
+
+    def dispatch_transactions(self, strategy, name, transactions):
+        """将未执行过的调仓记录转换为交易指令发送到交易队列
+        :param strategy: 策略id
+        :param name: 策略名字
+        :param transactions: [] Transaction 调仓记录的列表"""
+        for transaction in transactions:
+            trade_cmd = {
+                "strategy": strategy,
+                "strategy_name": name,
+                "action": transaction.action,
+                "stock_code": transaction.stock_code,
+                "amount": transaction.amount,
+                "price": transaction.price,
+                "datetime": transaction.datetime,
+            }
+            if self.is_cmd_expired(trade_cmd):
+                continue
+            logger.info(
+                "策略 [%s] 发送指令到交易队列, 股票: %s 动作: %s 数量: %s 价格: %s 信号产生时间: %s",
+                name,
+                trade_cmd["stock_code"],
+                trade_cmd["action"],
+                trade_cmd["amount"],
+                trade_cmd["price"],
+                trade_cmd["datetime"],
+            )
+            self.trade_queue.put(trade_cmd)
+            self.add_cmd_to_expired_cmds(trade_cmd)
+
     @staticmethod
     def generate_expired_cmd_key(cmd):
         return "{}_{}_{}_{}_{}_{}".format(
@@ -229,15 +376,27 @@ class BaseFollower(metaclass=abc.ABCMeta):
         )
 
     def is_cmd_expired(self, cmd):
+        if self.expired_cmds.is_stale(cmd["datetime"].timestamp()):
+            return True
         key = self.generate_expired_cmd_key(cmd)
-        return key in self.expired_cmds
+        return self.expired_cmds.digest(key) in self.expired_cmds
 
     def add_cmd_to_expired_cmds(self, cmd):
         key = self.generate_expired_cmd_key(cmd)
-        self.expired_cmds.add(key)
-
-        with open(self.CMD_CACHE_FILE, "wb") as f:
-            pickle.dump(self.expired_cmds, f)
+        digest = self.expired_cmds.digest(key)
+        timestamp = cmd["datetime"].timestamp()
+        self.expired_cmds.add(digest, timestamp)
+        self.cmd_journal.append({"key": digest, "ts": timestamp})
+
+        if self.expired_cmds.evict() and self._need_compact_cmd_journal():
+            self.compact_expired_cmd_cache()
+
+    def _need_compact_cmd_journal(self):
+        garbage = self.cmd_journal.records - len(self.expired_cmds)
+        return (
+            garbage > self.CMD_JOURNAL_COMPACT_THRESHOLD
+            and garbage > len(self.expired_cmds)
+        )
 
     @staticmethod
     def _is_number(s):
@@ -343,11 +502,40 @@ class BaseFollower(metaclass=abc.ABCMeta):
                 )
 
     def trade_worker(
-        self, users, expire_seconds=120, entrust_prop="limit", send_interval=0
+        self,
+        users,
+        expire_seconds=120,
+        entrust_prop="limit",
+        send_interval=0,
+        parallel_users=False,
     ):
         """
         :param send_interval: 交易发送间隔， 默认为0s。调大可防止卖出买入时买出单没有及时成交导致的买入金额不足
+        :param parallel_users: 是否为每个 user 启动独立的下单线程和队列，指令同时分发给所有 user，
+            每个 user 内部仍按指令顺序执行
         """
+        if parallel_users and len(users) > 1:
+            user_queues = []
+            for user in users:
+                user_queue = self._create_user_queue()
+                user_worker = threading.Thread(
+                    target=self.user_trade_worker,
+                    args=[user, user_queue],
+                    kwargs={
+                        "expire_seconds": expire_seconds,
+                        "entrust_prop": entrust_prop,
+                        "send_interval": send_interval,
+                    },
+                )
+                user_worker.setDaemon(True)
+                user_worker.start()
+                user_queues.append(user_queue)
+
+            while True:
+                trade_cmd = self.trade_queue.get()
+                for user_queue in user_queues:
+                    user_queue.put(trade_cmd)
+
         while True:
             trade_cmd = self.trade_queue.get()
             self._execute_trade_cmd(
@@ -355,15 +543,67 @@ class BaseFollower(metaclass=abc.ABCMeta):
             )
             time.sleep(send_interval)
 
+    def _create_user_queue(self):
+        # 每个 user 的队列与主队列使用相同的调度方式
+        if isinstance(self.trade_queue, TradeCmdQueue):
+            return TradeCmdQueue(net_opposite=self.trade_queue.net_opposite)
+        return queue.Queue()
+
+    def user_trade_worker(
+        self,
+        user,
+        user_queue,
+        expire_seconds=120,
+        entrust_prop="limit",
+        send_interval=0,
+    ):
+        """
+        单个 user 的下单 worker，按顺序执行分发到该 user 队列中的指令
+        :param user: 支持 easytrader 的用户对象
+        :param user_queue: 该 user 的指令队列
+        """
+        while True:
+            trade_cmd = user_queue.get()
+            self._execute_trade_cmd(
+                trade_cmd, [user], expire_seconds, entrust_prop, send_interval
+            )
+            time.sleep(send_interval)
+
     def query_strategy_transaction(self, strategy, **kwargs):
         params = self.create_query_transaction_params(strategy)
 
         rep = self.s.get(self.TRANSACTION_API, params=params)
         history = rep.json()
 
+        return self.process_history(history, **kwargs)
+
+    async def async_query_strategy_transaction(self, session, strategy, **kwargs):
+        """
+        query_strategy_transaction 的协程版本，供 asyncio 跟踪使用
+        :param session: aiohttp.ClientSession
+        :param strategy: 策略 id
+        """
+        params = self.create_query_transaction_params(strategy)
+
+        async with session.get(self.TRANSACTION_API, params=params) as rep:
+            history = await rep.json(content_type=None)
+
+        # 调仓记录的处理可能读取用户持仓，放到线程池中执行以免阻塞事件循环
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.process_history, history, **kwargs)
+        )
+
+    def process_history(self, history, **kwargs):
+        """
+        从调仓接口的返回中生成先卖后买的调仓记录
+        :param history: 调仓接口返回信息的字典对象
+        :return: [] Transaction 调仓记录的列表
+        """
         transactions = self.extract_transactions(history)
-        self.project_transactions(transactions, **kwargs)
-        return self.order_transactions_sell_first(transactions)
+        return self.order_transactions_sell_first(
+            self.project_transactions(transactions, **kwargs)
+        )
 
     def extract_transactions(self, history) -> List[str]:
         """
@@ -389,20 +629,27 @@ class BaseFollower(metaclass=abc.ABCMeta):
     def re_search(pattern, string, dtype=str):
         return dtype(re.search(pattern,string).group(1))
 
-    def project_transactions(self, transactions, **kwargs):
+    def project_transactions(self, transactions, **kwargs) -> List[Transaction]:
         """
-        修证调仓记录为内部使用的统一格式
-        :param transactions: [] 调仓记录的列表
-        :return: [] 修整后的调仓记录
+        将一批调仓记录修整为内部使用的统一格式
+        :param transactions: [] 调仓接口返回的调仓记录列表
+        :return: [] Transaction 修整后的调仓记录
         """
-        pass
+        return []
 
-    def order_transactions_sell_first(self, transactions):
-        # 调整调仓记录的顺序为先卖再买
-        sell_first_transactions = []
+    @staticmethod
+    def order_transactions_sell_first(transactions):
+        """
+        调整调仓记录的顺序为先卖再买，卖出和买入各自保持原来的先后顺序
+        :param transactions: [] Transaction 调仓记录的列表
+        :return: [] 先卖后买的调仓记录列表
+        """
+        sells = []
+        buys = []
         for transaction in transactions:
-            if transaction["action"] == "sell":
-                sell_first_transactions.insert(0, transaction)
+            if transaction.action == "sell":
+                sells.append(transaction)
             else:
-                sell_first_transactions.append(transaction)
-        return sell_first_transactions
+                buys.append(transaction)
+        sells.extend(buys)
+        return sells
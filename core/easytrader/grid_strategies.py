@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 import abc
-import io
+import itertools
 import tempfile
-from io import StringIO
 from typing import TYPE_CHECKING, Dict, List, Optional
-from collections import Counter
+from collections import Counter, OrderedDict
 import re
+import time
 import cv2
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
@@ -13,13 +13,14 @@ import pytesseract
 import os
 from datetime import datetime
 
-import pandas as pd
 import pywinauto.keyboard
 import pywinauto
 import pywinauto.clipboard
 
 from easytrader.log import logger
-from easytrader.utils.captcha import captcha_recognize
+from easytrader.utils.captcha import captcha_recognize, recognize_in_parallel
+from easytrader.utils.captcha_cache import CaptchaCache, default_captcha_cache
+from easytrader.utils.grid_parser import GridParser
 from easytrader.utils.win_gui import ShowWindow, win32defines
 from easytrader.utils.win_gui import SetForegroundWindow  # type: ignore
 
@@ -50,23 +51,53 @@ class IGridStrategy(abc.ABC):
 
 class BaseStrategy(IGridStrategy):
     _trader: Optional["clienttrader.IClientTrader"] = None
-    
+    # 缓存最近解析过的表格数量
+    parsed_cache_size = 8
+    # 验证码答案缓存，为 None 时使用进程内共享的缓存
+    captcha_cache: Optional[CaptchaCache] = None
+    # 最近一次读取的表格是否解析失败，失败时 get 返回空列表
+    last_read_failed = False
+
     def __init__(self):
         self._trader = None
+        self._parser = None
+        # {表格原始文本: 解析结果}
+        self._parsed = OrderedDict()
 
     def set_trader(self, trader: "clienttrader.IClientTrader"):
         self._trader = trader
+        self._parser = None
+        self._parsed = OrderedDict()
+
+    def _parse_grid(self, content: str) -> List[Dict]:
+        """
+        按券商配置的 GRID_DTYPE 解析制表符分隔的表格数据
+        轮询时表格内容大多没有变化，原始文本与最近解析过的相同时直接复用解析结果
+        """
+        rows = self._parsed.get(content)
+        if rows is None:
+            if self._parser is None:
+                self._parser = GridParser(self._trader.config.GRID_DTYPE)
+            rows = self._parser.parse(content)
+            self._parsed[content] = rows
+            if len(self._parsed) > self.parsed_cache_size:
+                self._parsed.popitem(last=False)
+        else:
+            self._parsed.move_to_end(content)
+        # 返回副本，避免调用方修改缓存的数据
+        return [dict(row) for row in rows]
 
     @abc.abstractmethod
     def get(self, control_id: int) -> List[Dict]:
         pass
 
+    def _get_captcha_cache(self) -> CaptchaCache:
+        return self.captcha_cache or default_captcha_cache()
+
     def _get_grid(self, control_id: int):
         if not self._trader or not hasattr(self._trader, 'main'):
             raise ValueError("Trader not properly initialized")
-        return self._trader.main.child_window(
-            control_id=control_id, class_name="CVirtualGridCtrl"
-        )
+        return self._trader.get_control(control_id, "CVirtualGridCtrl")
 
     def _set_foreground(self, grid=None):
         if not self._trader:
@@ -85,28 +116,47 @@ class BaseStrategy(IGridStrategy):
 
 class Copy(BaseStrategy):
     _need_captcha_reg = True
+    # 等待客户端把表格复制到剪贴板的最长时间，单位为秒
+    copy_timeout = 0.5
 
     def get(self, control_id: int) -> List[Dict]:
         grid = self._get_grid(control_id)
         self._set_foreground(grid)
+        self._clear_clipboard()
         grid.type_keys("^A^C", set_foreground=False)
+        self._wait_copy_finished()
         content = self._get_clipboard_data()
         return self._format_grid_data(content)
 
+    @staticmethod
+    def _clear_clipboard():
+        # 清空剪贴板，通过剪贴板有无内容判断复制是否完成，也避免读到上一次复制的内容
+        try:
+            pywinauto.clipboard.EmptyClipboard()
+        except Exception as e:
+            logger.debug("清空剪贴板失败: %s", e)
+
+    def _wait_copy_finished(self):
+        """等待剪贴板中出现表格内容或弹出验证码窗口"""
+        self._trader.wait_until(
+            lambda: pywinauto.clipboard.GetData()
+            or self._trader.app.top_window()
+            .window(class_name="Static", title_re="验证码")
+            .exists(timeout=0),
+            self.copy_timeout,
+        )
+
     def _format_grid_data(self, data: str) -> List[Dict]:
         if not self._trader or not hasattr(self._trader, 'config'):
             raise ValueError("Trader or config not properly initialized")
         try:
-            df = pd.read_csv(
-                io.StringIO(data),
-                delimiter="\t",
-                dtype=self._trader.config.GRID_DTYPE,
-                na_filter=False,
-            )
-            return df.to_dict("records")
+            rows = self._parse_grid(data)
         except:
             Copy._need_captcha_reg = True
+            self.last_read_failed = True
             return []
+        self.last_read_failed = False
+        return rows
 
     def _get_clipboard_data(self) -> str:
         if not self._trader or not hasattr(self._trader, 'app'):
@@ -117,22 +167,28 @@ class Copy(BaseStrategy):
                 file_path = "tmp.png"
                 count = 5
                 found = False
+                captcha_cache = self._get_captcha_cache()
                 while count > 0:
-                    self._trader.app.top_window().window(
+                    captcha_img = self._trader.app.top_window().window(
                         control_id=0x965, class_name="Static"
-                    ).capture_as_image().save(file_path)
+                    ).capture_as_image()
+                    captcha_key = captcha_cache.image_key(captcha_img)
+                    cached_answer = captcha_cache.get(captcha_key)
+                    if cached_answer is not None:
+                        captcha_num = cached_answer
+                    else:
+                        captcha_img.save(file_path)
+                        try:
+                            manual_input = getattr(self._trader._config, 'CAPTCHA_MANUAL_INPUT', False)
+                            if manual_input:
+                                from easytrader.utils.captcha import input_verify_code_manual
+                                captcha_num = input_verify_code_manual(file_path).strip()
+                            else:
+                                captcha_num = captcha_recognize(file_path).strip()
+                        except Exception as e:
+                            logger.error(f"验证码识别失败: {e}")
+                            captcha_num = ""
 
-                    try:
-                        manual_input = getattr(self._trader._config, 'CAPTCHA_MANUAL_INPUT', False)
-                        if manual_input:
-                            from easytrader.utils.captcha import input_verify_code_manual
-                            captcha_num = input_verify_code_manual(file_path).strip()
-                        else:
-                            captcha_num = captcha_recognize(file_path).strip()
-                    except Exception as e:
-                        logger.error(f"验证码识别失败: {e}")
-                        captcha_num = ""
-                    
                     captcha_num = "".join(captcha_num.split())
                     logger.info("captcha result-->" + captcha_num)
                     if len(captcha_num) == 4:
@@ -149,9 +205,13 @@ class Copy(BaseStrategy):
                                     .window_text()
                             )
                         except Exception as ex:
+                            # 验证码窗口已经关闭，说明验证码正确
                             logger.exception(ex)
+                            captcha_cache.put(captcha_key, captcha_num)
                             found = True
                             break
+                    if cached_answer is not None:
+                        captcha_cache.discard(captcha_key)
                     count -= 1
                     if not found:
                         if not self._trader or not hasattr(self._trader, 'app'):
@@ -186,8 +246,9 @@ class Copy(BaseStrategy):
 class WMCopy(Copy):
     def get(self, control_id: int) -> List[Dict]:
         grid = self._get_grid(control_id)
+        self._clear_clipboard()
         grid.post_message(win32defines.WM_COMMAND, 0xE122, 0)
-        self._trader.wait(0.1)
+        self._wait_copy_finished()
         content = self._get_clipboard_data()
         return self._format_grid_data(content)
 
@@ -199,6 +260,8 @@ class Xls(BaseStrategy):
         'success_timeout': 0.8,
         'use_fast_mode': True,
         'smart_case_order': True,
+        # 同时运行的验证码识别方法数，为 None 时全部方法同时运行
+        'ocr_workers': None,
     }
 
     def set_captcha_mode(self, mode="balanced"):
@@ -237,9 +300,41 @@ class Xls(BaseStrategy):
         self.CAPTCHA_CONFIG.update(kwargs)
         logger.info(f"🔧 已更新验证码配置: {kwargs}")
 
+    # 导出文件名，同一个策略实例每次导出复用同一个文件
+    export_file_name = "easytrader_grid.xls"
+    # 为每个策略实例分配导出文件编号，多个账户同时导出时互不覆盖
+    _export_ids = itertools.count(1)
+    # 等待客户端写完导出文件的最长时间，单位为秒
+    export_timeout = 6.0
+    # 导出文件的大小和修改时间保持不变多久视为写入完成，单位为秒
+    # 客户端分多次写入文件，间隔可能超过 100 毫秒，过短会读到写了一半的文件
+    export_stable_time = 0.3
+
     def __init__(self, tmp_folder: Optional[str] = None):
         super().__init__()
         self.tmp_folder = tmp_folder
+        self._export_id = next(Xls._export_ids)
+
+    def _captcha_window_exists(self) -> bool:
+        return self._trader.app.top_window().window(
+            class_name="Static", title_re="验证码"
+        ).exists(timeout=0)
+
+    def _captcha_window_closed(self) -> bool:
+        try:
+            return not self._captcha_window_exists()
+        except Exception:
+            # 无法获取窗口时视为验证码窗口已经关闭
+            return True
+
+    def _save_dialog_exists(self) -> bool:
+        app = self._trader.app
+        if app.window(title_re='另存为|Save As|文件另存为').exists(timeout=0):
+            return True
+        top_window = app.top_window()
+        if top_window.window(class_name="Edit", control_id=0x47C).exists(timeout=0):
+            return True
+        return "另存为" in top_window.window_text()
 
     def get(self, control_id: int) -> List[Dict]:
         logger.info("保存 grid 内容为 xls 文件模式")
@@ -265,11 +360,9 @@ class Xls(BaseStrategy):
         logger.info("设置表格控件焦点...")
         try:
             grid.click()
-            self._trader.wait(0.5)
             self._set_foreground(grid)
-            self._trader.wait(0.5)
             grid.set_focus()
-            self._trader.wait(0.5)
+            self._trader.wait_until(lambda: grid.has_focus(), 1.5)
             logger.info("表格控件焦点设置完成")
         except Exception as e:
             logger.warning(f"设置表格焦点时出错: {e}")
@@ -287,12 +380,14 @@ class Xls(BaseStrategy):
                 logger.error(f"备用方法也失败: {e2}")
                 raise Exception("无法发送保存命令")
         
-        self._trader.wait(2.0)
-        
+        # 等待弹出验证码窗口或另存为对话框
+        self._trader.wait_until(
+            lambda: self._captcha_window_exists() or self._save_dialog_exists(), 2.0
+        )
+
         logger.info("检查是否有验证码窗口...")
-        if (self._trader.app.top_window().window(
-            class_name="Static", title_re="验证码"
-        ).exists(timeout=3)):
+        # 上面已经等到验证码窗口或另存为对话框出现，这里不再等待
+        if not self._captcha_window_closed():
             logger.info("发现验证码窗口，开始处理验证码...")
             captcha_success = self._handle_captcha()
             if not captcha_success:
@@ -302,31 +397,14 @@ class Xls(BaseStrategy):
                 raise Exception("验证码处理失败")
         else:
             logger.info("未发现验证码窗口")
-        
+
         logger.info("等待另存为对话框...")
-        save_dialog_found = False
-        for i in range(15):
-            conditions = [
-                lambda: self._trader.app.window(title_re='另存为|Save As|文件另存为').exists(timeout=0.2),
-                lambda: self._trader.app.top_window().window(class_name="Edit", control_id=0x47C).exists(timeout=0.2),
-                lambda: self._trader.app.top_window().window(class_name="#32770").exists(timeout=0.2) and "另存为" in self._trader.app.top_window().window_text(),
-            ]
-            
-            for condition in conditions:
-                try:
-                    if condition():
-                        save_dialog_found = True
-                        logger.info(f"找到另存为对话框 (尝试 {i+1}/15)")
-                        break
-                except:
-                    continue
-            
-            if save_dialog_found:
-                break
-                
-            self._trader.wait(0.2)
-            logger.info(f"等待另存为对话框... 尝试 {i+1}/15")
-        
+        save_dialog_found = bool(
+            self._trader.wait_until(self._save_dialog_exists, 3.0)
+        )
+        if save_dialog_found:
+            logger.info("找到另存为对话框")
+
         if not save_dialog_found:
             try:
                 current_window = self._trader.app.top_window()
@@ -339,132 +417,157 @@ class Xls(BaseStrategy):
                         pass
             except Exception as e:
                 logger.error(f"获取窗口信息失败: {e}")
-            
+
             logger.error("未找到另存为对话框，尝试重新发送 Ctrl+S")
             try:
                 self._set_foreground(grid)
                 grid.click()
-                self._trader.wait(0.5)
+                self._trader.wait_until(lambda: grid.has_focus(), 0.5)
                 grid.type_keys("^s", set_foreground=False)
-                self._trader.wait(2.0)
-                
-                if (self._trader.app.window(title_re='另存为|Save As|文件另存为').exists(timeout=1) or \
-                   self._trader.app.top_window().window(class_name="Edit", control_id=0x47C).exists(timeout=1)):
+
+                if self._trader.wait_until(self._save_dialog_exists, 3.0):
                     save_dialog_found = True
                     logger.info("重新发送 Ctrl+S 后找到另存为对话框")
             except Exception as e:
                 logger.error(f"重新发送 Ctrl+S 失败: {e}")
-        
+
         if not save_dialog_found:
             raise Exception("无法找到另存为对话框，可能是表格为空或权限不足")
-        
-        temp_path = tempfile.mktemp(suffix=".xls", dir=self.tmp_folder)
-        logger.info(f"设置保存路径: {temp_path}")
-        
+
+        export_path = self.export_path
+        # 提前删除上次的导出文件，避免弹出替换确认框，也用于判断本次是否已经写入
+        self._remove_export_file(export_path)
+        logger.info(f"设置保存路径: {export_path}")
+
+        save_window = self._get_save_window()
         try:
-            if self._trader.app.window(title_re='另存为|Save As|文件另存为').exists(timeout=1):
-                save_window = self._trader.app.window(title_re='另存为|Save As|文件另存为')
-            else:
-                save_window = self._trader.app.top_window()
-                
             edit_control = None
-            for control_id in [0x47C, 0x3E9, 1001]:
-                try:
-                    edit_control = save_window.window(class_name="Edit", control_id=control_id)
-                    if edit_control.exists():
-                        break
-                except:
-                    continue
-            
+            for edit_id in [0x47C, 0x3E9, 1001]:
+                edit = save_window.window(class_name="Edit", control_id=edit_id)
+                if edit.exists(timeout=0):
+                    edit_control = edit
+                    break
             if edit_control is None:
-                try:
-                    edit_control = save_window.window(class_name="Edit")
-                except:
-                    pass
-            
-            if edit_control and edit_control.exists():
-                edit_control.set_edit_text(temp_path)
+                edit = save_window.window(class_name="Edit")
+                if edit.exists(timeout=0):
+                    edit_control = edit
+
+            if edit_control is not None:
+                edit_control.set_edit_text(export_path)
+                self._trader.wait_until(
+                    lambda: edit_control.window_text() == export_path, 0.2
+                )
                 logger.info("成功设置文件路径")
             else:
                 logger.error("无法找到文件名编辑框")
-                save_window.type_keys(temp_path)
-                
+                save_window.type_keys(export_path)
         except Exception as e:
             logger.error(f"设置文件路径失败: {e}")
-            
-        self._trader.wait(0.2)
-        
+
         try:
-            if self._trader.app.window(title_re='另存为|Save As|文件另存为').exists(timeout=1):
-                save_window = self._trader.app.window(title_re='另存为|Save As|文件另存为')
-            else:
-                save_window = self._trader.app.top_window()
-                
             save_window.type_keys("%{s}", set_foreground=False)
             logger.info("已发送保存命令")
         except Exception as e:
             logger.error(f"发送保存命令失败: {e}")
-            
-        self._trader.wait(0.5)
-        
-        if self._trader.app.window(title_re='确认另存为|Confirm Save As|替换|Replace').exists(timeout=1):
-            logger.info("文件已存在，确认替换...")
-            replace_window = self._trader.app.window(title_re='确认另存为|Confirm Save As|替换|Replace')
-            replace_window.type_keys("%{y}", set_foreground=False)
-            self._trader.wait(0.2)
 
-        import os
-        retry_count = 0
-        max_retries = 20
-        logger.info(f"等待文件保存完成: {temp_path}")
-        while not os.path.exists(temp_path) and retry_count < max_retries:
-            self._trader.wait(0.3)
-            retry_count += 1
-            logger.info(f"等待文件保存完成... 尝试 {retry_count}/{max_retries}")
-            
-            if self._trader.is_exist_pop_dialog():
-                logger.info("发现弹窗，尝试关闭...")
-                try:
-                    self._trader.app.top_window().Button2.click()
-                    self._trader.wait(0.2)
-                except:
-                    pass
-        
-        if not os.path.exists(temp_path):
+        content = self._read_export_file(export_path)
+        logger.info(f"文件保存成功: {export_path}")
+        return self._format_grid_data(content)
+
+    @property
+    def export_path(self) -> str:
+        """导出文件的路径，同一个策略实例每次导出都使用同一个文件"""
+        folder = self.tmp_folder or tempfile.gettempdir()
+        return os.path.join(
+            folder, f"{os.getpid()}_{self._export_id}_{self.export_file_name}"
+        )
+
+    def _get_save_window(self):
+        save_window = self._trader.app.window(title_re='另存为|Save As|文件另存为')
+        if save_window.exists(timeout=0):
+            return save_window
+        return self._trader.app.top_window()
+
+    @staticmethod
+    def _remove_export_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除导出文件失败: {path}, 错误: {e}")
+
+    def _read_export_file(self, path: str) -> str:
+        """
+        等待客户端写完导出文件后读取内容并删除文件
+        文件大小和修改时间在 export_stable_time 秒内不再变化、且能按 gbk 完整解码时视为写入完成
+        """
+        replace_window = self._trader.app.window(
+            title_re='确认另存为|Confirm Save As|替换|Replace'
+        )
+        # 上次观察到的 (文件大小, 修改时间) 及其开始保持不变的时间, 解码后的内容和解码错误
+        state = {"stat": None, "since": 0.0, "content": None, "error": None}
+
+        def saved():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if replace_window.exists(timeout=0):
+                    logger.info("文件已存在，确认替换...")
+                    replace_window.type_keys("%{y}", set_foreground=False)
+                elif self._trader.is_exist_pop_dialog(timeout=0):
+                    logger.info("发现弹窗，尝试关闭...")
+                    try:
+                        self._trader.app.top_window().Button2.click()
+                    except:
+                        pass
+                return False
+
+            current = (stat.st_size, stat.st_mtime_ns)
+            now = time.monotonic()
+            if current != state["stat"] or stat.st_size == 0:
+                state["stat"], state["since"] = current, now
+                return False
+            if now - state["since"] < self.export_stable_time:
+                return False
+
+            with open(path, "rb") as f:
+                data = f.read()
+            try:
+                state["content"] = data.decode("gbk")
+            except UnicodeDecodeError as e:
+                # 文件末尾的字符被截断，客户端还没有写完，重新等待文件稳定
+                state["stat"], state["error"] = None, e
+                return False
+            return True
+
+        logger.info(f"等待文件保存完成: {path}")
+        if not self._trader.wait_until(saved, self.export_timeout):
+            if state["error"] is not None:
+                self._remove_export_file(path)
+                logger.error(f"导出文件解码失败: {path}")
+                raise state["error"]
             try:
                 current_window = self._trader.app.top_window()
                 logger.error(f"保存失败 - 当前窗口标题: {current_window.window_text()}")
                 logger.error(f"保存失败 - 当前窗口类名: {current_window.class_name()}")
             except:
                 pass
-            raise FileNotFoundError(f"无法保存或找到临时文件: {temp_path}")
+            raise FileNotFoundError(f"无法保存或找到导出文件: {path}")
 
-        logger.info(f"文件保存成功: {temp_path}")
-        return self._format_grid_data(temp_path)
+        # 导出文件包含账户数据，读取后立即删除
+        self._remove_export_file(path)
+        return state["content"]
 
-    def _format_grid_data(self, data: str) -> List[Dict]:
+    def _format_grid_data(self, content: str) -> List[Dict]:
         try:
-            with open(data, encoding="gbk", errors="replace") as f:
-                content = f.read()
-
-            df = pd.read_csv(
-                StringIO(content),
-                delimiter="\t",
-                dtype=self._trader.config.GRID_DTYPE,
-                na_filter=False,
-            )
-            return df.to_dict("records")
+            rows = self._parse_grid(content)
         except Exception as e:
             logger.error(f"格式化网格数据失败: {e}")
+            self.last_read_failed = True
             return []
-        finally:
-            import os
-            try:
-                if os.path.exists(data):
-                    os.remove(data)
-                    logger.info(f"已删除临时文件: {data}")
-            except Exception as e:
-                logger.warning(f"删除临时文件失败: {data}, 错误: {e}")
+        self.last_read_failed = False
+        return rows
 
     def _handle_captcha(self) -> bool:
         """处理验证码输入，返回是否成功"""
@@ -483,6 +586,7 @@ class Xls(BaseStrategy):
         found = False
         
         logger.info("检测到验证码窗口，开始自动识别...")
+        captcha_cache = self._get_captcha_cache()
         
         while count > 0:
             try:
@@ -491,39 +595,47 @@ class Xls(BaseStrategy):
                     control_id=0x965, class_name="Static"
                 ).capture_as_image()
                 
-                # 超分辨率处理
-                try:
-                    import cv2
-                    import numpy as np
+                captcha_key = captcha_cache.image_key(captcha_img)
+                cached_answer = captcha_cache.get(captcha_key)
+                if cached_answer is not None:
+                    # 之前出现过的验证码图片直接使用已验证的答案
+                    captcha_num = cached_answer
+                    debug_filename = "缓存"
+                    logger.info(f"验证码命中缓存: {captcha_num}")
+                else:
+                    # 超分辨率处理
+                    try:
+                        import cv2
+                        import numpy as np
                     
-                    # 转换为OpenCV格式
-                    img = cv2.cvtColor(np.array(captcha_img), cv2.COLOR_RGB2BGR)
+                        # 转换为OpenCV格式
+                        img = cv2.cvtColor(np.array(captcha_img), cv2.COLOR_RGB2BGR)
                     
-                    # 双三次插值放大2倍
-                    img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+                        # 双三次插值放大2倍
+                        img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
                     
-                    # 锐化处理
-                    kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-                    img = cv2.filter2D(img, -1, kernel)
+                        # 锐化处理
+                        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+                        img = cv2.filter2D(img, -1, kernel)
                     
-                    # 保存处理后的图片
-                    cv2.imwrite(file_path, img)
-                except Exception as e:
-                    logger.warning(f"超分辨率处理失败: {e}")
-                    captcha_img.save(file_path)
+                        # 保存处理后的图片
+                        cv2.imwrite(file_path, img)
+                    except Exception as e:
+                        logger.warning(f"超分辨率处理失败: {e}")
+                        captcha_img.save(file_path)
                 
-                # 同时保存调试副本
-                debug_filename = f"captcha_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{9-count}.png"
-                debug_path = os.path.join(debug_folder, debug_filename)
-                try:
-                    import shutil
-                    shutil.copy2(file_path, debug_path)
-                    logger.info(f"验证码图片已保存到: {debug_path}")
-                except:
-                    pass
+                    # 同时保存调试副本
+                    debug_filename = f"captcha_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{9-count}.png"
+                    debug_path = os.path.join(debug_folder, debug_filename)
+                    try:
+                        import shutil
+                        shutil.copy2(file_path, debug_path)
+                        logger.info(f"验证码图片已保存到: {debug_path}")
+                    except:
+                        pass
                 
-                # 改进验证码识别
-                captcha_num = self._recognize_captcha_improved(file_path)
+                    # 改进验证码识别
+                    captcha_num = self._recognize_captcha_improved(file_path)
                 logger.info(f"验证码识别结果: {captcha_num}")
                 
                 if len(captcha_num) == 4 and captcha_num.isalnum():
@@ -549,23 +661,20 @@ class Xls(BaseStrategy):
                     self._trader.app.top_window().set_focus()
                     pywinauto.keyboard.SendKeys("{ENTER}")
                     
-                    # 等待系统响应
-                    self._trader.wait(self.CAPTCHA_CONFIG['input_wait_time'])
-                    
-                    # 检查是否成功
-                    success_detected = False
-                    
-                    try:
-                        if not self._trader.app.top_window().window(
-                            class_name="Static", title_re="验证码").exists(timeout=self.CAPTCHA_CONFIG['success_timeout']):
-                            success_detected = True
-                            logger.info(f"🎉 验证码输入成功: {captcha_num}")
-                    except:
-                        success_detected = True
-                        logger.info(f"🎉 验证码可能输入成功: {captcha_num}")
+                    # 等待验证码窗口关闭，关闭即表示输入成功
+                    success_detected = bool(
+                        self._trader.wait_until(
+                            self._captcha_window_closed,
+                            self.CAPTCHA_CONFIG['input_wait_time']
+                            + self.CAPTCHA_CONFIG['success_timeout'],
+                        )
+                    )
+                    if success_detected:
+                        logger.info(f"🎉 验证码输入成功: {captcha_num}")
                     
                     if success_detected:
                         found = True
+                        captcha_cache.put(captcha_key, captcha_num)
                         # 保存成功的验证码记录
                         success_record = f"验证码: {captcha_num}, 图片: {debug_filename}"
                         try:
@@ -575,6 +684,8 @@ class Xls(BaseStrategy):
                             pass
                     else:
                         logger.info(f"❌ 验证码 {captcha_num} 输入失败")
+                        if cached_answer is not None:
+                            captcha_cache.discard(captcha_key)
                     
                     if found:
                         break
@@ -621,83 +732,36 @@ class Xls(BaseStrategy):
         return found
 
     def _recognize_captcha_improved(self, image_path: str) -> str:
-        """改进的验证码识别函数 - 多种方法尝试"""
+        """改进的验证码识别函数 - 多种方法并行识别，两种方法结果一致时立即返回"""
         if not self._trader:
             raise ValueError("Trader not initialized")
-            
-        results = []
-        
-        # 方法1: 基础预处理
-        try:
-            result1 = self._method1_basic_processing(image_path)
-            if result1 and len(result1) == 4:
-                results.append(result1)
-                logger.info(f"方法1识别结果: {result1}")
-        except Exception as e:
-            logger.warning(f"方法1失败: {e}")
-        
-        # 方法2: 增强对比度
-        try:
-            result2 = self._method2_contrast_enhancement(image_path)
-            if result2 and len(result2) == 4:
-                results.append(result2)
-                logger.info(f"方法2识别结果: {result2}")
-        except Exception as e:
-            logger.warning(f"方法2失败: {e}")
-        
-        # 方法3: 二值化 + 形态学处理
-        try:
-            result3 = self._method3_morphology(image_path)
-            if result3 and len(result3) == 4:
-                results.append(result3)
-                logger.info(f"方法3识别结果: {result3}")
-        except Exception as e:
-            logger.warning(f"方法3失败: {e}")
-        
-        # 方法4: 多阈值尝试
-        try:
-            result4 = self._method4_multi_threshold(image_path)
-            if result4 and len(result4) == 4:
-                results.append(result4)
-                logger.info(f"方法4识别结果: {result4}")
-        except Exception as e:
-            logger.warning(f"方法4失败: {e}")
-        
-        # 方法5: 简单优化方法 - 去除干扰点
-        try:
-            result5 = self._method5_simple_denoise(image_path)
-            if result5 and len(result5) == 4:
-                results.append(result5)
-                logger.info(f"方法5识别结果: {result5}")
-        except Exception as e:
-            logger.warning(f"方法5失败: {e}")
-        
-        # 返回最常见的结果，或第一个有效结果
-        if results:
-            from collections import Counter
-            # 尝试大小写变换
-            all_variants = []
-            for r in results:
-                all_variants.extend([r, r.upper(), r.lower()])
-            
-            counter = Counter(all_variants)
-            most_common = counter.most_common(1)[0][0]
-            logger.info(f"最终选择结果: {most_common}, 所有结果: {results}")
-            return most_common
-        
-        # 如果所有方法都失败，返回空字符串
-        logger.error("所有识别方法都失败")
-        return ""
 
-    def _method1_basic_processing(self, image_path: str) -> str:
+        # 图片只解码一次，各方法使用灰度图的副本
+        with Image.open(image_path) as img:
+            gray = img.convert('L')
+
+        result = recognize_in_parallel(
+            [
+                ("方法1", self._method1_basic_processing),
+                ("方法2", self._method2_contrast_enhancement),
+                ("方法3", self._method3_morphology),
+                ("方法4", self._method4_multi_threshold),
+                ("方法5", self._method5_simple_denoise),
+            ],
+            gray,
+            max_workers=self.CAPTCHA_CONFIG.get('ocr_workers'),
+        )
+        if result:
+            logger.info(f"最终选择结果: {result}")
+        else:
+            logger.error("所有识别方法都失败")
+        return result
+
+    def _method1_basic_processing(self, img) -> str:
         """方法1: 基础图片处理"""
-        from PIL import Image
         import pytesseract
         import re
         
-        img = Image.open(image_path)
-        img = img.convert('L')
-        
         # 简单二值化
         img = img.point(lambda p: 0 if int(p) < 128 else 255, '1')  # type: ignore
         
@@ -707,15 +771,12 @@ class Xls(BaseStrategy):
         valid_chars = re.findall(r'[0-9A-Za-z]', result)
         return ''.join(valid_chars)
 
-    def _method2_contrast_enhancement(self, image_path: str) -> str:
+    def _method2_contrast_enhancement(self, img) -> str:
         """方法2: 对比度增强"""
-        from PIL import Image, ImageEnhance, ImageFilter
+        from PIL import ImageEnhance, ImageFilter
         import pytesseract
         import re
         
-        img = Image.open(image_path)
-        img = img.convert('L')
-        
         # 增强对比度
         enhancer = ImageEnhance.Contrast(img)
         img = enhancer.enhance(3.0)
@@ -732,15 +793,12 @@ class Xls(BaseStrategy):
         valid_chars = re.findall(r'[0-9A-Za-z]', result)
         return ''.join(valid_chars)
 
-    def _method3_morphology(self, image_path: str) -> str:
+    def _method3_morphology(self, img) -> str:
         """方法3: 形态学处理"""
-        from PIL import Image, ImageFilter
+        from PIL import ImageFilter
         import pytesseract
         import re
         
-        img = Image.open(image_path)
-        img = img.convert('L')
-        
         # 高斯模糊去噪
         img = img.filter(ImageFilter.GaussianBlur(radius=0.5))
         
@@ -756,15 +814,11 @@ class Xls(BaseStrategy):
         valid_chars = re.findall(r'[0-9A-Za-z]', result)
         return ''.join(valid_chars)
 
-    def _method4_multi_threshold(self, image_path: str) -> str:
+    def _method4_multi_threshold(self, img) -> str:
         """方法4: 多阈值尝试"""
-        from PIL import Image
         import pytesseract
         import re
         
-        img = Image.open(image_path)
-        img = img.convert('L')
-        
         # 尝试多个阈值
         thresholds = [100, 120, 140, 160, 180]
         results = []
@@ -789,16 +843,13 @@ class Xls(BaseStrategy):
         
         return ""
 
-    def _method5_simple_denoise(self, image_path: str) -> str:
+    def _method5_simple_denoise(self, img) -> str:
         """方法5: 简单去噪优化"""
-        from PIL import Image, ImageEnhance
+        from PIL import ImageEnhance
         import pytesseract
         import re
         
         try:
-            img = Image.open(image_path)
-            img = img.convert('L')
-            
             # 简单的亮度调整
             enhancer = ImageEnhance.Brightness(img)
             img = enhancer.enhance(1.2)
@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
-from threading import Thread
 
 from easytrader import exceptions
-from easytrader.follower import BaseFollower
+from easytrader.follower import BaseFollower, Transaction
 from easytrader.log import logger
+from easytrader.utils.scheduler import PollScheduler
 
 
 class JoinQuantFollower(BaseFollower):
@@ -39,6 +39,14 @@ class JoinQuantFollower(BaseFollower):
             cmd_cache=True,
             entrust_prop="limit",
             send_interval=0,
+            cmd_cache_horizon=None,
+            async_tracking=False,
+            max_concurrency=20,
+            parallel_users=False,
+            adaptive_polling=False,
+            holidays=None,
+            priority_queue=False,
+            net_opposite_cmds=False,
     ):
         """跟踪joinquant对应的模拟交易，支持多用户多策略
         :param users: 支持easytrader的用户对象，支持使用 [] 指定多个用户
@@ -49,18 +57,34 @@ class JoinQuantFollower(BaseFollower):
         :param cmd_cache: 是否读取存储历史执行过的指令，防止重启时重复执行已经交易过的指令
         :param entrust_prop: 委托方式, 'limit' 为限价，'market' 为市价, 仅在银河实现
         :param send_interval: 交易发送间隔， 默认为0s。调大可防止卖出买入时卖出单没有及时成交导致的买入金额不足
+        :param cmd_cache_horizon: 指令缓存的保留时长，单位为秒，默认为 trade_cmd_expire_seconds 的 5 倍
+        :param async_tracking: 是否在单个 asyncio 事件循环中轮询全部策略，需要安装 aiohttp
+        :param max_concurrency: 使用 asyncio 轮询时同时进行的最大请求数
+        :param parallel_users: 是否同时向多个 user 下单，每个 user 使用独立的下单线程，仍按指令顺序执行
+        :param adaptive_polling: 是否按 A 股交易时段调整轮询间隔，连续竞价时按 track_interval 轮询，
+            休市时不轮询，查询出错时指数退避
+        :param holidays: 开启 adaptive_polling 时的休市日期列表，类似 ['20240101', '2024-02-12']，周末无需设置
+        :param priority_queue: 是否按优先级调度待执行的指令，卖出指令先于其他股票的买入指令，同方向按信号产生时间先后执行
+        :param net_opposite_cmds: 是否抵消同一股票方向相反的待执行指令，开启时同时按优先级调度
         """
         users = self.warp_list(users)
         strategies = self.warp_list(strategies)
 
-        if cmd_cache:
-            self.load_expired_cmd_cache()
+        self.prepare_cmd_cache(
+            cmd_cache, trade_cmd_expire_seconds, cmd_cache_horizon
+        )
 
         self.start_trader_thread(
-            users, trade_cmd_expire_seconds, entrust_prop, send_interval
+            users,
+            trade_cmd_expire_seconds,
+            entrust_prop,
+            send_interval,
+            parallel_users=parallel_users,
+            priority_queue=priority_queue,
+            net_opposite_cmds=net_opposite_cmds,
         )
 
-        workers = []
+        tracked_strategies = []
         for strategy_url in strategies:
             try:
                 strategy_id = self.extract_strategy_id(strategy_url)
@@ -68,14 +92,16 @@ class JoinQuantFollower(BaseFollower):
             except:
                 logger.error("抽取交易id和策略名失败, 无效的模拟交易url: %s", strategy_url)
                 raise
-            strategy_worker = Thread(
-                target=self.track_strategy_worker,
-                args=[strategy_id, strategy_name],
-                kwargs={"interval": track_interval},
-            )
-            strategy_worker.start()
-            workers.append(strategy_worker)
-            logger.info("开始跟踪策略: %s", strategy_name)
+            tracked_strategies.append((strategy_id, strategy_name, {}))
+        workers = self.start_strategy_trackers(
+            tracked_strategies,
+            track_interval,
+            async_tracking=async_tracking,
+            max_concurrency=max_concurrency,
+            scheduler=PollScheduler(track_interval, holidays=holidays)
+            if adaptive_polling
+            else None,
+        )
         for worker in workers:
             worker.join()
 
@@ -119,19 +145,15 @@ class JoinQuantFollower(BaseFollower):
         raise TypeError("not valid stock code: {}".format(code))
 
     def project_transactions(self, transactions, **kwargs):
-        for transaction in transactions:
-            transaction["amount"] = self.re_find(
-                r"\d+", transaction["amount"], dtype=int
-            )
-
-            time_str = "{} {}".format(transaction["date"], transaction["time"])
-            transaction["datetime"] = datetime.strptime(
-                time_str, "%Y-%m-%d %H:%M:%S"
-            )
-
-            stock = self.re_find(r"\d{6}\.\w{4}", transaction["stock"])
-            transaction["stock_code"] = self.stock_shuffle_to_prefix(stock)
-
-            transaction["action"] = (
-                "buy" if transaction["transaction"] == "买" else "sell"
-            )
+        return [self._project_transaction(transaction) for transaction in transactions]
+
+    def _project_transaction(self, transaction):
+        time_str = "{} {}".format(transaction["date"], transaction["time"])
+        stock = self.re_find(r"\d{6}\.\w{4}", transaction["stock"])
+        return Transaction(
+            action="buy" if transaction["transaction"] == "买" else "sell",
+            stock_code=self.stock_shuffle_to_prefix(stock),
+            amount=self.re_find(r"\d+", transaction["amount"], dtype=int),
+            price=transaction["price"],
+            datetime=datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S"),
+        )
@@ -1,14 +1,17 @@
 # coding:utf-8
 import re
-import time
 from typing import Optional
 
 from easytrader import exceptions
 from easytrader.utils.perf import perf_clock
+from easytrader.utils.wait import wait_window_closed
 from easytrader.utils.win_gui import SetForegroundWindow, ShowWindow, win32defines
 
 
 class PopDialogHandler:
+    # 处理弹窗后等待弹窗关闭的最长时间，单位为秒
+    close_timeout = 0.5
+
     def __init__(self, app):
         self._app = app
 
@@ -41,20 +44,30 @@ class PopDialogHandler:
     def _extract_entrust_id(content):
         return re.search(r"[\da-zA-Z]+", content).group()
 
+    def _wait_closed(self, dialog):
+        """等待弹窗关闭，避免下一次检查弹窗时取到正在关闭的同一个弹窗"""
+        wait_window_closed(dialog, self.close_timeout)
+
     def _submit_by_click(self):
+        dialog = self._app.top_window().wrapper_object()
         try:
             self._app.top_window()["确定"].click()
         except Exception as ex:
             self._app.Window_(best_match="Dialog", top_level_only=True).ChildWindow(
                 best_match="确定"
             ).click()
+        self._wait_closed(dialog)
 
     def _submit_by_shortcut(self):
+        dialog = self._app.top_window().wrapper_object()
         self._set_foreground(self._app.top_window())
         self._app.top_window().type_keys("%Y", set_foreground=False)
+        self._wait_closed(dialog)
 
     def _close(self):
+        dialog = self._app.top_window().wrapper_object()
         self._app.top_window().close()
+        self._wait_closed(dialog)
 
 
 class TradePopDialogHandler(PopDialogHandler):
@@ -92,7 +105,6 @@ class TradePopDialogHandler(PopDialogHandler):
                 return {"entrust_no": entrust_no}
 
             self._submit_by_click()
-            time.sleep(0.05)
             raise exceptions.TradeError(content)
         self._close()
         return None
@@ -5,7 +5,6 @@ import tempfile
 from io import StringIO
 from typing import TYPE_CHECKING, Dict, List, Optional
 
-import pandas as pd
 import pywinauto.keyboard
 import pywinauto
 import pywinauto.clipboard
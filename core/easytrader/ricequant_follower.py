@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
-
+import asyncio
+import functools
 from datetime import datetime
-from threading import Thread
 
-from easytrader.follower import BaseFollower
+from easytrader.follower import BaseFollower, Transaction
 from easytrader.log import logger
+from easytrader.utils.scheduler import PollScheduler
 
 
 class RiceQuantFollower(BaseFollower):
@@ -26,6 +27,14 @@ class RiceQuantFollower(BaseFollower):
         cmd_cache=True,
         entrust_prop="limit",
         send_interval=0,
+        cmd_cache_horizon=None,
+        async_tracking=False,
+        max_concurrency=20,
+        parallel_users=False,
+        adaptive_polling=False,
+        holidays=None,
+        priority_queue=False,
+        net_opposite_cmds=False,
     ):
         """跟踪ricequant对应的模拟交易，支持多用户多策略
         :param users: 支持easytrader的用户对象，支持使用 [] 指定多个用户
@@ -35,28 +44,45 @@ class RiceQuantFollower(BaseFollower):
         :param cmd_cache: 是否读取存储历史执行过的指令，防止重启时重复执行已经交易过的指令
         :param entrust_prop: 委托方式, 'limit' 为限价，'market' 为市价, 仅在银河实现
         :param send_interval: 交易发送间隔， 默认为0s。调大可防止卖出买入时卖出单没有及时成交导致的买入金额不足
+        :param cmd_cache_horizon: 指令缓存的保留时长，单位为秒，默认为 trade_cmd_expire_seconds 的 5 倍
+        :param async_tracking: 是否在单个 asyncio 事件循环中轮询全部策略，需要安装 aiohttp
+        :param max_concurrency: 使用 asyncio 轮询时同时进行的最大请求数
+        :param parallel_users: 是否同时向多个 user 下单，每个 user 使用独立的下单线程，仍按指令顺序执行
+        :param adaptive_polling: 是否按 A 股交易时段调整轮询间隔，连续竞价时按 track_interval 轮询，
+            休市时不轮询，查询出错时指数退避
+        :param holidays: 开启 adaptive_polling 时的休市日期列表，类似 ['20240101', '2024-02-12']，周末无需设置
+        :param priority_queue: 是否按优先级调度待执行的指令，卖出指令先于买入指令，同方向按信号产生时间先后执行
+        :param net_opposite_cmds: 是否抵消同一股票方向相反的待执行指令，开启时同时按优先级调度
         """
         users = self.warp_list(users)
         run_ids = self.warp_list(run_id)
 
-        if cmd_cache:
-            self.load_expired_cmd_cache()
+        self.prepare_cmd_cache(
+            cmd_cache, trade_cmd_expire_seconds, cmd_cache_horizon
+        )
 
         self.start_trader_thread(
-            users, trade_cmd_expire_seconds, entrust_prop, send_interval
+            users,
+            trade_cmd_expire_seconds,
+            entrust_prop,
+            send_interval,
+            parallel_users=parallel_users,
+            priority_queue=priority_queue,
+            net_opposite_cmds=net_opposite_cmds,
         )
 
-        workers = []
-        for id_ in run_ids:
-            strategy_name = self.extract_strategy_name(id_)
-            strategy_worker = Thread(
-                target=self.track_strategy_worker,
-                args=[id_, strategy_name],
-                kwargs={"interval": track_interval},
-            )
-            strategy_worker.start()
-            workers.append(strategy_worker)
-            logger.info("开始跟踪策略: %s", strategy_name)
+        tracked_strategies = [
+            (id_, self.extract_strategy_name(id_), {}) for id_ in run_ids
+        ]
+        workers = self.start_strategy_trackers(
+            tracked_strategies,
+            track_interval,
+            async_tracking=async_tracking,
+            max_concurrency=max_concurrency,
+            scheduler=PollScheduler(track_interval, holidays=holidays)
+            if adaptive_polling
+            else None,
+        )
         for worker in workers:
             worker.join()
 
@@ -87,6 +113,14 @@ class RiceQuantFollower(BaseFollower):
         transactions = self.project_transactions(transactions, **kwargs)
         return self.order_transactions_sell_first(transactions)
 
+    async def async_query_strategy_transaction(self, session, strategy, **kwargs):
+        # RQOpenClient 只提供同步接口，放到线程池中执行
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(self.query_strategy_transaction, strategy, **kwargs),
+        )
+
     @staticmethod
     def stock_shuffle_to_prefix(stock):
         assert (
@@ -100,20 +134,13 @@ class RiceQuantFollower(BaseFollower):
         raise TypeError("not valid stock code: {}".format(code))
 
     def project_transactions(self, transactions, **kwargs):
-        new_transactions = []
-        for transaction in transactions:
-            new_transaction = {}
-            new_transaction["price"] = transaction["price"]
-            new_transaction["amount"] = int(abs(transaction["quantity"]))
-            new_transaction["datetime"] = datetime.strptime(
-                transaction["time"], "%Y-%m-%d %H:%M:%S"
-            )
-            new_transaction["stock_code"] = self.stock_shuffle_to_prefix(
-                transaction["order_book_id"]
-            )
-            new_transaction["action"] = (
-                "buy" if transaction["quantity"] > 0 else "sell"
-            )
-            new_transactions.append(new_transaction)
-
-        return new_transactions
+        return [self._project_transaction(transaction) for transaction in transactions]
+
+    def _project_transaction(self, transaction):
+        return Transaction(
+            action="buy" if transaction["quantity"] > 0 else "sell",
+            stock_code=self.stock_shuffle_to_prefix(transaction["order_book_id"]),
+            amount=int(abs(transaction["quantity"])),
+            price=transaction["price"],
+            datetime=datetime.strptime(transaction["time"], "%Y-%m-%d %H:%M:%S"),
+        )
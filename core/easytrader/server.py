@@ -4,6 +4,7 @@ from flask import Flask, jsonify, request
 
 from . import api
 from .log import logger
+from .utils.gui_executor import ThreadSafeTrader
 
 app = Flask(__name__)
 
@@ -32,7 +33,11 @@ def post_prepare():
     user = api.use(json_data.pop("broker"))
     user.prepare(**json_data)
 
-    global_store["user"] = user
+    # flask 在多个线程中处理请求，界面操作交给同一个线程依次执行，
+    # 重复 prepare 时沿用之前的执行线程，不再为每次登录新建线程
+    previous = global_store.get("user")
+    executor = previous.executor if previous is not None else None
+    global_store["user"] = ThreadSafeTrader(user, executor)
     return jsonify({"msg": "login success"}), 201
 
 
@@ -1,9 +1,12 @@
 import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 from PIL import Image
 
 from easytrader import exceptions
+from easytrader.log import logger
 
 
 def captcha_recognize(img_path):
@@ -25,6 +28,59 @@ def captcha_recognize(img_path):
     return num
 
 
+def recognize_in_parallel(pipelines, image, max_workers=None, length=4, agree=2):
+    """
+    并行运行多种验证码识别方法，agree 个方法的结果一致(不区分大小写)时立即返回，不再等待其余方法
+    tesseract 在子进程中运行，使用线程池即可并行识别
+    :param pipelines: [(方法名, 识别函数)], 识别函数的参数为 PIL 图片，每个方法得到一份图片副本
+    :param image: 已经解码的 PIL 图片
+    :param max_workers: 最多同时运行的方法数，默认为方法数
+    :param length: 有效识别结果的长度
+    :param agree: 结果一致的方法数达到多少时提前返回
+    :return: 识别结果，所有方法都失败时返回空字符串
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(pipelines))
+    futures = {
+        executor.submit(func, image.copy()): (index, name)
+        for index, (name, func) in enumerate(pipelines)
+    }
+    # {方法序号: 识别结果}
+    results = {}
+    votes = Counter()
+    try:
+        for future in as_completed(futures):
+            index, name = futures[future]
+            try:
+                result = future.result()
+            # pylint: disable=broad-except
+            except Exception as e:
+                logger.warning("%s失败: %s", name, e)
+                continue
+            if not result or len(result) != length:
+                continue
+            logger.info("%s识别结果: %s", name, result)
+            results[index] = result
+            votes[result.lower()] += 1
+            if votes[result.lower()] >= agree:
+                # 返回一致的结果中排在最前的方法的结果
+                return min(
+                    (i, r) for i, r in results.items() if r.lower() == result.lower()
+                )[1]
+    finally:
+        # 已经开始的识别无法中断，只取消尚未开始的方法
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    if not results:
+        return ""
+    # 没有达成一致时，按方法顺序对结果及其大小写变体投票
+    variants = []
+    for _, result in sorted(results.items()):
+        variants.extend([result, result.upper(), result.lower()])
+    return Counter(variants).most_common(1)[0][0]
+
+
 def recognize_verify_code(image_path, broker="ht", max_retries=3):
     """识别验证码，返回识别后的字符串，使用 tesseract 实现
     :param image_path: 图片路径
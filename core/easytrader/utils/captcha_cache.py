@@ -0,0 +1,114 @@
+# coding:utf-8
+import collections
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from easytrader.log import logger
+
+# 默认的缓存文件
+CAPTCHA_CACHE_FILE = "captcha_cache.json"
+
+
+class CaptchaCache:
+    """
+    验证码图片到正确答案的缓存
+    客户端会重复显示之前出现过的验证码图片，命中缓存时不再调用 OCR 识别。
+    只有客户端接受了答案才写入缓存，缓存的答案被拒绝时删除；
+    超出 max_entries 时淘汰最久没有使用的记录，每次写入后保存到文件。
+    """
+
+    def __init__(self, path: Optional[str] = CAPTCHA_CACHE_FILE, max_entries=2000):
+        """
+        :param path: 缓存文件路径，为 None 时只缓存在内存中
+        :param max_entries: 最多缓存的验证码数量
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # {图片键: 答案}, 按最近使用的时间排序
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def image_key(image) -> str:
+        """
+        根据图片像素计算缓存键，与图片的保存格式无关
+        :param image: PIL.Image
+        """
+        image = image.convert("L")
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update("{}x{}".format(*image.size).encode("ascii"))
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            answer = self._entries.get(key)
+            if answer is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def put(self, key: str, answer: str):
+        """记录客户端已经接受的答案"""
+        with self._lock:
+            if self._entries.get(key) == answer:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = answer
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def discard(self, key: str):
+        """删除被客户端拒绝的答案"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+            self._entries.update(entries)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        except (OSError, ValueError) as e:
+            logger.warning("读取验证码缓存 %s 失败: %s", self.path, e)
+
+    def _save(self):
+        if self.path is None:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("保存验证码缓存 %s 失败: %s", self.path, e)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_captcha_cache() -> CaptchaCache:
+    """进程内共享的验证码缓存，保存在当前目录的 captcha_cache.json"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = CaptchaCache()
+        return _default_cache
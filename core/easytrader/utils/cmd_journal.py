@@ -0,0 +1,145 @@
+# coding:utf-8
+import json
+import os
+import threading
+import time
+from typing import Callable, Iterable, List, Union
+
+from easytrader.log import logger
+
+
+class CmdJournal:
+    """
+    追加写的指令日志，每行一条 json 记录。
+    写入时只追加一行并 flush 到系统缓冲区，fsync 按条数或时间批量进行，
+    单次写入的开销与历史记录数量无关；进程崩溃时最多损坏最后一行，回放时会被丢弃。
+
+    持久性保证: append 返回后记录已经写入系统缓冲区，进程崩溃不会丢失；
+    后台定时器保证每条记录最迟在 sync_interval 秒后 fsync 到磁盘，
+    因此系统崩溃或断电时最多丢失最近 sync_interval 秒内写入的记录。
+    """
+
+    def __init__(self, path, sync_every=32, sync_interval=1.0):
+        """
+        :param path: 日志文件路径
+        :param sync_every: 累计多少条未落盘记录后执行一次 fsync
+        :param sync_interval: 记录写入后最多经过多少秒执行 fsync
+        """
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        # 日志文件中的记录条数，包括已经失效、等待压缩的记录
+        self.records = 0
+
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer = None
+        self._lock = threading.Lock()
+
+    def replay(self) -> List:
+        """
+        读取日志中的全部记录，末尾写了一半的记录会被截断丢弃
+        :return: [] 记录列表
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                self.records = 0
+                return []
+            with open(self.path, "rb") as f:
+                data = f.read()
+
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                logger.warning("指令日志 %s 末尾存在不完整的记录, 已丢弃", self.path)
+                self._close_file()
+                with open(self.path, "r+b") as f:
+                    f.truncate(end)
+
+            records = []
+            for line in data[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line.decode("utf-8")))
+                except ValueError:
+                    logger.warning("指令日志 %s 存在无法解析的记录: %r, 跳过", self.path, line)
+            self.records = len(records)
+            return records
+
+    def append(self, record):
+        """
+        追加一条记录
+        :param record: 可以被 json 序列化的对象
+        """
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            self.records += 1
+            self._pending += 1
+            if (
+                self._pending >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval
+            ):
+                self._sync()
+            elif self._sync_timer is None:
+                # 之后没有新的写入时，由定时器保证记录按时落盘
+                self._sync_timer = threading.Timer(self.sync_interval, self._timed_sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+
+    def sync(self):
+        """将尚未落盘的记录 fsync 到磁盘"""
+        with self._lock:
+            self._sync()
+
+    def compact(self, records: Union[Iterable, Callable[[], Iterable]]):
+        """
+        使用当前有效的记录原子地重写日志，丢弃失效的记录
+        :param records: 有效记录，或返回有效记录的函数。其他线程同时 append 时需要传入函数，
+            在持有日志锁时读取有效记录，否则读取之后、重写之前追加的记录会被丢弃
+        """
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            if callable(records):
+                records = records()
+            count = 0
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    count += 1
+                f.flush()
+                os.fsync(f.fileno())
+            self._close_file()
+            os.replace(tmp_path, self.path)
+            self.records = count
+            self._pending = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+    def _timed_sync(self):
+        with self._lock:
+            self._sync_timer = None
+            self._sync()
+
+    def _sync(self):
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._file is not None and self._pending:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._sync()
+        self._file.close()
+        self._file = None
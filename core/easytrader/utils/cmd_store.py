@@ -0,0 +1,77 @@
+# coding:utf-8
+import hashlib
+import heapq
+import threading
+import time
+from typing import Dict, List, Set, Tuple
+
+
+class ExpiredCmdStore:
+    """
+    带保留时长的指令去重集合。
+    指令 key 以 8 字节摘要保存，并按指令产生时间分桶索引，
+    产生时间早于 当前时间 - horizon 的指令按桶整体淘汰，内存占用不会随运行时间增长。
+    """
+
+    # 淘汰的时间粒度，单位为秒
+    BUCKET_SECONDS = 60
+
+    def __init__(self, horizon: float = 600):
+        """
+        :param horizon: 指令的保留时长，单位为秒，应为指令过期时间的数倍
+        """
+        self.horizon = horizon
+        self._timestamps: Dict[str, float] = {}
+        self._buckets: Dict[int, Set[str]] = {}
+        self._bucket_heap: List[int] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(key: str) -> str:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+    def is_stale(self, timestamp: float, now: float = None) -> bool:
+        """指令产生时间是否已经超出保留时长"""
+        if now is None:
+            now = time.time()
+        return timestamp < now - self.horizon
+
+    def add(self, digest: str, timestamp: float):
+        with self._lock:
+            if digest in self._timestamps:
+                return
+            self._timestamps[digest] = timestamp
+            bucket = int(timestamp // self.BUCKET_SECONDS)
+            keys = self._buckets.get(bucket)
+            if keys is None:
+                keys = self._buckets[bucket] = set()
+                heapq.heappush(self._bucket_heap, bucket)
+            keys.add(digest)
+
+    def evict(self, now: float = None) -> int:
+        """
+        淘汰超出保留时长的指令
+        :return: 淘汰的指令数量
+        """
+        if now is None:
+            now = time.time()
+        # 只淘汰整个桶都已超出保留时长的指令
+        cutoff = int((now - self.horizon) // self.BUCKET_SECONDS)
+        evicted = 0
+        with self._lock:
+            while self._bucket_heap and self._bucket_heap[0] < cutoff:
+                bucket = heapq.heappop(self._bucket_heap)
+                for digest in self._buckets.pop(bucket):
+                    del self._timestamps[digest]
+                    evicted += 1
+        return evicted
+
+    def items(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return list(self._timestamps.items())
+
+    def __contains__(self, digest) -> bool:
+        return digest in self._timestamps
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
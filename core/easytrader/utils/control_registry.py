@@ -0,0 +1,64 @@
+# coding:utf-8
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+class ControlRegistry:
+    """
+    控件 wrapper 缓存
+    按 (control_id, class_name) 缓存查找到的控件，每次取用前只做一次廉价的句柄校验，
+    句柄失效(窗口销毁、隐藏或被复用为其它控件)时才重新查找控件，避免每次下单都遍历窗口树。
+    """
+
+    def __init__(
+        self,
+        resolve: Callable[[int, str], Any],
+        validate: Callable[[Any, int], bool],
+    ):
+        """
+        :param resolve: 查找控件的函数, resolve(control_id, class_name) -> wrapper
+        :param validate: 校验缓存的控件是否仍然可用的函数, validate(wrapper, control_id) -> bool
+        """
+        self._resolve = resolve
+        self._validate = validate
+        self._controls: Dict[Tuple[int, str], Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, control_id: int, class_name: str):
+        key = (control_id, class_name)
+        with self._lock:
+            control = self._controls.get(key)
+        if control is not None:
+            try:
+                valid = self._validate(control, control_id)
+            # pylint: disable=broad-except
+            except Exception:
+                valid = False
+            if valid:
+                self.hits += 1
+                return control
+
+        self.misses += 1
+        control = self._resolve(control_id, class_name)
+        with self._lock:
+            self._controls[key] = control
+        return control
+
+    def invalidate(self, control_id: int = None, class_name: str = None):
+        """
+        丢弃缓存的控件，不指定参数时丢弃全部
+        """
+        with self._lock:
+            if control_id is None and class_name is None:
+                self._controls.clear()
+                return
+            for key in list(self._controls):
+                if (control_id is None or key[0] == control_id) and (
+                    class_name is None or key[1] == class_name
+                ):
+                    del self._controls[key]
+
+    def __len__(self) -> int:
+        return len(self._controls)
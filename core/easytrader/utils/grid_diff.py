@@ -0,0 +1,86 @@
+# coding:utf-8
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class GridChanges(NamedTuple):
+    # 新增的行
+    added: List[Dict]
+    # 内容发生变化的行 [(上次的数据, 本次的数据)]
+    changed: List[Tuple[Dict, Dict]]
+    # 消失的行
+    removed: List[Dict]
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+
+def row_hash(row: Dict) -> int:
+    return hash(tuple(row.items()))
+
+
+class GridDiffer:
+    """
+    记录每个表格上次的数据，比较得到新增、变化和消失的行
+
+    通过 key_fields 指定的列识别同一行，如当日委托的合同编号，同一委托的状态变化视为 changed；
+    缺少 key_fields 中的列时以整行内容识别，此时行内容变化视为删除旧行并新增一行
+    """
+
+    def __init__(self):
+        # {表格名: {行键: (行哈希, 行数据)}}
+        self._grids: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def update(
+        self, name: str, rows: List[Dict], key_fields: Optional[Sequence[str]] = None
+    ) -> GridChanges:
+        """
+        记录表格本次的数据并返回与上次相比的变化，第一次调用时所有行都视为新增
+        :param name: 表格名，如 today_entrusts
+        :param rows: 本次读取的表格数据
+        :param key_fields: 识别同一行的列
+        """
+        current = {}
+        for row in rows:
+            digest = row_hash(row)
+            key = self._row_key(row, digest, key_fields)
+            # 键重复时依次编号，避免后面的行覆盖前面的行
+            unique_key, count = key, 1
+            while unique_key in current:
+                unique_key = (key, count)
+                count += 1
+            current[unique_key] = (digest, row)
+
+        with self._lock:
+            previous = self._grids.get(name, {})
+            self._grids[name] = current
+
+        added = []
+        changed = []
+        for key, (digest, row) in current.items():
+            old = previous.get(key)
+            if old is None:
+                added.append(row)
+            elif old[0] != digest:
+                changed.append((old[1], row))
+        removed = [row for key, (_, row) in previous.items() if key not in current]
+        return GridChanges(added, changed, removed)
+
+    def reset(self, name: Optional[str] = None):
+        """
+        清除记录的数据，下次 update 时所有行重新视为新增
+        :param name: 表格名，默认清除全部表格
+        """
+        with self._lock:
+            if name is None:
+                self._grids.clear()
+            else:
+                self._grids.pop(name, None)
+
+    @staticmethod
+    def _row_key(row, digest, key_fields):
+        if key_fields and all(field in row for field in key_fields):
+            return tuple(row[field] for field in key_fields)
+        return ("row", digest)
@@ -0,0 +1,138 @@
+# coding:utf-8
+import csv
+import io
+from typing import Dict, List, Tuple
+
+# float() 能够解析但 pandas 不视为数字的写法
+_NOT_NUMBER_WORDS = {"nan", "inf", "+inf", "-inf", "infinity", "+infinity", "-infinity"}
+_BOOL_VALUES = {"true": True, "false": False}
+
+
+def _to_int(values):
+    result = [int(v) for v in values]
+    if any("_" in v for v in values):
+        raise ValueError("not int")
+    return result
+
+
+def _to_float(values):
+    result = [float(v) for v in values]
+    if any("_" in v or v.strip().lower() in _NOT_NUMBER_WORDS for v in values):
+        raise ValueError("not float")
+    return result
+
+
+def _to_bool(values):
+    return [_BOOL_VALUES[v.strip().lower()] for v in values]
+
+
+def infer_column(values: List[str]) -> list:
+    """
+    按 pandas.read_csv(na_filter=False) 的规则推断一列数据的类型：
+    全部是整数时转为 int，全部是数字时转为 float，全部是 True/False 时转为 bool，否则保留字符串
+    """
+    if not values:
+        return values
+    for convert in (_to_int, _to_float, _to_bool):
+        try:
+            return convert(values)
+        except (ValueError, KeyError):
+            continue
+    return values
+
+
+class GridParser:
+    """
+    解析客户端表格复制或导出得到的制表符分隔文本，结果与
+    pandas.read_csv(delimiter="\\t", dtype=dtype, na_filter=False).to_dict("records") 一致
+
+    同一个表格的表头每次都相同，解析过的表头会被缓存
+    """
+
+    # 最多缓存的表头数量
+    max_layouts = 32
+
+    def __init__(self, dtype: Dict[str, type] = None):
+        """
+        :param dtype: {列名: 类型}, 指定类型的列不做类型推断，一般为券商配置中的 GRID_DTYPE
+        """
+        self._dtype = dict(dtype or {})
+        # {表头行: (列名列表, 每列的指定类型, 没有指定类型需要推断的列序号)}
+        self._layouts = {}
+
+    def parse(self, text: str) -> List[Dict]:
+        """
+        :return: [{列名: 值}]
+        :raises ValueError: 文本中没有表头
+        """
+        columns, data = self.parse_columns(text)
+        return [dict(zip(columns, row)) for row in zip(*data)] if data else []
+
+    def parse_columns(self, text: str) -> Tuple[List[str], List[list]]:
+        """
+        按列解析，不需要逐行生成字典时更快
+        :return: (列名列表, 与列名一一对应的每列数据)
+        :raises ValueError: 文本中没有表头
+        """
+        header, rows = self._split(text)
+        columns, converters, infer = self._layout(header)
+        width = len(columns)
+
+        if not rows:
+            return columns, [[] for _ in columns]
+
+        rows = [
+            row if len(row) == width else (row + [""] * width)[:width]
+            for row in rows
+        ]
+        data = [list(column) for column in zip(*rows)]
+        for i, convert in enumerate(converters):
+            if convert is not None:
+                data[i] = [convert(v) for v in data[i]]
+        for i in infer:
+            data[i] = infer_column(data[i])
+        return columns, data
+
+    @staticmethod
+    def _split(text: str):
+        if '"' in text:
+            lines = list(csv.reader(io.StringIO(text), delimiter="\t"))
+        else:
+            lines = [line.split("\t") for line in text.splitlines()]
+        # 跳过空行
+        lines = [line for line in lines if line and line != [""]]
+        if not lines:
+            raise ValueError("表格数据为空")
+        return lines[0], lines[1:]
+
+    def _layout(self, header: List[str]):
+        key = "\t".join(header)
+        layout = self._layouts.get(key)
+        if layout is not None:
+            return layout
+
+        columns = []
+        seen = {}
+        for i, name in enumerate(header):
+            name = name or "Unnamed: {}".format(i)
+            # 与 pandas 一致，重复的列名依次加上 .1, .2 后缀
+            if name in seen:
+                seen[name] += 1
+                name = "{}.{}".format(name, seen[name])
+            else:
+                seen[name] = 0
+            columns.append(name)
+
+        converters = []
+        infer = []
+        for i, name in enumerate(columns):
+            dtype = self._dtype.get(name)
+            converters.append(None if dtype in (None, str) else dtype)
+            if dtype is None:
+                infer.append(i)
+
+        if len(self._layouts) >= self.max_layouts:
+            self._layouts.clear()
+        layout = (columns, converters, infer)
+        self._layouts[key] = layout
+        return layout
@@ -0,0 +1,190 @@
+# coding:utf-8
+import collections
+import functools
+import threading
+from concurrent.futures import Future
+
+
+class GuiExecutor:
+    """
+    在单个线程中依次执行客户端界面操作的执行器
+    下单等写操作按提交顺序执行；查询操作进入快速通道优先执行，
+    相同的查询在排队或执行期间再次提交时直接复用同一个 Future
+    """
+
+    def __init__(self, max_read_burst=4, name="gui-executor"):
+        """
+        :param max_read_burst: 有写操作等待时最多连续执行的查询次数，避免查询过多导致下单被饿死
+        :param name: 执行线程名
+        """
+        self.max_read_burst = max_read_burst
+        self._reads = collections.deque()
+        self._writes = collections.deque()
+        # {查询键: Future}, 排队中和执行中的查询
+        self._pending_reads = {}
+        self._read_burst = 0
+        self._shutdown = False
+        self._cond = threading.Condition()
+        self.coalesced = 0
+
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        提交写操作
+        """
+        future = Future()
+        with self._cond:
+            self._check_running()
+            self._writes.append((future, None, fn, args, kwargs))
+            self._cond.notify()
+        return future
+
+    def submit_read(self, key, fn, *args, **kwargs) -> Future:
+        """
+        提交查询操作
+        :param key: 查询键，键相同的查询视为重复查询
+        """
+        with self._cond:
+            self._check_running()
+            future = self._pending_reads.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = Future()
+            self._pending_reads[key] = future
+            self._reads.append((future, key, fn, args, kwargs))
+            self._cond.notify()
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """
+        执行写操作并等待结果，在执行线程内调用时直接执行
+        """
+        if self.in_executor_thread():
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def read(self, key, fn, *args, **kwargs):
+        """
+        执行查询操作并等待结果，在执行线程内调用时直接执行
+        """
+        if self.in_executor_thread():
+            return fn(*args, **kwargs)
+        return self.submit_read(key, fn, *args, **kwargs).result()
+
+    def in_executor_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def shutdown(self, wait=True):
+        """
+        停止执行器，尚未执行的操作会被取消
+        """
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait and not self.in_executor_thread():
+            self._thread.join()
+
+    def _check_running(self):
+        if self._shutdown:
+            raise RuntimeError("GuiExecutor 已经停止")
+
+    def _next(self):
+        with self._cond:
+            while not self._reads and not self._writes and not self._shutdown:
+                self._cond.wait()
+            if self._shutdown:
+                for future, _, _, _, _ in list(self._reads) + list(self._writes):
+                    future.cancel()
+                self._reads.clear()
+                self._writes.clear()
+                self._pending_reads.clear()
+                return None
+            if self._reads and (
+                not self._writes or self._read_burst < self.max_read_burst
+            ):
+                self._read_burst += 1
+                return self._reads.popleft()
+            self._read_burst = 0
+            return self._writes.popleft()
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            future, key, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            # pylint: disable=broad-except
+            except Exception as ex:
+                self._finish_read(key)
+                future.set_exception(ex)
+            else:
+                self._finish_read(key)
+                future.set_result(result)
+
+    def _finish_read(self, key):
+        if key is None:
+            return
+        with self._cond:
+            self._pending_reads.pop(key, None)
+
+
+class ThreadSafeTrader:
+    """
+    线程安全的 trader 代理，所有界面操作都交给同一个 GuiExecutor 执行
+    读取 READ_ATTRS 中的属性走查询快速通道，调用方法走写操作通道
+
+        user = ThreadSafeTrader(easytrader.use("ths"))
+    """
+
+    READ_ATTRS = (
+        "balance",
+        "position",
+        "today_entrusts",
+        "today_trades",
+        "cancel_entrusts",
+    )
+
+    def __init__(self, trader, executor: GuiExecutor = None):
+        """
+        :param trader: 被代理的 trader
+        :param executor: 执行器，默认新建一个
+        """
+        object.__setattr__(self, "_trader", trader)
+        object.__setattr__(self, "_executor", executor or GuiExecutor())
+        # 客户端 trader 的账户状态缓存在同一个执行器中后台刷新
+        set_gui_executor = getattr(trader, "set_gui_executor", None)
+        if callable(set_gui_executor):
+            set_gui_executor(self._executor)
+
+    @property
+    def trader(self):
+        return self._trader
+
+    @property
+    def executor(self) -> GuiExecutor:
+        return self._executor
+
+    def __getattr__(self, name):
+        if name in self.READ_ATTRS:
+            return self._executor.read(name, getattr, self._trader, name)
+
+        attr = self._executor.call(getattr, self._trader, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            return self._executor.call(attr, *args, **kwargs)
+
+        return call
+
+    def __setattr__(self, name, value):
+        self._executor.call(setattr, self._trader, name, value)
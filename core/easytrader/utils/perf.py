@@ -1,7 +1,13 @@
 # coding:utf-8
+import collections
+import contextlib
 import functools
 import inspect
+import json
 import logging
+import math
+import threading
+import time
 import timeit
 
 from easytrader import logger
@@ -46,3 +52,154 @@ def perf_clock(f):
     
     wrapper.__signature__ = inspect.signature(f)
     return wrapper
+
+
+def percentile(values, percent):
+    """最近秩法计算百分位数"""
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    rank = max(1, int(math.ceil(percent / 100 * len(values))))
+    return values[rank - 1]
+
+
+class LatencyRecorder:
+    """
+    记录每次交易各阶段耗时的环形缓冲区，只保留最近 maxlen 次交易
+
+        with recorder.trace("buy"):
+            with recorder.phase("set_params"):
+                ...
+
+    嵌套的 trace 合并到最外层的 trace 中，没有 trace 时 phase 不做记录
+    """
+
+    def __init__(self, maxlen=1000, clock=time.perf_counter):
+        """
+        :param maxlen: 保留的交易记录数
+        :param clock: 计时函数，单位为秒
+        """
+        self._records = collections.deque(maxlen=maxlen)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def trace(self, op):
+        """
+        记录一次交易
+        :param op: 操作名，如 buy, sell, cancel_entrust
+        """
+        if getattr(self._local, "record", None) is not None:
+            yield
+            return
+
+        record = {"op": op, "time": time.time(), "phases": [], "error": None}
+        self._local.record = record
+        start = self._clock()
+        try:
+            yield
+        except Exception as ex:
+            record["error"] = repr(ex)
+            raise
+        finally:
+            self._local.record = None
+            record["total"] = self._clock() - start
+            with self._lock:
+                self._records.append(record)
+            logger.debug(
+                "%s 耗时 %.4f 秒, 各阶段: %s",
+                op,
+                record["total"],
+                ", ".join("%s %.4f" % p for p in record["phases"]),
+            )
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        记录当前交易中一个阶段的耗时，同名阶段可以出现多次
+        :param name: 阶段名
+        """
+        record = getattr(self._local, "record", None)
+        if record is None:
+            yield
+            return
+        start = self._clock()
+        try:
+            yield
+        finally:
+            record["phases"].append((name, self._clock() - start))
+
+    def records(self, op=None):
+        """
+        :param op: 只返回指定操作的记录，默认返回全部
+        :return: 按时间顺序排列的交易记录
+            [{'op': 操作名, 'time': 开始时间戳, 'total': 总耗时, 'phases': [(阶段名, 耗时)], 'error': 异常}]
+        """
+        with self._lock:
+            records = list(self._records)
+        return [
+            dict(r, phases=list(r["phases"]))
+            for r in records
+            if op is None or r["op"] == op
+        ]
+
+    def summary(self, op=None):
+        """
+        按操作和阶段统计耗时，同一次交易中同名阶段的耗时相加，单位为秒
+        :return: {操作名: {阶段名: {'count', 'mean', 'p50', 'p99', 'max'}}}，阶段 total 为整次交易的耗时
+        """
+        durations = collections.defaultdict(lambda: collections.defaultdict(list))
+        for record in self.records(op):
+            phases = collections.OrderedDict()
+            for name, seconds in record["phases"]:
+                phases[name] = phases.get(name, 0.0) + seconds
+            phases["total"] = record["total"]
+            for name, seconds in phases.items():
+                durations[record["op"]][name].append(seconds)
+
+        return {
+            op_name: {
+                name: {
+                    "count": len(values),
+                    "mean": sum(values) / len(values),
+                    "p50": percentile(values, 50),
+                    "p99": percentile(values, 99),
+                    "max": max(values),
+                }
+                for name, values in phases.items()
+            }
+            for op_name, phases in durations.items()
+        }
+
+    def export(self, path):
+        """
+        把交易记录和统计结果保存为 json 文件
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"records": self.records(), "summary": self.summary()},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+def trace_latency(f):
+    """
+    把方法的调用记录为一次交易，操作名为方法名，耗时记录到实例的 latency 属性中
+    """
+
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        recorder = getattr(self, "latency", None)
+        if recorder is None:
+            return f(self, *args, **kwargs)
+        with recorder.trace(f.__name__):
+            return f(self, *args, **kwargs)
+
+    return wrapper
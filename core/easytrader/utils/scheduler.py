@@ -0,0 +1,98 @@
+# coding:utf-8
+import datetime
+import random
+from typing import Iterable, Optional
+
+
+def _to_date(day) -> datetime.date:
+    if isinstance(day, datetime.datetime):
+        return day.date()
+    if isinstance(day, datetime.date):
+        return day
+    return datetime.datetime.strptime(str(day).replace("-", ""), "%Y%m%d").date()
+
+
+class PollScheduler:
+    """
+    根据 A 股交易日历和交易时段决定策略的轮询间隔
+    连续竞价时段使用设置的轮询间隔，集合竞价时段使用较宽松的间隔，
+    午休、收盘后、周末和节假日不轮询，直接等待到下一个交易时段开始。
+    查询出错时按指数退避并加入随机抖动。
+    """
+
+    # 交易时段, (开始时间, 结束时间, 是否连续竞价)
+    SESSIONS = [
+        (datetime.time(9, 15), datetime.time(9, 30), False),
+        (datetime.time(9, 30), datetime.time(11, 30), True),
+        (datetime.time(13, 0), datetime.time(14, 57), True),
+        (datetime.time(14, 57), datetime.time(15, 0), False),
+    ]
+
+    # 单次休眠的最长时间，超过后重新计算，避免系统休眠或修改时间导致错过开盘
+    MAX_SLEEP_SECONDS = 3600
+
+    def __init__(
+        self,
+        interval: float,
+        auction_interval: Optional[float] = None,
+        holidays: Optional[Iterable] = None,
+        error_base_seconds: float = 3,
+        error_max_seconds: float = 300,
+    ):
+        """
+        :param interval: 连续竞价时段的轮询间隔，单位为秒
+        :param auction_interval: 集合竞价时段的轮询间隔，单位为秒，默认为 interval 的 3 倍
+        :param holidays: 休市日期列表，支持 date 对象或 '20240101', '2024-01-01' 格式的字符串，
+            周末默认休市，无需设置
+        :param error_base_seconds: 查询出错后首次重试的等待时间
+        :param error_max_seconds: 查询出错后重试的最长等待时间
+        """
+        self.interval = interval
+        self.auction_interval = (
+            auction_interval if auction_interval is not None else interval * 3
+        )
+        self.holidays = {_to_date(day) for day in holidays or []}
+        self.error_base_seconds = error_base_seconds
+        self.error_max_seconds = error_max_seconds
+
+    def is_trade_day(self, day) -> bool:
+        day = _to_date(day)
+        return day.weekday() < 5 and day not in self.holidays
+
+    def next_delay(self, now: Optional[datetime.datetime] = None) -> float:
+        """
+        距离下一次轮询的秒数
+        :param now: 当前时间, 默认为 datetime.datetime.now()
+        """
+        if now is None:
+            now = datetime.datetime.now()
+        if self.is_trade_day(now):
+            current = now.time()
+            for start, end, continuous in self.SESSIONS:
+                if start <= current < end:
+                    return self.interval if continuous else self.auction_interval
+        next_open = self.next_session_start(now)
+        delay = (next_open - now).total_seconds()
+        return min(delay, self.MAX_SLEEP_SECONDS)
+
+    def next_session_start(self, now: datetime.datetime) -> datetime.datetime:
+        """now 之后最近一个交易时段的开始时间"""
+        day = now.date()
+        while True:
+            if self.is_trade_day(day):
+                for start, _, _ in self.SESSIONS:
+                    session_start = datetime.datetime.combine(day, start)
+                    if session_start > now:
+                        return session_start
+            day += datetime.timedelta(days=1)
+
+    def error_delay(self, errors: int) -> float:
+        """
+        连续出错后的重试等待秒数
+        :param errors: 连续出错次数，从 1 开始
+        """
+        delay = min(
+            self.error_max_seconds,
+            self.error_base_seconds * 2 ** min(max(errors - 1, 0), 16),
+        )
+        return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,107 @@
+# coding:utf-8
+import copy
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from easytrader.log import logger
+
+
+class StateCache:
+    """
+    账户状态读穿缓存
+    缓存未过期时直接返回缓存值；过期后 stale_ttl 秒内仍返回旧值，同时在后台刷新；
+    超出 stale_ttl 或缓存被作废后同步读取。作废期间正在进行的读取结果不会写入缓存。
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, float],
+        stale_ttl: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+        refresh_executor=None,
+    ):
+        """
+        :param ttls: {字段: 缓存有效秒数}, 未配置的字段不缓存
+        :param stale_ttl: 缓存过期后仍可返回旧值并在后台刷新的秒数
+        :param clock: 计时函数
+        :param refresh_executor: 执行后台刷新的执行器，需要提供 submit(fn, *args) 方法，
+            如 GuiExecutor，使刷新与其他界面操作依次执行；默认每次刷新启动一个后台线程
+        """
+        self.ttls = dict(ttls)
+        self.stale_ttl = stale_ttl
+        self.refresh_executor = refresh_executor
+        self._clock = clock
+        # {字段: (缓存值, 读取时间)}
+        self._entries: Dict[str, tuple] = {}
+        # {字段: 作废次数}
+        self._generations: Dict[str, int] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, field: str, loader: Callable[[], Any]):
+        """
+        读取字段
+        :param field: 字段名
+        :param loader: 缓存失效时读取字段的函数
+        """
+        ttl = self.ttls.get(field)
+        if ttl is None:
+            return loader()
+
+        with self._lock:
+            entry = self._entries.get(field)
+            generation = self._generations.get(field, 0)
+            if entry is not None:
+                value, loaded_at = entry
+                age = self._clock() - loaded_at
+                if age < ttl:
+                    return copy.deepcopy(value)
+                if age < ttl + self.stale_ttl:
+                    if field not in self._refreshing:
+                        self._refreshing.add(field)
+                        self._start_refresh(field, loader, generation)
+                    return copy.deepcopy(value)
+
+        return copy.deepcopy(self._load(field, loader, generation))
+
+    def invalidate(self, *fields: str):
+        """
+        作废缓存，不指定字段时作废全部
+        """
+        with self._lock:
+            for field in fields or list(set(self.ttls) | set(self._entries)):
+                self._entries.pop(field, None)
+                self._generations[field] = self._generations.get(field, 0) + 1
+
+    def _load(self, field, loader, generation):
+        value = loader()
+        with self._lock:
+            if self._generations.get(field, 0) == generation:
+                self._entries[field] = (value, self._clock())
+        return value
+
+    def _start_refresh(self, field, loader, generation):
+        if self.refresh_executor is not None:
+            try:
+                self.refresh_executor.submit(self._refresh, field, loader, generation)
+            except RuntimeError:
+                # 执行器已经停止
+                logger.warning("提交 %s 的后台刷新失败", field, exc_info=True)
+                self._refreshing.discard(field)
+            return
+        thread = threading.Thread(
+            target=self._refresh, args=(field, loader, generation)
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _refresh(self, field, loader, generation):
+        try:
+            self._load(field, loader, generation)
+        # pylint: disable=broad-except
+        except Exception:
+            logger.exception("后台刷新 %s 失败", field)
+        finally:
+            with self._lock:
+                self._refreshing.discard(field)
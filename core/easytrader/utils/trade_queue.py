@@ -0,0 +1,148 @@
+# coding:utf-8
+import heapq
+import itertools
+import queue
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from easytrader.log import logger
+
+
+class TradeCmdQueue:
+    """
+    按优先级调度的交易指令队列，接口与 queue.Queue 的 put/get/qsize/empty 兼容。
+    队列中的卖出指令先于其他股票的买入指令取出，同方向的指令按信号产生时间先后取出；
+    同一股票已有待执行的买入指令时，卖出指令排在买入指令之后，避免先卖出还没买入的股票；
+    开启 net_opposite 后，同一股票方向相反、尚未取出的指令会相互抵消，只下一笔净额单。
+    """
+
+    SIDE_PRIORITY = {"sell": 0, "buy": 1}
+
+    def __init__(self, net_opposite=False):
+        """
+        :param net_opposite: 是否抵消同一股票方向相反的待执行指令
+        """
+        self.net_opposite = net_opposite
+        # 堆中元素为 [方向优先级, 信号产生时间, 序号, 指令], 指令为 None 表示已被抵消
+        self._heap: List[list] = []
+        # {(股票代码, 动作): [堆元素, ...]}, 按入队顺序排列，用于查找可以抵消的指令
+        self._pending: Dict[Tuple[str, str], List[list]] = {}
+        self._size = 0
+        self._seq = itertools.count()
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def put(self, cmd, block=True, timeout=None):
+        """
+        加入交易指令
+        :param cmd: 交易指令字典，需要包含 action, stock_code, amount, datetime
+        """
+        with self._not_empty:
+            if self.net_opposite:
+                cmd = self._net(cmd)
+                if cmd is None:
+                    return
+            priority = self.SIDE_PRIORITY.get(cmd["action"], len(self.SIDE_PRIORITY))
+            if cmd["action"] == "sell" and (cmd["stock_code"], "buy") in self._pending:
+                # 与同一股票的买入指令按信号产生时间先后执行
+                priority = self.SIDE_PRIORITY["buy"]
+            entry = [
+                priority,
+                cmd["datetime"].timestamp(),
+                next(self._seq),
+                cmd,
+            ]
+            heapq.heappush(self._heap, entry)
+            self._pending.setdefault((cmd["stock_code"], cmd["action"]), []).append(
+                entry
+            )
+            self._size += 1
+            self._not_empty.notify()
+
+    def get(self, block=True, timeout=None):
+        """
+        取出优先级最高的交易指令
+        :raise queue.Empty: 非阻塞或等待超时时队列为空
+        """
+        with self._not_empty:
+            if not block:
+                if not self._size:
+                    raise queue.Empty
+            elif timeout is None:
+                while not self._size:
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while not self._size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    self._not_empty.wait(remaining)
+            return self._pop()
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def put_nowait(self, cmd):
+        self.put(cmd, block=False)
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return not self._size
+
+    def _pop(self):
+        while True:
+            entry = heapq.heappop(self._heap)
+            cmd = entry[3]
+            if cmd is None:
+                continue
+            self._remove_pending(entry)
+            return cmd
+
+    def _remove_pending(self, entry):
+        cmd = entry[3]
+        key = (cmd["stock_code"], cmd["action"])
+        entries = self._pending[key]
+        entries.remove(entry)
+        if not entries:
+            del self._pending[key]
+        self._size -= 1
+
+    def _net(self, cmd):
+        """
+        用待执行的反向指令抵消新指令
+        :return: 抵消后剩余的新指令, 完全抵消时返回 None
+        """
+        opposite = "buy" if cmd["action"] == "sell" else "sell"
+        entries = self._pending.get((cmd["stock_code"], opposite))
+        amount = cmd["amount"]
+        # 优先抵消最早的反向指令
+        while entries and amount > 0:
+            entry = entries[0]
+            pending_cmd = entry[3]
+            netted = min(amount, pending_cmd["amount"])
+            amount -= netted
+            logger.info(
+                "策略 [%s] 指令(股票: %s 动作: %s 数量: %s) 与策略 [%s] 待执行的反向指令(数量: %s) 抵消 %s 股",
+                cmd["strategy_name"],
+                cmd["stock_code"],
+                cmd["action"],
+                cmd["amount"],
+                pending_cmd["strategy_name"],
+                pending_cmd["amount"],
+                netted,
+            )
+            if netted < pending_cmd["amount"]:
+                # 指令可能同时分发给多个队列，不能直接修改原指令
+                entry[3] = dict(pending_cmd, amount=pending_cmd["amount"] - netted)
+            else:
+                self._remove_pending(entry)
+                entry[3] = None
+                entries = self._pending.get((cmd["stock_code"], opposite))
+        if amount <= 0:
+            return None
+        if amount == cmd["amount"]:
+            return cmd
+        return dict(cmd, amount=amount)
@@ -0,0 +1,56 @@
+# coding:utf-8
+import time
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+# 轮询窗口和控件状态的默认间隔，单位为秒
+DEFAULT_POLL_INTERVAL = 0.02
+
+
+def wait_until(
+    condition: Callable[[], T],
+    timeout: float,
+    interval: float = DEFAULT_POLL_INTERVAL,
+) -> T:
+    """
+    按固定间隔轮询 condition，直到返回真值或超时
+    condition 抛出的异常视为条件尚未满足，窗口正在创建或销毁时查询控件经常会抛出异常
+    :param condition: 无参数的检查函数
+    :param timeout: 最长等待时间，单位为秒
+    :param interval: 轮询间隔，单位为秒
+    :return: condition 最后一次的返回值，超时且最后一次抛出异常时返回 None
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = condition()
+        # pylint: disable=broad-except
+        except Exception:
+            result = None
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return result
+        time.sleep(min(interval, remaining))
+
+
+def wait_window_closed(
+    window, timeout: float, interval: float = DEFAULT_POLL_INTERVAL
+) -> bool:
+    """
+    等待窗口关闭或隐藏
+    :param window: pywinauto 的窗口 wrapper
+    :return: 窗口是否已经关闭
+    """
+
+    def closed():
+        try:
+            return not window.is_visible()
+        # pylint: disable=broad-except
+        except Exception:
+            # 窗口句柄已经失效
+            return True
+
+    return wait_until(closed, timeout, interval)
@@ -1,14 +1,16 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, print_function, unicode_literals
 
+import asyncio
+import functools
 import json
 import re
 from datetime import datetime
 from numbers import Number
-from threading import Thread
 
-from easytrader.follower import BaseFollower
+from easytrader.follower import BaseFollower, Transaction
 from easytrader.log import logger
+from easytrader.utils.scheduler import PollScheduler
 from easytrader.utils.misc import parse_cookies_str
 
 
@@ -19,10 +21,18 @@ class XueQiuFollower(BaseFollower):
     PORTFOLIO_URL = "https://xueqiu.com/p/"
     WEB_REFERER = "https://www.xueqiu.com"
 
+    # 发现新的调仓后，补齐两次轮询之间遗漏的调仓时每页查询的记录数和最多查询的页数
+    CATCH_UP_PAGE_SIZE = 10
+    CATCH_UP_MAX_PAGES = 3
+
     def __init__(self):
         super().__init__()
         self._adjust_sell = None
         self._users = None
+        # 各组合最近处理过的调仓 {组合名: 调仓记录}
+        self._last_rebalancings = {}
+        # 各组合调仓接口返回的 ETag/Last-Modified, 用于条件请求
+        self._validators = {}
 
     def login(self, user=None, password=None, **kwargs):
         """
@@ -57,6 +67,14 @@ class XueQiuFollower(BaseFollower):
         trade_cmd_expire_seconds=120,
         cmd_cache=True,
         slippage: float = 0.0,
+        cmd_cache_horizon=None,
+        async_tracking=False,
+        max_concurrency=20,
+        parallel_users=False,
+        adaptive_polling=False,
+        holidays=None,
+        priority_queue=False,
+        net_opposite_cmds=False,
     ):
         """跟踪 joinquant 对应的模拟交易，支持多用户多策略
         :param users: 支持 easytrader 的用户对象，支持使用 [] 指定多个用户
@@ -77,6 +95,15 @@ class XueQiuFollower(BaseFollower):
         :param trade_cmd_expire_seconds: 交易指令过期时间, 单位为秒
         :param cmd_cache: 是否读取存储历史执行过的指令，防止重启时重复执行已经交易过的指令
         :param slippage: 滑点，0.0 表示无滑点, 0.05 表示滑点为 5%
+        :param cmd_cache_horizon: 指令缓存的保留时长，单位为秒，默认为 trade_cmd_expire_seconds 的 5 倍
+        :param async_tracking: 是否在单个 asyncio 事件循环中轮询全部策略，需要安装 aiohttp
+        :param max_concurrency: 使用 asyncio 轮询时同时进行的最大请求数
+        :param parallel_users: 是否同时向多个 user 下单，每个 user 使用独立的下单线程，仍按指令顺序执行
+        :param adaptive_polling: 是否按 A 股交易时段调整轮询间隔，连续竞价时按 track_interval 轮询，
+            休市时不轮询，查询出错时指数退避
+        :param holidays: 开启 adaptive_polling 时的休市日期列表，类似 ['20240101', '2024-02-12']，周末无需设置
+        :param priority_queue: 是否按优先级调度待执行的指令，卖出指令先于其他股票的买入指令，同方向按信号产生时间先后执行
+        :param net_opposite_cmds: 是否抵消同一股票方向相反的待执行指令，开启时同时按优先级调度
         """
         super().follow(
             users=users,
@@ -85,6 +112,7 @@ class XueQiuFollower(BaseFollower):
             trade_cmd_expire_seconds=trade_cmd_expire_seconds,
             cmd_cache=cmd_cache,
             slippage=slippage,
+            cmd_cache_horizon=cmd_cache_horizon,
         )
 
         self._adjust_sell = adjust_sell
@@ -95,11 +123,19 @@ class XueQiuFollower(BaseFollower):
         total_assets = self.warp_list(total_assets)
         initial_assets = self.warp_list(initial_assets)
 
-        if cmd_cache:
-            self.load_expired_cmd_cache()
+        self.prepare_cmd_cache(
+            cmd_cache, trade_cmd_expire_seconds, cmd_cache_horizon
+        )
 
-        self.start_trader_thread(self._users, trade_cmd_expire_seconds)
+        self.start_trader_thread(
+            self._users,
+            trade_cmd_expire_seconds,
+            parallel_users=parallel_users,
+            priority_queue=priority_queue,
+            net_opposite_cmds=net_opposite_cmds,
+        )
 
+        tracked_strategies = []
         for strategy_url, strategy_total_assets, strategy_initial_assets in zip(
             strategies, total_assets, initial_assets
         ):
@@ -112,13 +148,18 @@ class XueQiuFollower(BaseFollower):
             except:
                 logger.error("抽取交易id和策略名失败, 无效模拟交易url: %s", strategy_url)
                 raise
-            strategy_worker = Thread(
-                target=self.track_strategy_worker,
-                args=[strategy_id, strategy_name],
-                kwargs={"interval": track_interval, "assets": assets},
+            tracked_strategies.append(
+                (strategy_id, strategy_name, {"assets": assets})
             )
-            strategy_worker.start()
-            logger.info("开始跟踪策略: %s", strategy_name)
+        self.start_strategy_trackers(
+            tracked_strategies,
+            track_interval,
+            async_tracking=async_tracking,
+            max_concurrency=max_concurrency,
+            scheduler=PollScheduler(track_interval, holidays=holidays)
+            if adaptive_polling
+            else None,
+        )
 
     def calculate_assets(self, strategy_url, total_assets=None, initial_assets=None):
         # 都设置时优先选择 total_assets
@@ -146,9 +187,14 @@ class XueQiuFollower(BaseFollower):
         if history["count"] <= 0:
             return []
         rebalancing_index = 0
-        raw_transactions = history["list"][rebalancing_index]["rebalancing_histories"]
+        return self._extract_rebalancing_transactions(
+            history["list"][rebalancing_index]
+        )
+
+    @staticmethod
+    def _extract_rebalancing_transactions(rebalancing):
         transactions = []
-        for transaction in raw_transactions:
+        for transaction in rebalancing["rebalancing_histories"]:
             if transaction["price"] is None:
                 logger.info("该笔交易无法获取价格，疑似未成交，跳过。交易详情: %s", transaction)
                 continue
@@ -156,10 +202,189 @@ class XueQiuFollower(BaseFollower):
 
         return transactions
 
-    def create_query_transaction_params(self, strategy):
-        params = {"cube_symbol": strategy, "page": 1, "count": 1}
+    def create_query_transaction_params(self, strategy, page=1, count=1):
+        params = {"cube_symbol": strategy, "page": page, "count": count}
         return params
 
+    def query_strategy_transaction(self, strategy, **kwargs):
+        """
+        增量查询组合的调仓记录
+        先带条件请求头查询最新的一条调仓，返回 304 或调仓未变化时直接返回 [],
+        出现新的调仓时按页向前补齐上次处理之后的全部调仓
+        """
+        rep = self.s.get(
+            self.TRANSACTION_API,
+            params=self.create_query_transaction_params(strategy),
+            headers=self._conditional_headers(strategy),
+        )
+        if rep.status_code == 304:
+            return []
+        validators = rep.headers
+
+        rebalancings, catch_up = self._check_latest_rebalancing(strategy, rep.json())
+        if catch_up:
+            rebalancings = []
+            for page in range(1, self.CATCH_UP_MAX_PAGES + 1):
+                rep = self.s.get(
+                    self.TRANSACTION_API,
+                    params=self.create_query_transaction_params(
+                        strategy, page, self.CATCH_UP_PAGE_SIZE
+                    ),
+                )
+                if self._collect_new_rebalancings(strategy, rep.json(), rebalancings):
+                    break
+            else:
+                self._warn_catch_up_truncated(strategy)
+
+        transactions = self.process_rebalancings(strategy, rebalancings, **kwargs)
+        # 处理成功后才记录缓存校验值，处理失败时下次查询不会返回 304 而丢失调仓
+        self._remember_validators(strategy, validators)
+        return transactions
+
+    async def async_query_strategy_transaction(self, session, strategy, **kwargs):
+        async with session.get(
+            self.TRANSACTION_API,
+            params=self.create_query_transaction_params(strategy),
+            headers=self._conditional_headers(strategy),
+        ) as rep:
+            if rep.status == 304:
+                return []
+            validators = rep.headers
+            history = await rep.json(content_type=None)
+
+        rebalancings, catch_up = self._check_latest_rebalancing(strategy, history)
+        if catch_up:
+            rebalancings = []
+            for page in range(1, self.CATCH_UP_MAX_PAGES + 1):
+                async with session.get(
+                    self.TRANSACTION_API,
+                    params=self.create_query_transaction_params(
+                        strategy, page, self.CATCH_UP_PAGE_SIZE
+                    ),
+                ) as rep:
+                    history = await rep.json(content_type=None)
+                if self._collect_new_rebalancings(strategy, history, rebalancings):
+                    break
+            else:
+                self._warn_catch_up_truncated(strategy)
+
+        if not rebalancings:
+            self._remember_validators(strategy, validators)
+            return []
+        loop = asyncio.get_event_loop()
+        transactions = await loop.run_in_executor(
+            None,
+            functools.partial(
+                self.process_rebalancings, strategy, rebalancings, **kwargs
+            ),
+        )
+        self._remember_validators(strategy, validators)
+        return transactions
+
+    def _conditional_headers(self, strategy):
+        validators = self._validators.get(strategy, {})
+        headers = {}
+        if validators.get("ETag"):
+            headers["If-None-Match"] = validators["ETag"]
+        if validators.get("Last-Modified"):
+            headers["If-Modified-Since"] = validators["Last-Modified"]
+        return headers
+
+    def _remember_validators(self, strategy, headers):
+        self._validators[strategy] = {
+            key: headers.get(key) for key in ("ETag", "Last-Modified")
+        }
+
+    @staticmethod
+    def _rebalancing_version(rebalancing):
+        # 未成交的调仓成交后 id 不变，状态和更新时间会变化，需要重新处理
+        return (
+            rebalancing["id"],
+            rebalancing.get("updated_at"),
+            rebalancing.get("status"),
+        )
+
+    def _check_latest_rebalancing(self, strategy, history):
+        """
+        比较最新的一条调仓与上次处理过的调仓
+        :param strategy: 组合名
+        :param history: 只包含最新一条调仓的调仓接口返回
+        :return: (需要处理的调仓列表, 是否需要按页补齐遗漏的调仓)
+        """
+        if history["count"] <= 0 or not history["list"]:
+            return [], False
+        latest = history["list"][0]
+        last = self._last_rebalancings.get(strategy)
+        # 首次查询时与原来一样只处理最新的一条调仓
+        if last is None:
+            return [latest], False
+        if latest["id"] == last["id"]:
+            if self._rebalancing_version(latest) == self._rebalancing_version(last):
+                return [], False
+            return [latest], False
+        return [], True
+
+    def _collect_new_rebalancings(self, strategy, history, rebalancings):
+        """
+        收集一页调仓记录中比上次处理过的调仓更新的记录
+        :param strategy: 组合名
+        :param history: 调仓接口返回的一页记录, 按时间由新到旧排列
+        :param rebalancings: 收集到的调仓列表, 按时间由新到旧排列
+        :return: 是否已经补齐
+        """
+        last = self._last_rebalancings[strategy]
+        page = history["list"]
+        for rebalancing in page:
+            if rebalancing["id"] == last["id"]:
+                if self._rebalancing_version(rebalancing) != self._rebalancing_version(
+                    last
+                ):
+                    rebalancings.append(rebalancing)
+                return True
+            if rebalancing["created_at"] < last["created_at"]:
+                return True
+            rebalancings.append(rebalancing)
+        if len(page) < self.CATCH_UP_PAGE_SIZE:
+            return True
+        return False
+
+    def _warn_catch_up_truncated(self, strategy):
+        logger.warning(
+            "组合 %s 两次查询之间的调仓超过 %s 条, 只处理最新的部分",
+            strategy,
+            self.CATCH_UP_PAGE_SIZE * self.CATCH_UP_MAX_PAGES,
+        )
+
+    def process_rebalancings(self, strategy, rebalancings, **kwargs):
+        """
+        从新到旧排列的调仓中生成调仓记录，并记录最新处理过的调仓
+        各次调仓按时间先后排列，每次调仓内部先卖后买；不同调仓之间不调整顺序，
+        否则后一次调仓的卖出可能排到前一次调仓对同一只股票的买入之前
+        :param strategy: 组合名
+        :param rebalancings: 调仓列表, 按时间由新到旧排列
+        :return: [] Transaction 调仓记录的列表
+        """
+        if not rebalancings:
+            return []
+        transactions = []
+        sizes = []
+        for rebalancing in reversed(rebalancings):
+            extracted = self._extract_rebalancing_transactions(rebalancing)
+            transactions.extend(extracted)
+            sizes.append(len(extracted))
+        # 一起修整以共用同一份持仓快照
+        transactions = self.project_transactions(transactions, **kwargs)
+        self._last_rebalancings[strategy] = rebalancings[0]
+
+        ordered = []
+        start = 0
+        for size in sizes:
+            ordered.extend(
+                self.order_transactions_sell_first(transactions[start : start + size])
+            )
+            start += size
+        return ordered
+
     # noinspection PyMethodOverriding
     def none_to_zero(self, data):
         if data is None:
@@ -168,28 +393,50 @@ class XueQiuFollower(BaseFollower):
 
     # noinspection PyMethodOverriding
     def project_transactions(self, transactions, assets):
-        for transaction in transactions:
-            weight_diff = self.none_to_zero(transaction["weight"]) - self.none_to_zero(
-                transaction["prev_weight"]
-            )
-
-            initial_amount = abs(weight_diff) / 100 * assets / transaction["price"]
-
-            transaction["datetime"] = datetime.fromtimestamp(
-                transaction["created_at"] // 1000
-            )
-
-            transaction["stock_code"] = transaction["stock_symbol"].lower()
+        # 同一批调仓共用一份持仓快照，卖出调整后扣减快照中的可用余额
+        positions = None
+        if self._adjust_sell and any(
+            self._weight_diff(transaction) <= 0 for transaction in transactions
+        ):
+            positions = self._position_snapshot()
+        return [
+            self._project_transaction(transaction, assets, positions)
+            for transaction in transactions
+        ]
+
+    def _weight_diff(self, transaction):
+        return self.none_to_zero(transaction["weight"]) - self.none_to_zero(
+            transaction["prev_weight"]
+        )
 
-            transaction["action"] = "buy" if weight_diff > 0 else "sell"
+    def _project_transaction(self, transaction, assets, positions):
+        weight_diff = self._weight_diff(transaction)
+        action = "buy" if weight_diff > 0 else "sell"
+        stock_code = transaction["stock_symbol"].lower()
+
+        initial_amount = abs(weight_diff) / 100 * assets / transaction["price"]
+        amount = int(round(initial_amount, -2))
+        if action == "sell" and self._adjust_sell:
+            amount = self._adjust_sell_amount(stock_code, amount, positions)
+
+        return Transaction(
+            action=action,
+            stock_code=stock_code,
+            amount=amount,
+            price=transaction["price"],
+            datetime=datetime.fromtimestamp(transaction["created_at"] // 1000),
+        )
 
-            transaction["amount"] = int(round(initial_amount, -2))
-            if transaction["action"] == "sell" and self._adjust_sell:
-                transaction["amount"] = self._adjust_sell_amount(
-                    transaction["stock_code"], transaction["amount"]
-                )
+    def _position_snapshot(self):
+        """
+        读取第一个 user 的持仓快照
+        :return: {证券代码: 可用余额}
+        """
+        return {
+            stock["证券代码"]: stock["可用余额"] for stock in self._users[0].position
+        }
 
-    def _adjust_sell_amount(self, stock_code, amount):
+    def _adjust_sell_amount(self, stock_code, amount, positions=None):
         """
         根据实际持仓值计算雪球卖出股数
           因为雪球的交易指令是基于持仓百分比，在取近似值的情况下可能出现不精确的问题。
@@ -200,23 +447,26 @@ class XueQiuFollower(BaseFollower):
         :type stock_code: str
         :param amount: 卖出股份数
         :type amount: int
+        :param positions: 持仓快照 {证券代码: 可用余额}, 会扣减本次卖出的股数,
+            为 None 时读取第一个 user 的持仓
+        :type positions: dict
         :return: 考虑实际持仓之后的卖出股份数
         :rtype: int
         """
         stock_code = stock_code[-6:]
-        user = self._users[0]
-        position = user.position
-        try:
-            stock = next(s for s in position if s["证券代码"] == stock_code)
-        except StopIteration:
+        if positions is None:
+            positions = self._position_snapshot()
+        available_amount = positions.get(stock_code)
+        if available_amount is None:
             logger.info("根据持仓调整 %s 卖出额，发现未持有股票 %s, 不做任何调整", stock_code, stock_code)
             return amount
 
-        available_amount = stock["可用余额"]
         if available_amount >= amount:
+            positions[stock_code] = available_amount - amount
             return amount
 
         adjust_amount = available_amount // 100 * 100
+        positions[stock_code] = available_amount - adjust_amount
         logger.info(
             "股票 %s 实际可用余额 %s, 指令卖出股数为 %s, 调整为 %s",
             stock_code,
@@ -6,6 +6,7 @@ import pywinauto
 
 from easytrader import clienttrader, grid_strategies
 from easytrader.utils.captcha import recognize_verify_code
+from easytrader.utils.captcha_cache import default_captcha_cache
 
 
 class YHClientTrader(clienttrader.BaseLoginClientTrader):
@@ -51,10 +52,10 @@ class YHClientTrader(clienttrader.BaseLoginClientTrader):
 
             self._app.top_window().Edit1.type_keys(user)
             self._app.top_window().Edit2.type_keys(password)
+            captcha_cache = default_captcha_cache()
             while True:
-                self._app.top_window().Edit3.type_keys(
-                    self._handle_verify_code(is_xiadan)
-                )
+                captcha_key, verify_code = self._handle_verify_code(is_xiadan)
+                self._app.top_window().Edit3.type_keys(verify_code)
                 if is_xiadan:
                     self._app.top_window().child_window(control_id=1006, class_name="Button").click()
                 else:
@@ -63,9 +64,12 @@ class YHClientTrader(clienttrader.BaseLoginClientTrader):
                 # detect login is success or not
                 try:
                     self._app.top_window().wait_not("exists visible", 10)
+                    captcha_cache.put(captcha_key, verify_code)
                     break
                 # pylint: disable=broad-except
                 except Exception:
+                    # 登录失败时缓存的答案可能是错误的
+                    captcha_cache.discard(captcha_key)
                     if is_xiadan:
                         self._app.top_window()["确定"].click()
 
@@ -89,28 +93,48 @@ class YHClientTrader(clienttrader.BaseLoginClientTrader):
         ).click()
 
     def _handle_verify_code(self, is_xiadan):
+        """
+        识别登录验证码，之前登录成功过的验证码图片直接使用缓存的答案
+        :return: (验证码图片的缓存键, 验证码)
+        """
         control = self._app.top_window().child_window(
             control_id=1499 if is_xiadan else 22202
         )
         control.click()
 
-        file_path = tempfile.mktemp()
         if is_xiadan:
             rect = control.element_info.rectangle
             rect.right = round(
                 rect.right + (rect.right - rect.left) * 0.3
             )  # 扩展验证码控件截图范围为4个字符
-            control.capture_as_image(rect).save(file_path, "jpeg")
+            image = control.capture_as_image(rect)
         else:
-            control.capture_as_image().save(file_path, "jpeg")
+            image = control.capture_as_image()
+
+        captcha_cache = default_captcha_cache()
+        captcha_key = captcha_cache.image_key(image)
+        verify_code = captcha_cache.get(captcha_key)
+        if verify_code is not None:
+            return captcha_key, verify_code
+
+        file_path = tempfile.mktemp()
+        image.save(file_path, "jpeg")
         verify_code = recognize_verify_code(file_path, "yh_client")
-        return "".join(re.findall(r"\d+", verify_code))
+        return captcha_key, "".join(re.findall(r"\d+", verify_code))
 
-    @property
-    def balance(self):
+    def _get_balance(self):
         self._switch_left_menus(self._config.BALANCE_MENU_PATH)
         return self._get_grid_data(self._config.BALANCE_GRID_CONTROL_ID)
 
+    def _snapshot_readers(self):
+        readers = super()._snapshot_readers()
+        readers["balance"] = (
+            self._config.BALANCE_MENU_PATH,
+            lambda: self._get_grid_data(self._config.BALANCE_GRID_CONTROL_ID),
+        )
+        return readers
+
+    @clienttrader.invalidate_state_cache
     def auto_ipo(self):
         self._switch_left_menus(self._config.AUTO_IPO_MENU_PATH)
         stock_list = self._get_grid_data(self._config.COMMON_GRID_CONTROL_ID)
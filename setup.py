@@ -19,7 +19,6 @@ setup(
         "flask>=1.1.0",
         "pywinauto>=0.6.8; sys_platform == 'win32'",
         "pillow>=8.0.0",
-        "pandas>=1.1.0", 
         "pytesseract>=0.3.7",
         "opencv-python>=4.5.0",
         "beautifulsoup4>=4.9.0",
@@ -43,8 +42,9 @@ setup(
         "werkzeug>=1.0.0"
     ],
     extras_require={
-        "all": ["xtquant"],
-        "miniqmt": ["xtquant"]
+        "all": ["xtquant", "aiohttp>=3.6.0"],
+        "miniqmt": ["xtquant"],
+        "async": ["aiohttp>=3.6.0"]
     },
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -0,0 +1,11 @@
+# coding:utf-8
+
+
+class FakeClock:
+    """手动拨动的时钟，代替 time.monotonic 等计时函数"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
@@ -0,0 +1,57 @@
+# coding:utf-8
+import datetime
+import threading
+import unittest
+
+from easytrader.async_tracker import AsyncStrategyTracker
+from easytrader.follower import Transaction
+from easytrader.xq_follower import XueQiuFollower
+
+try:
+    import aiohttp  # noqa: F401
+
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+
+@unittest.skipUnless(HAS_AIOHTTP, "aiohttp is not installed")
+class TestAsyncStrategyTracker(unittest.TestCase):
+    def test_dispatch_to_trade_queue(self):
+        follower = XueQiuFollower()
+        follower.prepare_cmd_cache(cmd_cache=False, trade_cmd_expire_seconds=120)
+        follower.add_cmd_to_expired_cmds = lambda cmd: None
+        tracker = AsyncStrategyTracker(follower, max_concurrency=2)
+        queried = []
+        all_queried = threading.Event()
+
+        async def fake_query(session, strategy, **kwargs):
+            queried.append((strategy, kwargs["assets"]))
+            if len(queried) >= 3:
+                tracker.stop()
+                all_queried.set()
+            return [
+                Transaction(
+                    action="buy",
+                    stock_code="sz162411",
+                    amount=100,
+                    price=1.0,
+                    datetime=datetime.datetime.now(),
+                )
+            ]
+
+        follower.async_query_strategy_transaction = fake_query
+        strategies = [
+            ("ZH{}".format(i), "strategy {}".format(i), {"assets": 10000})
+            for i in range(3)
+        ]
+        worker = tracker.start(strategies, interval=1)
+        self.assertTrue(all_queried.wait(5))
+        worker.join(5)
+
+        self.assertEqual(
+            sorted(strategy for strategy, _ in queried), ["ZH0", "ZH1", "ZH2"]
+        )
+        self.assertEqual(follower.trade_queue.qsize(), 3)
+        trade_cmd = follower.trade_queue.get()
+        self.assertEqual(trade_cmd["stock_code"], "sz162411")
@@ -0,0 +1,85 @@
+# coding:utf-8
+import threading
+import time
+import unittest
+
+from PIL import Image
+
+from easytrader.utils.captcha import recognize_in_parallel
+
+
+def pipeline(result, delay=0.0, calls=None):
+    def recognize(img):
+        if calls is not None:
+            calls.append(img)
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return recognize
+
+
+class TestRecognizeInParallel(unittest.TestCase):
+    def setUp(self):
+        self.image = Image.new("L", (40, 16), 255)
+
+    def test_returns_when_two_methods_agree(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow(img):
+            release.wait(5)
+            return "zzzz"
+
+        start = time.monotonic()
+        result = recognize_in_parallel(
+            [
+                ("方法1", pipeline("ab12", 0.05)),
+                ("方法2", slow),
+                ("方法3", pipeline("AB12", 0.05)),
+            ],
+            self.image,
+        )
+
+        self.assertEqual(result, "ab12")
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_methods_run_concurrently(self):
+        start = time.monotonic()
+        recognize_in_parallel(
+            [("方法{}".format(i), pipeline("x{}yz".format(i), 0.2)) for i in range(5)],
+            self.image,
+        )
+        self.assertLess(time.monotonic() - start, 0.6)
+
+    def test_vote_without_agreement(self):
+        result = recognize_in_parallel(
+            [
+                ("方法1", pipeline("ab1")),
+                ("方法2", pipeline(ValueError("tesseract 失败"))),
+                ("方法3", pipeline("cd34", 0.05)),
+                ("方法4", pipeline("ef56")),
+            ],
+            self.image,
+        )
+        self.assertEqual(result, "cd34")
+
+    def test_each_method_gets_a_copy(self):
+        calls = []
+        recognize_in_parallel(
+            [("方法1", pipeline("", calls=calls)), ("方法2", pipeline("", calls=calls))],
+            self.image,
+        )
+        self.assertEqual(len(calls), 2)
+        self.assertIsNot(calls[0], calls[1])
+        self.assertIsNot(calls[0], self.image)
+
+    def test_all_failed(self):
+        self.assertEqual(
+            recognize_in_parallel([("方法1", pipeline(""))], self.image), ""
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
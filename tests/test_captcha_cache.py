@@ -0,0 +1,69 @@
+# coding:utf-8
+import io
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from easytrader.utils.captcha_cache import CaptchaCache
+
+
+def make_image(color):
+    return Image.new("RGB", (40, 16), color)
+
+
+class TestCaptchaCache(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "captcha_cache.json")
+
+    def test_image_key_ignores_encoding(self):
+        image = make_image((10, 20, 30))
+        buffer = io.BytesIO()
+        image.save(buffer, "png")
+        buffer.seek(0)
+        decoded = Image.open(buffer)
+
+        self.assertEqual(CaptchaCache.image_key(image), CaptchaCache.image_key(decoded))
+        self.assertNotEqual(
+            CaptchaCache.image_key(image), CaptchaCache.image_key(make_image((0, 0, 0)))
+        )
+
+    def test_put_get_discard(self):
+        cache = CaptchaCache(None)
+        self.assertIsNone(cache.get("key"))
+
+        cache.put("key", "ab12")
+        self.assertEqual(cache.get("key"), "ab12")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.discard("key")
+        self.assertIsNone(cache.get("key"))
+
+    def test_persisted_to_file(self):
+        cache = CaptchaCache(self.path)
+        cache.put("key", "ab12")
+
+        self.assertEqual(CaptchaCache(self.path).get("key"), "ab12")
+
+    def test_least_recently_used_is_evicted(self):
+        cache = CaptchaCache(self.path, max_entries=2)
+        cache.put("a", "1111")
+        cache.put("b", "2222")
+        cache.get("a")
+        cache.put("c", "3333")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(CaptchaCache(self.path, max_entries=2)), 2)
+        self.assertEqual(CaptchaCache(self.path).get("a"), "1111")
+
+    def test_corrupted_file_is_ignored(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("{")
+        self.assertEqual(len(CaptchaCache(self.path)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,572 @@
+# coding:utf-8
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+)
+
+# pylint: disable=wrong-import-position
+import winsim  # noqa: E402
+
+# 需要在导入客户端模块之前替换 pywinauto
+winsim.install()
+
+import easytrader  # noqa: E402
+from easytrader import exceptions, grid_strategies  # noqa: E402
+from easytrader.config import client  # noqa: E402
+from easytrader.utils.gui_executor import ThreadSafeTrader  # noqa: E402
+
+
+def fast_delays(**kwargs):
+    delays = winsim.Delays.zero()
+    delays.page_switch = 0.02
+    delays.refresh = 0.01
+    delays.quote_load = 0.03
+    delays.dialog = 0.005
+    delays.copy = 0.005
+    for name, value in kwargs.items():
+        setattr(delays, name, value)
+    return delays
+
+
+class SimTraderTestCase(unittest.TestCase):
+    """连接 winsim 模拟客户端的 trader"""
+
+    broker = "ths"
+    broker_name = "ths"
+    delays = {}
+
+    def setUp(self):
+        self.sim = winsim.SimClient(
+            client.create(self.broker),
+            delays=fast_delays(**self.delays),
+            positions={"600000": 1000, "000001": 500},
+        )
+        winsim.install(self.sim)
+        self.addCleanup(winsim.install, None)
+        need_captcha_reg = grid_strategies.Copy._need_captcha_reg
+        self.addCleanup(setattr, grid_strategies.Copy, "_need_captcha_reg", need_captcha_reg)
+        # 模拟客户端不弹出验证码
+        grid_strategies.Copy._need_captcha_reg = False
+
+        self.user = easytrader.use(self.broker_name)
+        # 模拟客户端没有登录后的提示窗口，不需要等待
+        with mock.patch.object(self.user, "_close_prompt_windows"):
+            self.user.connect(self.sim.exe_path)
+
+
+class TestWaitPageLoaded(SimTraderTestCase):
+    # 选择菜单和按下 F5 后客户端过一段时间才开始加载
+    delays = {"load_start": 0.03}
+
+    def test_switch_waits_for_new_page(self):
+        self.assertEqual(len(self.user.position), 2)
+        self.sim.entrusts.append({"合同编号": "1", "证券代码": "600000", "备注": "已报"})
+
+        self.assertEqual(self.user.today_entrusts[0]["合同编号"], "1")
+        self.assertFalse(self.sim.loading)
+
+    def test_refresh_waits_for_reload(self):
+        self.user.position
+        self.user._switch_left_menus(["查询[F4]", "资金股票"])
+        self.assertFalse(self.sim.loading)
+
+
+class TestWaitQuote(SimTraderTestCase):
+    def test_typed_price_is_not_overwritten_by_quote(self):
+        self.sim.quotes = {"600000": 10.0, "000001": 12.0}
+        self.user.buy("600000", 9.5, 100)
+        self.user.buy("000001", 11.5, 100)
+
+        self.assertEqual(
+            [e["委托价格"] for e in self.sim.entrusts], [9.5, 11.5]
+        )
+        self.assertEqual(self.sim.counters["price_overwritten"], 0)
+
+    def test_same_quote_is_recognized(self):
+        self.user.buy("600000", 10.0, 100)
+        self.user.buy("000001", 10.0, 100)
+        self.assertEqual(
+            [e["委托价格"] for e in self.sim.entrusts], [10.0, 10.0]
+        )
+        self.assertEqual(self.sim.counters["price_overwritten"], 0)
+
+    def test_uncleared_price_waits_settle_time(self):
+        set_edit_text = winsim.SimEdit.set_edit_text
+
+        def ignore_clear(editor, text, *args, **kwargs):
+            # 模拟无法清空输入框的客户端
+            if text == "":
+                return editor
+            return set_edit_text(editor, text, *args, **kwargs)
+
+        with mock.patch.object(winsim.SimEdit, "set_edit_text", ignore_clear):
+            self.user.buy("600000", 10.0, 100)
+            self.user.buy("000001", 10.0, 100)
+        self.assertEqual(
+            [e["委托价格"] for e in self.sim.entrusts], [10.0, 10.0]
+        )
+        self.assertEqual(self.sim.counters["price_overwritten"], 0)
+
+
+
+class TestMenuState(SimTraderTestCase):
+    path = ["查询[F4]", "资金股票"]
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(mock.patch.stopall)
+        # 统计选择菜单和 F5 刷新的次数
+        self.select = mock.patch.object(
+            winsim.SimTreeItem,
+            "select",
+            autospec=True,
+            side_effect=winsim.SimTreeItem.select,
+        ).start()
+        self.refresh = mock.patch.object(
+            self.sim, "refresh", side_effect=self.sim.refresh
+        ).start()
+
+    def test_same_menu_is_not_selected_again(self):
+        self.user._switch_left_menus(self.path)
+        self.user._switch_left_menus(self.path)
+
+        self.assertEqual(self.select.call_count, 1)
+        # 不重新选择菜单时仍然按 F5 刷新
+        self.assertEqual(self.refresh.call_count, 2)
+
+    def test_other_menu_is_selected(self):
+        self.user._switch_left_menus(self.path)
+        self.user._switch_left_menus(["查询[F4]", "当日委托"])
+        self.user._switch_left_menus(self.path)
+        self.assertEqual(self.select.call_count, 3)
+
+    def test_page_changed_by_popup_is_selected_again(self):
+        self.user._switch_left_menus(self.path)
+        # 弹窗期间客户端切换到了其他页面
+        self.sim.show_dialog("提示", "请确认", [("确定", None)], title_text="提示")
+        self.sim.switch_page(["撤单[F3]"])
+
+        self.user._switch_left_menus(self.path)
+        self.assertEqual(self.select.call_count, 2)
+        self.assertEqual(self.sim.selected_path, self.path)
+        self.assertIs(self.sim.top_window(), self.sim.main)
+
+    def test_popup_is_closed_before_refresh(self):
+        self.user._switch_left_menus(self.path)
+        self.sim.show_dialog("提示", "请确认", [("确定", None)], title_text="提示")
+
+        self.user._switch_left_menus(self.path)
+        self.assertEqual(self.select.call_count, 1)
+        self.assertEqual(self.refresh.call_count, 2)
+        self.assertIs(self.sim.top_window(), self.sim.main)
+
+    def test_reconnect_resets_menu_state(self):
+        self.user._switch_left_menus(self.path)
+        with mock.patch.object(self.user, "_close_prompt_windows"):
+            self.user.connect(self.sim.exe_path)
+
+        self.user._switch_left_menus(self.path)
+        self.assertEqual(self.select.call_count, 2)
+
+
+class TestSnapshot(SimTraderTestCase):
+    fields = ("balance", "position", "today_entrusts", "today_trades")
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(mock.patch.stopall)
+        self.select = mock.patch.object(
+            winsim.SimTreeItem,
+            "select",
+            autospec=True,
+            side_effect=winsim.SimTreeItem.select,
+        ).start()
+        self.user.buy("600000", 10.0, 100)
+        self.select.reset_mock()
+
+    def test_each_menu_is_visited_once(self):
+        self.user.snapshot()
+        # 资金和持仓在同一个页面
+        selected = [tuple(c[0][0].path) for c in self.select.call_args_list]
+        self.assertEqual(len(selected), 3)
+        self.assertEqual(len(set(selected)), 3)
+
+    def test_current_menu_is_read_first(self):
+        self.user.position
+        self.select.reset_mock()
+
+        self.user.snapshot()
+        self.assertEqual(self.select.call_count, 2)
+
+    def test_matches_property_reads(self):
+        snapshot = self.user.snapshot()
+        for field in self.fields:
+            self.assertEqual(snapshot[field], getattr(self.user, field), field)
+        self.assertEqual(snapshot["reused"], [])
+
+    def test_reuse_within_max_age(self):
+        first = self.user.snapshot(reuse_max_age=60)
+        self.select.reset_mock()
+
+        second = self.user.snapshot(reuse_max_age=60)
+        self.select.assert_not_called()
+        self.assertCountEqual(second["reused"], self.fields)
+        for field in self.fields:
+            self.assertEqual(second[field], first[field])
+
+        # 复用的数据是副本
+        second["position"].clear()
+        self.assertTrue(self.user.snapshot(reuse_max_age=60)["position"])
+
+    def test_expired_or_traded_panels_are_read_again(self):
+        self.user.snapshot(reuse_max_age=60)
+        self.assertEqual(self.user.snapshot(reuse_max_age=0)["reused"], [])
+
+        self.user.buy("000001", 10.0, 100)
+        snapshot = self.user.snapshot(reuse_max_age=60)
+        self.assertEqual(snapshot["reused"], [])
+        self.assertEqual(len(snapshot["today_entrusts"]), 2)
+
+
+class TestYHSnapshot(SimTraderTestCase):
+    broker = "yh"
+    broker_name = "yh_client"
+
+    def test_balance_is_read_from_grid(self):
+        snapshot = self.user.snapshot()
+        self.assertEqual(snapshot["balance"], self.user.balance)
+        self.assertEqual(snapshot["position"], self.user.position)
+        self.assertIsInstance(snapshot["balance"], list)
+
+
+class TestXlsExport(SimTraderTestCase):
+    broker = "yh"
+    broker_name = "yh_client"
+    # 两次写入间隔 0.15 秒
+    delays = {"save": 0.3}
+
+    def setUp(self):
+        super().setUp()
+        self.strategy = self.user.grid_strategy_instance
+        self.path = self.strategy.export_path
+        self.addCleanup(self.strategy._remove_export_file, self.path)
+
+    def write(self, data, mode="wb"):
+        with open(self.path, mode) as f:
+            f.write(data)
+
+    def test_export_path_is_unique_per_strategy(self):
+        other = grid_strategies.Xls()
+        self.assertEqual(self.strategy.export_path, self.path)
+        self.assertNotEqual(other.export_path, self.path)
+
+    def test_slow_export_is_read_completely(self):
+        position = self.user.position
+        self.assertEqual(
+            sorted(p["证券代码"] for p in position), ["000001", "600000"]
+        )
+
+    def test_truncated_character_is_read_again(self):
+        self.strategy.export_stable_time = 0.05
+        data = "证券代码\t证券名称\n".encode("gbk")
+        self.write(data[:-2])
+        timer = threading.Timer(0.2, self.write, (data[-2:], "ab"))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        self.assertEqual(
+            self.strategy._read_export_file(self.path), "证券代码\t证券名称\n"
+        )
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_truncated_file_raises(self):
+        self.strategy.export_stable_time = 0.05
+        self.strategy.export_timeout = 0.3
+        self.write("证券代码".encode("gbk")[:-1])
+
+        with self.assertRaises(UnicodeDecodeError):
+            self.strategy._read_export_file(self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+
+class TestBatchTrade(SimTraderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sim.quotes = {"600000": 10.0, "000001": 12.0, "600010": 3.0}
+
+    def placed(self):
+        return [
+            (e["操作"], e["证券代码"], e["委托价格"], e["委托数量"])
+            for e in self.sim.entrusts
+        ]
+
+    def test_orders_are_placed_in_sequence(self):
+        results = self.user.batch_trade(
+            [
+                {"action": "buy", "security": "sh600000", "price": 9.5, "amount": 100},
+                {"action": "buy", "security": "sh600010", "price": 2.9, "amount": 300},
+                {"action": "buy", "security": "sz000001", "price": 11.8, "amount": 200},
+                {"action": "sell", "security": "sh600000", "price": 10.2, "amount": 100},
+            ]
+        )
+
+        self.assertEqual(
+            [r["entrust_no"] for r in results], ["100001", "100002", "100003", "100004"]
+        )
+        self.assertEqual(
+            self.placed(),
+            [
+                ("买入", "600000", 9.5, 100),
+                ("买入", "600010", 2.9, 300),
+                ("买入", "000001", 11.8, 200),
+                ("卖出", "600000", 10.2, 100),
+            ],
+        )
+        self.assertEqual(
+            [e["交易市场"] for e in self.sim.entrusts],
+            ["上海Ａ股", "上海Ａ股", "深圳Ａ股", "上海Ａ股"],
+        )
+        self.assertEqual(self.sim.counters["price_overwritten"], 0)
+
+    def test_failed_order_is_skipped(self):
+        results = self.user.batch_trade(
+            [
+                {"action": "buy", "security": "sh600000", "price": 9.5, "amount": 100},
+                {"action": "sell", "security": "sh600010", "price": 3.1, "amount": 100},
+                {"action": "short", "security": "sh600000", "price": 9.5, "amount": 100},
+                {"action": "sell", "security": "sz000001", "price": 12.1, "amount": 100},
+            ]
+        )
+
+        self.assertEqual(results[0], {"entrust_no": "100001"})
+        self.assertIn("可用股份不足", results[1]["error"])
+        self.assertIn("short", results[2]["error"])
+        self.assertEqual(results[3], {"entrust_no": "100002"})
+        self.assertEqual(
+            self.placed(), [("买入", "600000", 9.5, 100), ("卖出", "000001", 12.1, 100)]
+        )
+        self.assertIs(self.sim.top_window(), self.sim.main)
+
+    def test_stop_on_error(self):
+        results = self.user.batch_trade(
+            [
+                {"action": "buy", "security": "sh600000", "price": 9.5, "amount": 100},
+                {"action": "sell", "security": "sh600010", "price": 3.1, "amount": 100},
+                {"action": "buy", "security": "sz000001", "price": 11.8, "amount": 100},
+            ],
+            stop_on_error=True,
+        )
+
+        self.assertEqual(results[0], {"entrust_no": "100001"})
+        self.assertIn("error", results[1])
+        self.assertIsNone(results[2])
+        self.assertEqual(self.placed(), [("买入", "600000", 9.5, 100)])
+
+    def late_quote_fill(self, times):
+        """输入的委托价格随后被晚到的行情覆盖 times 次"""
+        type_keys = self.user.type_edit_control_keys
+        remaining = [times]
+
+        def type_and_fill(editor, text):
+            type_keys(editor, text)
+            if editor.ctrl_id == self.sim.config.TRADE_PRICE_CONTROL_ID and remaining[0]:
+                remaining[0] -= 1
+                editor.title = "12.00"
+
+        return mock.patch.object(self.user, "type_edit_control_keys", type_and_fill)
+
+    def test_price_is_typed_again_when_overwritten(self):
+        with self.late_quote_fill(1):
+            results = self.user.batch_trade(
+                [{"action": "buy", "security": "sz000001", "price": 11.8, "amount": 100}]
+            )
+        self.assertEqual(results, [{"entrust_no": "100001"}])
+        self.assertEqual(self.placed(), [("买入", "000001", 11.8, 100)])
+
+    def test_order_is_not_submitted_with_wrong_price(self):
+        with self.late_quote_fill(2):
+            results = self.user.batch_trade(
+                [
+                    {"action": "buy", "security": "sz000001", "price": 11.8, "amount": 100},
+                    {"action": "buy", "security": "sh600010", "price": 2.9, "amount": 100},
+                ]
+            )
+        self.assertIn("不一致", results[0]["error"])
+        self.assertEqual(results[1], {"entrust_no": "100001"})
+        self.assertEqual(self.placed(), [("买入", "600010", 2.9, 100)])
+
+
+class TestCancelEntrustsBulk(SimTraderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.entrust_nos = [
+            self.user.buy(code, 10.0, 100)["entrust_no"]
+            for code in ("600000", "000001", "600010", "600020")
+        ]
+        self.addCleanup(mock.patch.stopall)
+        self.double_click = mock.patch.object(
+            self.user,
+            "_cancel_entrust_by_double_click",
+            side_effect=self.user._cancel_entrust_by_double_click,
+        ).start()
+        self.refresh = mock.patch.object(
+            self.user, "refresh", side_effect=self.user.refresh
+        ).start()
+        self.read_grid = mock.patch.object(
+            self.user, "_get_grid_data", side_effect=self.user._get_grid_data
+        ).start()
+
+    def status(self):
+        return {e["合同编号"]: e["备注"] for e in self.sim.entrusts}
+
+    def test_rows_are_cancelled_from_bottom_to_top(self):
+        first, second, third, fourth = self.entrust_nos
+        results = self.user.cancel_entrusts_bulk([second, fourth, first])
+
+        self.assertEqual(list(results), [second, fourth, first])
+        self.assertEqual(
+            [c[0][0] for c in self.double_click.call_args_list], [3, 1, 0]
+        )
+        self.assertEqual(
+            self.status(),
+            {first: "已撤", second: "已撤", third: "已报", fourth: "已撤"},
+        )
+
+    def test_missing_entrust_nos(self):
+        first = self.entrust_nos[0]
+        results = self.user.cancel_entrusts_bulk(["999999", first])
+
+        self.assertIn("不能撤单", results["999999"]["message"])
+        self.assertEqual(self.double_click.call_count, 1)
+        self.assertEqual(self.status()[first], "已撤")
+
+    def test_duplicate_entrust_no_is_cancelled_once(self):
+        first, second, third, fourth = self.entrust_nos
+        results = self.user.cancel_entrusts_bulk([first, first, int(third)])
+
+        self.assertEqual(list(results), [first, int(third)])
+        self.assertEqual(self.double_click.call_count, 2)
+        self.assertEqual(
+            self.status(),
+            {first: "已撤", second: "已报", third: "已撤", fourth: "已报"},
+        )
+
+    def test_grid_is_read_and_refreshed_once(self):
+        self.user.cancel_entrusts_bulk(self.entrust_nos)
+
+        self.assertEqual(self.refresh.call_count, 1)
+        self.assertEqual(self.read_grid.call_count, 1)
+        self.assertEqual(set(self.status().values()), {"已撤"})
+
+
+class TestGridChanges(SimTraderTestCase):
+    def test_failed_read_does_not_update_grid(self):
+        self.user.buy("600000", 10.0, 100)
+        self.assertEqual(len(self.user.today_entrusts_changes().added), 1)
+        second = self.user.buy("000001", 10.0, 100)["entrust_no"]
+
+        strategy = self.user.grid_strategy_instance
+        # 剪贴板为空，解析失败
+        with mock.patch.object(strategy, "_get_clipboard_data", return_value=""):
+            with self.assertRaises(exceptions.GridReadError):
+                self.user.today_entrusts_changes()
+        # 模拟客户端不弹出验证码
+        grid_strategies.Copy._need_captcha_reg = False
+
+        changes = self.user.today_entrusts_changes()
+        self.assertEqual([e["合同编号"] for e in changes.added], [second])
+        self.assertEqual(changes.removed, [])
+
+
+    def test_failed_property_read_is_not_cached(self):
+        self.user.enable_state_cache(ttls={"today_entrusts": 60})
+        self.user.buy("600000", 10.0, 100)
+        self.assertEqual(len(self.user.today_entrusts_changes().added), 1)
+        self.user._state_cache.invalidate()
+
+        strategy = self.user.grid_strategy_instance
+        with mock.patch.object(strategy, "_get_clipboard_data", return_value=""):
+            self.assertEqual(self.user.today_entrusts, [])
+        grid_strategies.Copy._need_captcha_reg = False
+
+        self.assertTrue(self.user.today_entrusts_changes().empty)
+
+
+class TestLatency(SimTraderTestCase):
+    def test_lock_wait_is_not_recorded(self):
+        locked = threading.Event()
+
+        def hold_gui():
+            with self.user._gui_lock:
+                locked.set()
+                time.sleep(0.3)
+
+        holder = threading.Thread(target=hold_gui)
+        holder.start()
+        self.assertTrue(locked.wait(5))
+        start = time.monotonic()
+        self.user.buy("600010", 10.0, 100)
+        elapsed = time.monotonic() - start
+        holder.join()
+
+        self.assertGreaterEqual(elapsed, 0.25)
+        record = self.user.latency.records("buy")[-1]
+        self.assertLess(record["total"], elapsed - 0.2)
+
+
+class TestStateCacheRefresh(SimTraderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        self.addCleanup(mock.patch.stopall)
+        for name in ("_get_position", "buy"):
+            mock.patch.object(
+                self.user, name, self.record(name, getattr(self.user, name))
+            ).start()
+        self.proxy = ThreadSafeTrader(self.user)
+        self.addCleanup(self.proxy.executor.shutdown)
+
+    def record(self, name, fn):
+        def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.calls.append(
+                    (name, threading.current_thread(), start, time.monotonic())
+                )
+
+        return wrapper
+
+    def test_refresh_and_trade_run_in_executor_in_turn(self):
+        self.proxy.enable_state_cache(ttls={"position": 0.05}, stale_ttl=60)
+        self.proxy.position
+        time.sleep(0.06)
+
+        trade = threading.Thread(
+            target=self.proxy.buy, args=("600010", 10.0, 100)
+        )
+        # 返回旧值并提交后台刷新，同时另一个线程下单
+        self.assertEqual(len(self.proxy.position), 2)
+        trade.start()
+        trade.join(5)
+        self.proxy.executor.call(lambda: None)
+
+        self.assertEqual(
+            [name for name, _, _, _ in self.calls],
+            ["_get_position", "_get_position", "buy"],
+        )
+        executor_thread = self.proxy.executor._thread
+        self.assertTrue(all(t is executor_thread for _, t, _, _ in self.calls))
+        for previous, current in zip(self.calls, self.calls[1:]):
+            self.assertLessEqual(previous[3], current[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
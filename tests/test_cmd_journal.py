@@ -0,0 +1,188 @@
+# coding:utf-8
+import datetime
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from easytrader.utils.cmd_journal import CmdJournal
+from easytrader.xq_follower import XueQiuFollower
+
+
+class TestCmdJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cmd_cache.journal")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_and_replay(self):
+        journal = CmdJournal(self.path)
+        journal.append({"key": "a"})
+        journal.append({"key": "b"})
+        journal.close()
+
+        replayed = CmdJournal(self.path).replay()
+        self.assertEqual(replayed, [{"key": "a"}, {"key": "b"}])
+
+    def test_replay_drops_partial_record(self):
+        journal = CmdJournal(self.path)
+        journal.append({"key": "a"})
+        journal.close()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"key": "b')
+
+        journal = CmdJournal(self.path)
+        self.assertEqual(journal.replay(), [{"key": "a"}])
+        journal.append({"key": "c"})
+        journal.close()
+        self.assertEqual(
+            CmdJournal(self.path).replay(), [{"key": "a"}, {"key": "c"}]
+        )
+
+    def test_compact(self):
+        journal = CmdJournal(self.path)
+        for key in ["a", "a", "b"]:
+            journal.append({"key": key})
+        journal.compact([{"key": "a"}, {"key": "b"}])
+        self.assertEqual(journal.records, 2)
+        journal.append({"key": "c"})
+        journal.close()
+        self.assertEqual(len(CmdJournal(self.path).replay()), 3)
+
+    def test_pending_records_are_synced_by_timer(self):
+        journal = CmdJournal(self.path, sync_every=100, sync_interval=0.05)
+        self.addCleanup(journal.close)
+        with mock.patch("easytrader.utils.cmd_journal.os.fsync") as fsync:
+            journal.append({"key": "a"})
+            journal.append({"key": "b"})
+            fsync.assert_not_called()
+
+            deadline = time.monotonic() + 2
+            while journal._pending and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(journal._pending, 0)
+        fsync.assert_called_once()
+
+    def test_close_cancels_sync_timer(self):
+        journal = CmdJournal(self.path, sync_every=100, sync_interval=10)
+        journal.append({"key": "a"})
+        timer = journal._sync_timer
+        journal.close()
+        self.assertIsNone(journal._sync_timer)
+        self.assertTrue(timer.finished.is_set())
+
+
+class TestFollowerCmdCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.tmp_dir.name, "cmd_cache.journal")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _create_follower(self):
+        follower = XueQiuFollower()
+        follower.cmd_journal = CmdJournal(self.journal_path)
+        follower.CMD_CACHE_FILE = os.path.join(self.tmp_dir.name, "cmd_cache.pk")
+        return follower
+
+    def test_load_expired_cmd_cache(self):
+        cmd = dict(TEST_CMD, datetime=datetime.datetime.now())
+        follower = self._create_follower()
+        follower.add_cmd_to_expired_cmds(cmd)
+        follower.cmd_journal.close()
+
+        follower = self._create_follower()
+        self.assertFalse(follower.is_cmd_expired(cmd))
+        follower.load_expired_cmd_cache()
+        self.assertTrue(follower.is_cmd_expired(cmd))
+
+    def test_migrate_pickle_cache(self):
+        follower = self._create_follower()
+        with open(follower.CMD_CACHE_FILE, "wb") as f:
+            pickle.dump({"legacy_key"}, f)
+
+        follower.load_expired_cmd_cache()
+        digest = follower.expired_cmds.digest("legacy_key")
+        self.assertIn(digest, follower.expired_cmds)
+        self.assertFalse(os.path.exists(follower.CMD_CACHE_FILE))
+
+        follower = self._create_follower()
+        follower.load_expired_cmd_cache()
+        self.assertIn(digest, follower.expired_cmds)
+
+    def test_stale_cmds_are_expired_and_evicted(self):
+        follower = self._create_follower()
+        follower.prepare_cmd_cache(
+            cmd_cache=False, trade_cmd_expire_seconds=120
+        )
+        self.assertEqual(follower.expired_cmds.horizon, 600)
+
+        now = datetime.datetime.now()
+        old_cmd = dict(TEST_CMD, datetime=now - datetime.timedelta(seconds=700))
+        self.assertTrue(follower.is_cmd_expired(old_cmd))
+
+        cmd = dict(TEST_CMD, datetime=now - datetime.timedelta(seconds=500))
+        self.assertFalse(follower.is_cmd_expired(cmd))
+        follower.add_cmd_to_expired_cmds(cmd)
+        self.assertTrue(follower.is_cmd_expired(cmd))
+
+        evicted = follower.expired_cmds.evict(now=time.time() + 300)
+        self.assertEqual(evicted, 1)
+        self.assertEqual(len(follower.expired_cmds), 0)
+
+    def test_load_skips_stale_records(self):
+        follower = self._create_follower()
+        follower.cmd_journal.append({"key": "stale", "ts": time.time() - 1000})
+        follower.cmd_journal.append({"key": "fresh", "ts": time.time()})
+        follower.cmd_journal.close()
+
+        follower = self._create_follower()
+        follower.prepare_cmd_cache(cmd_cache=True, trade_cmd_expire_seconds=120)
+        self.assertNotIn("stale", follower.expired_cmds)
+        self.assertIn("fresh", follower.expired_cmds)
+        self.assertEqual(follower.cmd_journal.records, 1)
+
+    def test_record_appended_during_compact_is_kept(self):
+        follower = self._create_follower()
+        cmd = dict(TEST_CMD, datetime=datetime.datetime.now())
+        items = follower.expired_cmds.items
+        appended = threading.Event()
+        threads = []
+
+        def append_after_reading():
+            records = items()
+            # 读取有效指令之后交易线程执行了新的指令
+            thread = threading.Thread(
+                target=lambda: (follower.add_cmd_to_expired_cmds(cmd), appended.set())
+            )
+            thread.start()
+            threads.append(thread)
+            appended.wait(0.2)
+            return records
+
+        with mock.patch.object(
+            follower.expired_cmds, "items", side_effect=append_after_reading
+        ):
+            follower.compact_expired_cmd_cache()
+        threads[0].join()
+        follower.cmd_journal.close()
+
+        follower = self._create_follower()
+        follower.load_expired_cmd_cache()
+        self.assertTrue(follower.is_cmd_expired(cmd))
+
+
+TEST_CMD = {
+    "strategy_name": "test_strategy",
+    "stock_code": "162411",
+    "action": "buy",
+    "amount": 100,
+    "price": 1.0,
+    "datetime": None,
+}
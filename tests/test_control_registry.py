@@ -0,0 +1,74 @@
+# coding:utf-8
+import unittest
+
+from easytrader.utils.control_registry import ControlRegistry
+
+
+class FakeControl:
+    def __init__(self, control_id, class_name):
+        self.control_id = control_id
+        self.class_name = class_name
+        self.valid = True
+
+
+class TestControlRegistry(unittest.TestCase):
+    def setUp(self):
+        self.resolved = []
+
+        def resolve(control_id, class_name):
+            control = FakeControl(control_id, class_name)
+            self.resolved.append(control)
+            return control
+
+        self.registry = ControlRegistry(
+            resolve, lambda control, control_id: control.valid
+        )
+
+    def test_resolve_once_while_valid(self):
+        first = self.registry.get(1032, "Edit")
+        second = self.registry.get(1032, "Edit")
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.resolved), 1)
+        self.assertEqual((self.registry.hits, self.registry.misses), (1, 1))
+
+    def test_key_includes_class_name(self):
+        edit = self.registry.get(1032, "Edit")
+        static = self.registry.get(1032, "Static")
+
+        self.assertIsNot(edit, static)
+        self.assertEqual(static.class_name, "Static")
+
+    def test_re_resolve_stale_control(self):
+        first = self.registry.get(1032, "Edit")
+        first.valid = False
+
+        second = self.registry.get(1032, "Edit")
+
+        self.assertIsNot(first, second)
+        self.assertIs(self.registry.get(1032, "Edit"), second)
+        self.assertEqual(len(self.resolved), 2)
+
+    def test_validate_error_means_stale(self):
+        registry = ControlRegistry(
+            lambda control_id, class_name: object(),
+            lambda control, control_id: 1 / 0,
+        )
+        first = registry.get(1032, "Edit")
+
+        self.assertIsNot(registry.get(1032, "Edit"), first)
+
+    def test_invalidate(self):
+        edit = self.registry.get(1032, "Edit")
+        static = self.registry.get(1012, "Static")
+
+        self.registry.invalidate(class_name="Edit")
+        self.assertIsNot(self.registry.get(1032, "Edit"), edit)
+        self.assertIs(self.registry.get(1012, "Static"), static)
+
+        self.registry.invalidate()
+        self.assertEqual(len(self.registry), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
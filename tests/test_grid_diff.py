@@ -0,0 +1,65 @@
+# coding:utf-8
+import unittest
+
+from easytrader.utils.grid_diff import GridDiffer
+
+
+def entrust(no, status, traded=0):
+    return {"合同编号": no, "证券代码": "000001", "备注": status, "成交数量": traded}
+
+
+class TestGridDiffer(unittest.TestCase):
+    def setUp(self):
+        self.differ = GridDiffer()
+
+    def update(self, rows):
+        return self.differ.update("today_entrusts", rows, ("合同编号",))
+
+    def test_first_update_adds_all_rows(self):
+        rows = [entrust("1", "已报"), entrust("2", "已报")]
+        changes = self.update(rows)
+
+        self.assertEqual(changes.added, rows)
+        self.assertEqual(changes.changed, [])
+        self.assertEqual(changes.removed, [])
+
+    def test_unchanged_grid_is_empty(self):
+        self.update([entrust("1", "已报")])
+        self.assertTrue(self.update([entrust("1", "已报")]).empty)
+
+    def test_added_changed_removed(self):
+        self.update([entrust("1", "已报"), entrust("2", "已报")])
+        changes = self.update([entrust("1", "已成", 100), entrust("3", "已报")])
+
+        self.assertEqual(changes.added, [entrust("3", "已报")])
+        self.assertEqual(
+            changes.changed, [(entrust("1", "已报"), entrust("1", "已成", 100))]
+        )
+        self.assertEqual(changes.removed, [entrust("2", "已报")])
+
+    def test_rows_without_key_fields_are_identified_by_content(self):
+        trade = {"证券代码": "000001", "成交数量": 100}
+        self.differ.update("today_trades", [trade], ("成交编号",))
+        changes = self.differ.update(
+            "today_trades", [trade, dict(trade, 成交数量=200)], ("成交编号",)
+        )
+
+        self.assertEqual(changes.added, [dict(trade, 成交数量=200)])
+        self.assertEqual(changes.changed, [])
+
+    def test_duplicate_rows_are_kept(self):
+        trade = {"证券代码": "000001", "成交数量": 100}
+        changes = self.differ.update("today_trades", [trade, trade])
+        self.assertEqual(len(changes.added), 2)
+
+        changes = self.differ.update("today_trades", [trade, trade, trade])
+        self.assertEqual(changes.added, [trade])
+
+    def test_reset(self):
+        self.update([entrust("1", "已报")])
+        self.differ.reset("today_entrusts")
+        self.assertEqual(len(self.update([entrust("1", "已报")]).added), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# coding:utf-8
+import io
+import unittest
+
+import pandas as pd
+
+from easytrader.config import client
+from easytrader.utils.grid_parser import GridParser, infer_column
+
+DTYPE = client.create("ths").GRID_DTYPE
+
+ENTRUSTS = (
+    "委托时间\t证券代码\t证券名称\t操作\t备注\t委托数量\t成交数量\t委托价格\t成交均价\t合同编号\t交易市场\t股东帐户\t\r\n"
+    "09:30:01\t000001\t平安银行\t买入\t已成\t100\t100\t10.5\t10.5\t0012345\t深圳Ａ股\t0123456789\t\r\n"
+    "09:31:02\t600000\t浦发银行\t卖出\t已报\t200\t0\t8\t0\t0012346\t上海Ａ股\t0123456789\t\r\n"
+)
+
+
+def pandas_parse(text, dtype=DTYPE):
+    return pd.read_csv(
+        io.StringIO(text), delimiter="\t", dtype=dtype, na_filter=False
+    ).to_dict("records")
+
+
+class TestGridParser(unittest.TestCase):
+    def assert_same_as_pandas(self, text, dtype=DTYPE):
+        expected = pandas_parse(text, dtype)
+        actual = GridParser(dtype).parse(text)
+        self.assertEqual(actual, expected)
+        for actual_row, expected_row in zip(actual, expected):
+            self.assertEqual(list(actual_row), list(expected_row))
+            for key in expected_row:
+                self.assertIs(type(actual_row[key]), type(expected_row[key]), key)
+
+    def test_entrusts(self):
+        self.assert_same_as_pandas(ENTRUSTS)
+
+    def test_type_inference(self):
+        self.assert_same_as_pandas(
+            "a\tb\tc\td\te\tf\tg\th\n"
+            "1\t1.5\t\t 3\t1_0\tTrue\t0.81%\t-1e3\n"
+            "2\t2\t\t4 \t2\tFalse\t-\t.5\n"
+        )
+
+    def test_empty_values_keep_column_as_str(self):
+        self.assert_same_as_pandas("a\tb\n1\t\n\t2.0\n")
+        self.assert_same_as_pandas("a\tb\n1\tnan\n2\tinf\n")
+
+    def test_duplicate_and_missing_columns(self):
+        self.assert_same_as_pandas("a\ta\t\tb\n1\t2\tx\t3\n")
+
+    def test_quoted_field(self):
+        self.assert_same_as_pandas('a\tb\n"x\ty"\t1\n')
+
+    def test_short_row_is_padded(self):
+        self.assertEqual(GridParser().parse("a\tb\n1\n"), [{"a": 1, "b": ""}])
+
+    def test_header_only(self):
+        self.assertEqual(GridParser().parse("a\tb\r\n"), [])
+
+    def test_empty_text_raises(self):
+        with self.assertRaises(ValueError):
+            GridParser().parse("")
+
+    def test_parse_columns(self):
+        columns, data = GridParser(DTYPE).parse_columns(ENTRUSTS)
+        self.assertEqual(columns[:3], ["委托时间", "证券代码", "证券名称"])
+        self.assertEqual(data[1], ["000001", "600000"])
+        self.assertEqual(data[5], [100, 200])
+
+    def test_layout_is_cached(self):
+        parser = GridParser(DTYPE)
+        parser.parse(ENTRUSTS)
+        parser.parse(ENTRUSTS)
+        self.assertEqual(len(parser._layouts), 1)
+
+    def test_infer_column(self):
+        self.assertEqual(infer_column(["1", "2"]), [1, 2])
+        self.assertEqual(infer_column(["1", "2.5"]), [1.0, 2.5])
+        self.assertEqual(infer_column(["1", "x"]), ["1", "x"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+# coding:utf-8
+import threading
+import time
+import unittest
+
+from easytrader.utils.gui_executor import GuiExecutor, ThreadSafeTrader
+
+
+class FakeTrader:
+    def __init__(self):
+        self.calls = []
+        self.position_reads = 0
+        self.active = 0
+        self.max_active = 0
+        self.name = "fake"
+        self._lock = threading.Lock()
+
+    def _enter(self, call):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self._lock:
+            self.calls.append(call)
+            self.active -= 1
+
+    @property
+    def position(self):
+        self.position_reads += 1
+        self._enter("position")
+        return [{"证券代码": "000001"}]
+
+    def buy(self, security, price, amount):
+        self._enter(("buy", security))
+        return {"entrust_no": security}
+
+    def fail(self):
+        raise ValueError("失败")
+
+
+class TestGuiExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = GuiExecutor()
+        self.addCleanup(self.executor.shutdown)
+
+    def block_executor(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(5)
+
+        self.executor.submit(blocker)
+        self.assertTrue(started.wait(5))
+        return release
+
+    def test_writes_run_in_order(self):
+        results = []
+        futures = [self.executor.submit(results.append, i) for i in range(10)]
+        for future in futures:
+            future.result(5)
+        self.assertEqual(results, list(range(10)))
+
+    def test_reads_run_before_queued_writes(self):
+        order = []
+        release = self.block_executor()
+        write = self.executor.submit(order.append, "write")
+        read = self.executor.submit_read("position", order.append, "read")
+        release.set()
+        write.result(5)
+        read.result(5)
+
+        self.assertEqual(order, ["read", "write"])
+
+    def test_read_burst_is_limited(self):
+        self.executor.max_read_burst = 2
+        order = []
+        release = self.block_executor()
+        futures = [self.executor.submit(order.append, "write")]
+        futures += [
+            self.executor.submit_read(i, order.append, "read{}".format(i))
+            for i in range(3)
+        ]
+        release.set()
+        for future in futures:
+            future.result(5)
+
+        self.assertEqual(order, ["read0", "read1", "write", "read2"])
+
+    def test_duplicate_reads_are_coalesced(self):
+        release = self.block_executor()
+        reads = []
+        first = self.executor.submit_read("position", reads.append, 1)
+        second = self.executor.submit_read("position", reads.append, 2)
+        release.set()
+
+        self.assertIs(first, second)
+        first.result(5)
+        self.assertEqual(reads, [1])
+        self.assertEqual(self.executor.coalesced, 1)
+
+        # 查询完成后再次提交会重新执行
+        self.executor.submit_read("position", reads.append, 3).result(5)
+        self.assertEqual(reads, [1, 3])
+
+    def test_exception_is_propagated(self):
+        future = self.executor.submit_read("key", lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            future.result(5)
+
+    def test_call_inside_executor_thread_runs_directly(self):
+        result = self.executor.call(lambda: self.executor.call(lambda: "nested"))
+        self.assertEqual(result, "nested")
+
+    def test_shutdown_cancels_pending(self):
+        release = self.block_executor()
+        pending = self.executor.submit(lambda: None)
+        self.executor.shutdown(wait=False)
+        release.set()
+        self.executor.shutdown()
+
+        self.assertTrue(pending.cancelled())
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(lambda: None)
+
+
+class TestThreadSafeTrader(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeTrader()
+        self.trader = ThreadSafeTrader(self.fake)
+        self.addCleanup(self.trader.executor.shutdown)
+
+    def test_concurrent_calls_do_not_interleave(self):
+        threads = [
+            threading.Thread(target=self.trader.buy, args=(str(i), 1, 100))
+            for i in range(5)
+        ] + [threading.Thread(target=lambda: self.trader.position) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.fake.max_active, 1)
+        self.assertEqual(len([c for c in self.fake.calls if c != "position"]), 5)
+        self.assertLessEqual(self.fake.position_reads, 5)
+
+    def test_proxy_results_and_attributes(self):
+        self.assertEqual(self.trader.buy("000001", 1, 100), {"entrust_no": "000001"})
+        self.assertEqual(self.trader.position, [{"证券代码": "000001"}])
+        self.assertEqual(self.trader.name, "fake")
+
+        self.trader.name = "renamed"
+        self.assertEqual(self.fake.name, "renamed")
+
+        with self.assertRaises(ValueError):
+            self.trader.fail()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# coding:utf-8
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from easytrader.utils.perf import LatencyRecorder, percentile, trace_latency
+from tests.helpers import FakeClock
+
+
+class FakeTrader:
+    def __init__(self, recorder, clock):
+        self.latency = recorder
+        self.clock = clock
+
+    @trace_latency
+    def buy(self):
+        return self.trade()
+
+    @trace_latency
+    def trade(self):
+        with self.latency.phase("set_params"):
+            self.clock.now += 0.1
+        with self.latency.phase("dialog:提示"):
+            self.clock.now += 0.2
+        with self.latency.phase("dialog:提示"):
+            self.clock.now += 0.3
+        return {"entrust_no": "1"}
+
+    @trace_latency
+    def fail(self):
+        with self.latency.phase("submit"):
+            self.clock.now += 0.5
+            raise ValueError("下单失败")
+
+
+class TestLatencyRecorder(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.recorder = LatencyRecorder(maxlen=3, clock=self.clock)
+        self.trader = FakeTrader(self.recorder, self.clock)
+
+    def test_nested_traces_are_merged(self):
+        self.assertEqual(self.trader.buy(), {"entrust_no": "1"})
+
+        records = self.recorder.records()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["op"], "buy")
+        self.assertAlmostEqual(records[0]["total"], 0.6)
+        self.assertEqual(
+            [name for name, _ in records[0]["phases"]],
+            ["set_params", "dialog:提示", "dialog:提示"],
+        )
+
+    def test_error_is_recorded(self):
+        with self.assertRaises(ValueError):
+            self.trader.fail()
+
+        record = self.recorder.records("fail")[0]
+        self.assertIn("下单失败", record["error"])
+        self.assertEqual(record["phases"], [("submit", 0.5)])
+
+    def test_phase_without_trace_is_ignored(self):
+        with self.recorder.phase("submit"):
+            pass
+        self.assertEqual(self.recorder.records(), [])
+
+    def test_ring_buffer_keeps_latest_records(self):
+        for _ in range(5):
+            self.trader.buy()
+        self.trader.trade()
+
+        self.assertEqual(len(self.recorder.records()), 3)
+        self.assertEqual(len(self.recorder.records("buy")), 2)
+
+    def test_summary_sums_repeated_phases(self):
+        self.trader.buy()
+        self.trader.buy()
+
+        summary = self.recorder.summary()["buy"]
+        self.assertEqual(summary["total"]["count"], 2)
+        self.assertAlmostEqual(summary["dialog:提示"]["p50"], 0.5)
+        self.assertAlmostEqual(summary["set_params"]["max"], 0.1)
+
+    def test_traces_are_per_thread(self):
+        recorder = LatencyRecorder()
+        entered = threading.Event()
+        release = threading.Event()
+
+        def other():
+            with recorder.trace("sell"):
+                entered.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        self.assertTrue(entered.wait(5))
+        with recorder.trace("buy"):
+            pass
+        release.set()
+        thread.join(5)
+
+        self.assertEqual([r["op"] for r in recorder.records()], ["buy", "sell"])
+
+    def test_export(self):
+        self.trader.buy()
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        self.recorder.export(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(data["records"][0]["op"], "buy")
+        self.assertIn("total", data["summary"]["buy"])
+
+    def test_percentile(self):
+        self.assertEqual(percentile([3, 1, 2, 4], 50), 2)
+        self.assertEqual(percentile([3, 1, 2, 4], 99), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
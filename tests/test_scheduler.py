@@ -0,0 +1,47 @@
+# coding:utf-8
+import datetime
+import unittest
+
+from easytrader.utils.scheduler import PollScheduler
+
+
+class TestPollScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = PollScheduler(2, holidays=["2024-10-01"])
+
+    def test_continuous_auction_uses_interval(self):
+        now = datetime.datetime(2024, 9, 30, 10, 0)
+        self.assertEqual(self.scheduler.next_delay(now), 2)
+        now = datetime.datetime(2024, 9, 30, 14, 0)
+        self.assertEqual(self.scheduler.next_delay(now), 2)
+
+    def test_call_auction_uses_auction_interval(self):
+        now = datetime.datetime(2024, 9, 30, 9, 20)
+        self.assertEqual(self.scheduler.next_delay(now), 6)
+
+    def test_lunch_break_waits_until_afternoon_session(self):
+        now = datetime.datetime(2024, 9, 30, 12, 50)
+        self.assertEqual(self.scheduler.next_delay(now), 600)
+
+    def test_closed_market_waits_until_next_trade_day(self):
+        # 2024-09-30 is a Monday, 2024-10-01 is a holiday
+        now = datetime.datetime(2024, 9, 30, 15, 30)
+        self.assertEqual(
+            self.scheduler.next_session_start(now),
+            datetime.datetime(2024, 10, 2, 9, 15),
+        )
+        self.assertEqual(
+            self.scheduler.next_delay(now), PollScheduler.MAX_SLEEP_SECONDS
+        )
+
+        saturday = datetime.datetime(2024, 9, 28, 10, 0)
+        self.assertEqual(
+            self.scheduler.next_session_start(saturday),
+            datetime.datetime(2024, 9, 30, 9, 15),
+        )
+
+    def test_error_delay_backs_off_with_jitter(self):
+        for errors, upper in [(1, 3), (2, 6), (3, 12), (20, 300)]:
+            delay = self.scheduler.error_delay(errors)
+            self.assertGreaterEqual(delay, upper / 2)
+            self.assertLessEqual(delay, upper)
@@ -0,0 +1,32 @@
+# coding:utf-8
+import unittest
+from unittest import mock
+
+from easytrader import server
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.client = server.app.test_client()
+        self.addCleanup(server.global_store.clear)
+
+    def prepare(self):
+        with mock.patch.object(server.api, "use") as use:
+            response = self.client.post(
+                "/prepare", json={"broker": "ths", "user": "test"}
+            )
+        self.assertEqual(response.status_code, 201)
+        use.return_value.prepare.assert_called_once_with(user="test")
+        return server.global_store["user"]
+
+    def test_prepare_again_reuses_executor(self):
+        first = self.prepare()
+        self.addCleanup(first.executor.shutdown)
+        second = self.prepare()
+
+        self.assertIsNot(second.trader, first.trader)
+        self.assertIs(second.executor, first.executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
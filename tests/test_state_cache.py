@@ -0,0 +1,138 @@
+# coding:utf-8
+import threading
+import time
+import unittest
+from unittest import mock
+
+from easytrader.utils.state_cache import StateCache
+from tests.helpers import FakeClock
+
+
+class TestStateCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.loads = 0
+
+    def loader(self):
+        self.loads += 1
+        return [{"证券代码": "000001", "股份可用": self.loads * 100}]
+
+    def test_fresh_value_is_cached(self):
+        cache = StateCache({"position": 1}, clock=self.clock)
+
+        first = cache.get("position", self.loader)
+        self.clock.now = 0.5
+        second = cache.get("position", self.loader)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.loads, 1)
+
+    def test_returned_value_is_a_copy(self):
+        cache = StateCache({"position": 1}, clock=self.clock)
+
+        cache.get("position", self.loader)[0]["股份可用"] = 0
+
+        self.assertEqual(cache.get("position", self.loader)[0]["股份可用"], 100)
+
+    def test_expired_value_is_reloaded(self):
+        cache = StateCache({"position": 1}, clock=self.clock)
+
+        cache.get("position", self.loader)
+        self.clock.now = 1
+        self.assertEqual(cache.get("position", self.loader)[0]["股份可用"], 200)
+
+    def test_uncached_field(self):
+        cache = StateCache({"position": 1}, clock=self.clock)
+
+        cache.get("balance", self.loader)
+        cache.get("balance", self.loader)
+
+        self.assertEqual(self.loads, 2)
+
+    def test_stale_while_revalidate(self):
+        cache = StateCache({"position": 1}, stale_ttl=5, clock=self.clock)
+        cache.get("position", self.loader)
+        release = threading.Event()
+        refreshed = threading.Event()
+
+        def slow_loader():
+            release.wait(5)
+            value = self.loader()
+            refreshed.set()
+            return value
+
+        self.clock.now = 2
+        # 过期后先返回旧值，只启动一次后台刷新
+        self.assertEqual(cache.get("position", slow_loader)[0]["股份可用"], 100)
+        self.assertEqual(cache.get("position", slow_loader)[0]["股份可用"], 100)
+        release.set()
+        self.assertTrue(refreshed.wait(5))
+        self.assertEqual(self.loads, 2)
+
+        for _ in range(100):
+            if cache.get("position", self.loader)[0]["股份可用"] == 200:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get("position", self.loader)[0]["股份可用"], 200)
+
+    def test_refresh_is_submitted_to_executor(self):
+        executor = mock.MagicMock()
+        cache = StateCache(
+            {"position": 1}, stale_ttl=5, clock=self.clock, refresh_executor=executor
+        )
+        cache.get("position", self.loader)
+
+        self.clock.now = 2
+        cache.get("position", self.loader)
+        cache.get("position", self.loader)
+
+        self.assertEqual(executor.submit.call_count, 1)
+        self.assertEqual(self.loads, 1)
+        fn, *args = executor.submit.call_args[0]
+        fn(*args)
+        self.assertEqual(cache.get("position", self.loader)[0]["股份可用"], 200)
+
+    def test_refresh_is_retried_after_submit_failed(self):
+        executor = mock.MagicMock()
+        executor.submit.side_effect = RuntimeError("GuiExecutor 已经停止")
+        cache = StateCache(
+            {"position": 1}, stale_ttl=5, clock=self.clock, refresh_executor=executor
+        )
+        cache.get("position", self.loader)
+
+        self.clock.now = 2
+        cache.get("position", self.loader)
+        cache.get("position", self.loader)
+
+        self.assertEqual(executor.submit.call_count, 2)
+
+    def test_invalidate(self):
+        cache = StateCache({"position": 1, "balance": 1}, stale_ttl=5, clock=self.clock)
+        cache.get("position", self.loader)
+        cache.get("balance", self.loader)
+
+        cache.invalidate("position")
+        cache.get("position", self.loader)
+        cache.get("balance", self.loader)
+        self.assertEqual(self.loads, 3)
+
+        cache.invalidate()
+        cache.get("balance", self.loader)
+        self.assertEqual(self.loads, 4)
+
+    def test_load_started_before_invalidate_is_not_cached(self):
+        cache = StateCache({"position": 1}, clock=self.clock)
+
+        def loader():
+            # 读取期间发生了交易
+            cache.invalidate()
+            return self.loader()
+
+        cache.get("position", loader)
+        cache.get("position", self.loader)
+
+        self.assertEqual(self.loads, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
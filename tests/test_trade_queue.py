@@ -0,0 +1,98 @@
+# coding:utf-8
+import datetime
+import queue
+import threading
+import unittest
+
+from easytrader.utils.trade_queue import TradeCmdQueue
+
+
+def _cmd(action, stock_code, amount=100, seconds_ago=0, strategy_name="test"):
+    return {
+        "strategy": strategy_name,
+        "strategy_name": strategy_name,
+        "action": action,
+        "stock_code": stock_code,
+        "amount": amount,
+        "price": 1.0,
+        "datetime": datetime.datetime.now()
+        - datetime.timedelta(seconds=seconds_ago),
+    }
+
+
+def _drain(trade_queue):
+    cmds = []
+    while not trade_queue.empty():
+        cmds.append(trade_queue.get_nowait())
+    return cmds
+
+
+class TestTradeCmdQueue(unittest.TestCase):
+    def test_sells_first_then_by_signal_age(self):
+        trade_queue = TradeCmdQueue()
+        trade_queue.put(_cmd("buy", "sz000001", seconds_ago=30))
+        trade_queue.put(_cmd("sell", "sz000002", seconds_ago=10))
+        trade_queue.put(_cmd("buy", "sz000003", seconds_ago=60))
+        trade_queue.put(_cmd("sell", "sz000004", seconds_ago=20))
+
+        self.assertEqual(
+            [(c["action"], c["stock_code"]) for c in _drain(trade_queue)],
+            [
+                ("sell", "sz000004"),
+                ("sell", "sz000002"),
+                ("buy", "sz000003"),
+                ("buy", "sz000001"),
+            ],
+        )
+
+    def test_sell_does_not_overtake_buy_of_same_stock(self):
+        trade_queue = TradeCmdQueue()
+        trade_queue.put(_cmd("buy", "sh600000", seconds_ago=30))
+        trade_queue.put(_cmd("buy", "sz000001", seconds_ago=20))
+        trade_queue.put(_cmd("sell", "sh600000"))
+        trade_queue.put(_cmd("sell", "sz000002", seconds_ago=10))
+
+        self.assertEqual(
+            [(c["action"], c["stock_code"]) for c in _drain(trade_queue)],
+            [
+                ("sell", "sz000002"),
+                ("buy", "sh600000"),
+                ("buy", "sz000001"),
+                ("sell", "sh600000"),
+            ],
+        )
+
+    def test_net_opposite_cmds(self):
+        trade_queue = TradeCmdQueue(net_opposite=True)
+        buy = _cmd("buy", "sz000001", amount=1000, strategy_name="a")
+        trade_queue.put(buy)
+        trade_queue.put(_cmd("sell", "sz000001", amount=400, strategy_name="b"))
+        trade_queue.put(_cmd("sell", "sz000002", amount=300))
+
+        cmds = _drain(trade_queue)
+        self.assertEqual(
+            [(c["action"], c["stock_code"], c["amount"]) for c in cmds],
+            [("sell", "sz000002", 300), ("buy", "sz000001", 600)],
+        )
+        # the original command may be shared with other queues
+        self.assertEqual(buy["amount"], 1000)
+
+    def test_fully_netted_cmds_are_removed(self):
+        trade_queue = TradeCmdQueue(net_opposite=True)
+        trade_queue.put(_cmd("sell", "sz000001", amount=200))
+        trade_queue.put(_cmd("sell", "sz000001", amount=300))
+        trade_queue.put(_cmd("buy", "sz000001", amount=700))
+
+        self.assertEqual(trade_queue.qsize(), 1)
+        cmd = trade_queue.get_nowait()
+        self.assertEqual((cmd["action"], cmd["amount"]), ("buy", 200))
+        self.assertTrue(trade_queue.empty())
+
+    def test_blocking_get(self):
+        trade_queue = TradeCmdQueue()
+        with self.assertRaises(queue.Empty):
+            trade_queue.get(timeout=0.01)
+
+        timer = threading.Timer(0.05, trade_queue.put, [_cmd("buy", "sz000001")])
+        timer.start()
+        self.assertEqual(trade_queue.get(timeout=5)["stock_code"], "sz000001")
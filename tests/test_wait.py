@@ -0,0 +1,48 @@
+# coding:utf-8
+import time
+import unittest
+
+from easytrader.utils.wait import wait_until, wait_window_closed
+
+
+class TestWaitUntil(unittest.TestCase):
+    def test_return_as_soon_as_condition_is_met(self):
+        deadline = time.monotonic() + 0.05
+        start = time.monotonic()
+        result = wait_until(lambda: time.monotonic() >= deadline and "ready", 2)
+        self.assertEqual(result, "ready")
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_timeout(self):
+        start = time.monotonic()
+        self.assertFalse(wait_until(lambda: False, 0.05))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_exceptions_are_treated_as_not_ready(self):
+        calls = []
+
+        def condition():
+            calls.append(1)
+            if len(calls) < 3:
+                raise RuntimeError("window is not ready")
+            return True
+
+        self.assertTrue(wait_until(condition, 1, interval=0.001))
+        self.assertIsNone(wait_until(lambda: 1 / 0, 0.01))
+
+    def test_wait_window_closed(self):
+        class Window:
+            def __init__(self, visible_polls):
+                self.polls = visible_polls
+
+            def is_visible(self):
+                self.polls -= 1
+                return self.polls >= 0
+
+        class DestroyedWindow:
+            def is_visible(self):
+                raise RuntimeError("invalid window handle")
+
+        self.assertTrue(wait_window_closed(Window(2), 1, interval=0.001))
+        self.assertFalse(wait_window_closed(Window(1000), 0.01, interval=0.001))
+        self.assertTrue(wait_window_closed(DestroyedWindow(), 0.01))
@@ -1,10 +1,13 @@
 # coding:utf-8
+import asyncio
 import datetime
 import os
+import threading
 import time
 import unittest
 from unittest import mock
 
+from easytrader.follower import Transaction
 from easytrader.xq_follower import XueQiuFollower
 
 
@@ -21,6 +24,7 @@ class TestXueQiuTrader(unittest.TestCase):
 
     def test_adjust_sell_should_only_work_when_sell(self):
         follower = XueQiuFollower()
+        follower._users = [mock.MagicMock()]
         follower._adjust_sell = True
         test_transaction = {
             "weight": 10,
@@ -64,6 +68,69 @@ class TestXueQiuTrader(unittest.TestCase):
             amount = follower._adjust_sell_amount(stock_code, sell_amount)
             self.assertEqual(amount, excepted_amount)
 
+    def test_adjust_sell_reads_position_once_per_batch(self):
+        follower = XueQiuFollower()
+        follower._adjust_sell = True
+        position = mock.PropertyMock(return_value=TEST_POSITION)
+        mock_user = mock.MagicMock()
+        type(mock_user).position = position
+        follower._users = [mock_user]
+
+        transactions = [
+            {
+                "weight": 0,
+                "prev_weight": 10,
+                "price": 1.0,
+                "stock_symbol": "SZ169101",
+                "created_at": int(time.time() * 1000),
+            }
+            for _ in range(3)
+        ]
+        result = follower.project_transactions(transactions, assets=4000)
+
+        position.assert_called_once()
+        self.assertEqual([t.amount for t in result], [400, 200, 0])
+
+    def test_adjust_sell_with_empty_position_reads_once(self):
+        follower = XueQiuFollower()
+        follower._adjust_sell = True
+        position = mock.PropertyMock(return_value=[])
+        mock_user = mock.MagicMock()
+        type(mock_user).position = position
+        follower._users = [mock_user]
+
+        transactions = [
+            {
+                "weight": 0,
+                "prev_weight": 10,
+                "price": 1.0,
+                "stock_symbol": "SZ16910{}".format(i),
+                "created_at": int(time.time() * 1000),
+            }
+            for i in range(3)
+        ]
+        result = follower.project_transactions(transactions, assets=4000)
+
+        position.assert_called_once()
+        self.assertEqual([t.amount for t in result], [400, 400, 400])
+
+    def test_order_transactions_sell_first_is_stable(self):
+        now = datetime.datetime.now()
+        transactions = [
+            Transaction(action, code, 100, 1.0, now)
+            for action, code in [
+                ("buy", "sz000001"),
+                ("sell", "sz000002"),
+                ("buy", "sz000003"),
+                ("sell", "sz000004"),
+            ]
+        ]
+        result = XueQiuFollower.order_transactions_sell_first(transactions)
+        self.assertEqual(
+            [t.stock_code for t in result],
+            ["sz000002", "sz000004", "sz000001", "sz000003"],
+        )
+
     def test_slippage_with_default(self):
         follower = XueQiuFollower()
         mock_user = mock.MagicMock()
@@ -130,6 +197,64 @@ class TestXueQiuTrader(unittest.TestCase):
         _, kwargs = getattr(mock_user, test_trade_cmd["action"]).call_args
         self.assertAlmostEqual(kwargs["price"], excepted_price)
 
+    def test_parallel_users_trade_worker(self):
+        follower = XueQiuFollower()
+        calls = []
+        slow_user_started = threading.Event()
+        fast_user_done = threading.Event()
+
+        class SlowUser:
+            def buy(self, **kwargs):
+                slow_user_started.set()
+                fast_user_done.wait(5)
+                calls.append(("slow", "buy", kwargs["security"]))
+
+            def sell(self, **kwargs):
+                calls.append(("slow", "sell", kwargs["security"]))
+
+        class FastUser:
+            def buy(self, **kwargs):
+                calls.append(("fast", "buy", kwargs["security"]))
+                fast_user_done.set()
+
+            def sell(self, **kwargs):
+                calls.append(("fast", "sell", kwargs["security"]))
+
+        follower.start_trader_thread(
+            [SlowUser(), FastUser()],
+            trade_cmd_expire_seconds=10,
+            parallel_users=True,
+        )
+        now = datetime.datetime.now()
+        for action, stock_code in [("sell", "000001"), ("buy", "000002")]:
+            follower.trade_queue.put(
+                {
+                    "strategy": "test_strategy",
+                    "strategy_name": "test_strategy",
+                    "action": action,
+                    "stock_code": stock_code,
+                    "amount": 100,
+                    "price": 1.0,
+                    "datetime": now,
+                }
+            )
+
+        self.assertTrue(fast_user_done.wait(5))
+        self.assertTrue(slow_user_started.wait(5))
+        for _ in range(50):
+            if len(calls) == 4:
+                break
+            time.sleep(0.1)
+        fast_calls = [call[1:] for call in calls if call[0] == "fast"]
+        slow_calls = [call[1:] for call in calls if call[0] == "slow"]
+        self.assertEqual(fast_calls, [("sell", "000001"), ("buy", "000002")])
+        self.assertEqual(slow_calls, [("sell", "000001"), ("buy", "000002")])
+        # the fast account did not wait for the slow account's buy
+        self.assertLess(
+            calls.index(("fast", "buy", "000002")),
+            calls.index(("slow", "buy", "000002")),
+        )
+
 
 class TestXqFollower(unittest.TestCase):
     def setUp(self):
@@ -144,6 +269,162 @@ class TestXqFollower(unittest.TestCase):
         self.assertTrue(len(result) == 1)
 
 
+def _rebalancing(rebalancing_id, stock_symbol="SZ162411", status="success"):
+    return {
+        "id": rebalancing_id,
+        "status": status,
+        "created_at": rebalancing_id * 1000,
+        "updated_at": rebalancing_id * 1000,
+        "rebalancing_histories": [
+            {
+                "stock_symbol": stock_symbol,
+                "price": 1.0,
+                "weight": 10.0,
+                "prev_weight": 0.0,
+                "created_at": rebalancing_id * 1000,
+            }
+        ],
+    }
+
+
+def _response(rebalancings, status_code=200, headers=None):
+    rep = mock.MagicMock()
+    rep.status_code = status_code
+    rep.headers = headers or {}
+    rep.json.return_value = {"count": len(rebalancings), "list": rebalancings}
+    return rep
+
+
+class TestXqIncrementalQuery(unittest.TestCase):
+    def setUp(self):
+        self.follower = XueQiuFollower()
+        self.follower.s = mock.MagicMock()
+        self.follower.CATCH_UP_PAGE_SIZE = 2
+
+    def query(self):
+        return self.follower.query_strategy_transaction("ZH000001", assets=10000)
+
+    def test_unchanged_rebalancing_is_skipped(self):
+        self.follower.s.get.return_value = _response(
+            [_rebalancing(1)], headers={"ETag": "v1"}
+        )
+        self.assertEqual(len(self.query()), 1)
+        self.assertEqual(self.query(), [])
+        headers = self.follower.s.get.call_args[1]["headers"]
+        self.assertEqual(headers, {"If-None-Match": "v1"})
+
+        self.follower.s.get.return_value = _response([], status_code=304)
+        self.assertEqual(self.query(), [])
+
+    def test_failed_processing_is_retried(self):
+        def conditional_get(url, params=None, headers=None):
+            if headers and headers.get("If-None-Match") == "v1":
+                return _response([], status_code=304)
+            return _response([_rebalancing(1)], headers={"ETag": "v1"})
+
+        self.follower.s.get.side_effect = conditional_get
+        with mock.patch.object(
+            self.follower, "project_transactions", side_effect=RuntimeError("gui busy")
+        ):
+            with self.assertRaises(RuntimeError):
+                self.query()
+
+        self.assertEqual(len(self.query()), 1)
+        self.assertEqual(self.query(), [])
+
+    def test_async_failed_processing_is_retried(self):
+        follower = self.follower
+
+        class FakeResponse:
+            def __init__(self, rep):
+                self.status = rep.status_code
+                self.headers = rep.headers
+                self._rep = rep
+
+            async def json(self, content_type=None):
+                return self._rep.json()
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                return False
+
+        class FakeSession:
+            def get(self, url, params=None, headers=None):
+                if headers and headers.get("If-None-Match") == "v1":
+                    return FakeResponse(_response([], status_code=304))
+                return FakeResponse(_response([_rebalancing(1)], headers={"ETag": "v1"}))
+
+        def query():
+            return asyncio.run(
+                follower.async_query_strategy_transaction(
+                    FakeSession(), "ZH000001", assets=10000
+                )
+            )
+
+        with mock.patch.object(
+            follower, "project_transactions", side_effect=RuntimeError("gui busy")
+        ):
+            with self.assertRaises(RuntimeError):
+                query()
+
+        self.assertEqual(len(query()), 1)
+        self.assertEqual(query(), [])
+
+    def test_pending_rebalancing_is_processed_after_update(self):
+        pending = _rebalancing(1, status="pending")
+        pending["rebalancing_histories"][0]["price"] = None
+        self.follower.s.get.return_value = _response([pending])
+        self.assertEqual(self.query(), [])
+
+        self.follower.s.get.return_value = _response([_rebalancing(1)])
+        self.assertEqual(len(self.query()), 1)
+
+    def test_catch_up_over_pages(self):
+        self.follower.s.get.return_value = _response([_rebalancing(1)])
+        self.query()
+
+        newer = [_rebalancing(i, "SZ00000{}".format(i)) for i in (4, 3, 2)]
+        self.follower.s.get.side_effect = [
+            _response(newer[:1]),
+            _response(newer[:2]),
+            _response([newer[2], _rebalancing(1)]),
+        ]
+        result = self.query()
+        self.assertEqual(
+            [t.stock_code for t in result], ["sz000002", "sz000003", "sz000004"]
+        )
+        pages = [c[1]["params"]["page"] for c in self.follower.s.get.call_args_list]
+        self.assertEqual(pages[-2:], [1, 2])
+
+    def test_catch_up_sells_first_within_each_rebalancing(self):
+        self.follower.s.get.return_value = _response([_rebalancing(1)])
+        self.query()
+
+        older = _rebalancing(2, "SZ000002")
+        older["rebalancing_histories"].append(
+            dict(
+                older["rebalancing_histories"][0],
+                stock_symbol="SZ000003",
+                weight=0.0,
+                prev_weight=10.0,
+            )
+        )
+        newer = _rebalancing(3, "SZ000002")
+        newer["rebalancing_histories"][0].update(weight=0.0, prev_weight=10.0)
+        self.follower.s.get.side_effect = [
+            _response([newer]),
+            _response([newer, older]),
+            _response([_rebalancing(1)]),
+        ]
+        result = self.query()
+        self.assertEqual(
+            [(t.action, t.stock_code) for t in result],
+            [("sell", "sz000003"), ("buy", "sz000002"), ("sell", "sz000002")],
+        )
+
+
 TEST_POSITION = [
     {
         "Unnamed: 14": "",